@@ -15,6 +15,14 @@ class Settings(BaseSettings):
     algorithm: str = os.getenv("ALGORITHM", "HS256")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     
+    # Authenticated-user cache and last_login write coalescing (seconds)
+    auth_user_cache_ttl: int = int(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+    last_login_write_interval: int = int(os.getenv("LAST_LOGIN_WRITE_INTERVAL", "300"))
+    last_login_flush_interval: int = int(os.getenv("LAST_LOGIN_FLUSH_INTERVAL", "15"))
+    
+    # Worker threads for bcrypt hashing/verification; excess attempts wait their turn
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+    
     # Admin
     admin_username: str = os.getenv("ADMIN_USERNAME", "admin")
     admin_password: str = os.getenv("ADMIN_PASSWORD", "admin123")
@@ -47,6 +55,85 @@ class Settings(BaseSettings):
     pinecone_environment: str = os.getenv("PINECONE_ENVIRONMENT", "us-west1-gcp")
     pinecone_index_name: str = os.getenv("PINECONE_INDEX_NAME", "stock-research")
     
+    # Admin analytics: dashboard payload cache TTL and daily_stats rollup interval (seconds)
+    analytics_cache_ttl: int = int(os.getenv("ANALYTICS_CACHE_TTL", "30"))
+    analytics_rollup_interval: int = int(os.getenv("ANALYTICS_ROLLUP_INTERVAL", "300"))
+    
+    # Per-user dashboard snapshot cache TTL (seconds)
+    dashboard_cache_ttl: int = int(os.getenv("DASHBOARD_CACHE_TTL", "15"))
+    
+    # Market quotes: cache TTL (seconds) and max concurrent per-symbol fallback fetches
+    quote_cache_ttl: int = int(os.getenv("QUOTE_CACHE_TTL", "15"))
+    quote_fetch_concurrency: int = int(os.getenv("QUOTE_FETCH_CONCURRENCY", "8"))
+    
+    # Provider pacing for per-symbol calls: yfinance requests per second, AlphaVantage requests per minute
+    yfinance_rate_limit: int = int(os.getenv("YFINANCE_RATE_LIMIT", "4"))
+    alpha_vantage_rate_limit: int = int(os.getenv("ALPHA_VANTAGE_RATE_LIMIT", "5"))
+    
+    # Stock research: seconds optional sections (charts, news) may take before the LLM request goes without them
+    research_optional_deadline: float = float(os.getenv("RESEARCH_OPTIONAL_DEADLINE", "3"))
+    
+    # News sentiment and compare table cache TTLs (seconds)
+    sentiment_cache_ttl: int = int(os.getenv("SENTIMENT_CACHE_TTL", "900"))
+    compare_cache_ttl: int = int(os.getenv("COMPARE_CACHE_TTL", "300"))
+    
+    # Market data hub: poll interval for open/closed markets, tracked-symbol reload interval (seconds),
+    # symbols per batched request, and how long symbols requested outside portfolios/watchlists stay polled
+    market_poll_interval: int = int(os.getenv("MARKET_POLL_INTERVAL", "15"))
+    market_closed_poll_interval: int = int(os.getenv("MARKET_CLOSED_POLL_INTERVAL", "600"))
+    market_symbols_refresh: int = int(os.getenv("MARKET_SYMBOLS_REFRESH", "60"))
+    market_batch_size: int = int(os.getenv("MARKET_BATCH_SIZE", "100"))
+    market_adhoc_ttl: int = int(os.getenv("MARKET_ADHOC_TTL", "600"))
+    # Most symbols one live quote socket may follow
+    market_ws_max_symbols: int = int(os.getenv("MARKET_WS_MAX_SYMBOLS", "200"))
+    
+    # Daily OHLCV bar cache: TTL (seconds) and history fetched per symbol; company overview cache TTL (seconds)
+    ohlcv_cache_ttl: int = int(os.getenv("OHLCV_CACHE_TTL", "21600"))
+    ohlcv_history_period: str = os.getenv("OHLCV_HISTORY_PERIOD", "2y")
+    overview_cache_ttl: int = int(os.getenv("OVERVIEW_CACHE_TTL", "86400"))
+    
+    # Portfolio risk: lookback window (trading days) and annual risk-free rate
+    risk_lookback_days: int = int(os.getenv("RISK_LOOKBACK_DAYS", "252"))
+    risk_free_rate: float = float(os.getenv("RISK_FREE_RATE", "0.04"))
+    
+    # Monte Carlo VaR: simulations with at least this many paths are sharded across a process pool
+    var_parallel_paths: int = int(os.getenv("VAR_PARALLEL_PATHS", "100000"))
+    var_max_paths: int = int(os.getenv("VAR_MAX_PATHS", "1000000"))
+    
+    # Worker processes shared by CPU-bound jobs (VaR shards, backtest sweeps); VAR_WORKERS is the legacy name
+    process_pool_workers: int = int(os.getenv("PROCESS_POOL_WORKERS", os.getenv("VAR_WORKERS", str(os.cpu_count() or 2))))
+    
+    # Portfolio NAV snapshots: background update interval (seconds)
+    nav_update_interval: int = int(os.getenv("NAV_UPDATE_INTERVAL", "3600"))
+    
+    # CSV transaction import: rows per bulk write; how long validated symbols stay in the symbol index (seconds)
+    import_chunk_size: int = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+    symbol_index_ttl: int = int(os.getenv("SYMBOL_INDEX_TTL", str(7 * 24 * 3600)))
+    
+    # Backtesting: sweeps with at least this many runs (parameter sets x symbols) use the process pool
+    backtest_parallel_runs: int = int(os.getenv("BACKTEST_PARALLEL_RUNS", "200"))
+    
+    # Screener: universe (comma-separated, or a file with one symbol per line; default NIFTY 50 plus US
+    # large caps) and the UTC hour of the nightly snapshot rebuild
+    screener_universe: str = os.getenv("SCREENER_UNIVERSE", "")
+    screener_universe_file: str = os.getenv("SCREENER_UNIVERSE_FILE", "")
+    screener_refresh_hour: int = int(os.getenv("SCREENER_REFRESH_HOUR", "22"))
+    
+    # Pattern scanner: how often watchlist symbols are checked for new daily bars (seconds); signals kept per
+    # symbol; symbols whose scan state is kept in memory
+    pattern_scan_interval: int = int(os.getenv("PATTERN_SCAN_INTERVAL", "900"))
+    pattern_max_signals: int = int(os.getenv("PATTERN_MAX_SIGNALS", "200"))
+    pattern_max_symbols: int = int(os.getenv("PATTERN_MAX_SYMBOLS", "5000"))
+    
+    # Price and indicator alerts: active alerts per user; queued notification emails before new ones are dropped
+    alert_max_per_user: int = int(os.getenv("ALERT_MAX_PER_USER", "100"))
+    email_queue_size: int = int(os.getenv("EMAIL_QUEUE_SIZE", "1000"))
+    
+    # Admin activity stream: in-memory buffer bound, flush interval (seconds), capped collection size (bytes)
+    activity_buffer_size: int = int(os.getenv("ACTIVITY_BUFFER_SIZE", "5000"))
+    activity_flush_interval: float = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "2"))
+    activity_log_max_bytes: int = int(os.getenv("ACTIVITY_LOG_MAX_BYTES", str(16 * 1024 * 1024)))
+    
     # Email
     smtp_server: str = os.getenv("SMTP_SERVER", "smtp.gmail.com")
     smtp_port: int = int(os.getenv("SMTP_PORT", "587"))
@@ -1,16 +1,29 @@
 from fastapi import FastAPI, Request, Depends, HTTPException
-from app.services.auth import get_current_user
+from app.services.auth import get_current_user, run_last_login_flusher, flush_last_login_writes
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import os
 from dotenv import load_dotenv
 
 from app.config import Settings
-from app.routes import auth, users, admin, chat, portfolio, research
-from app.utils.security import create_default_admin
+from app.routes import auth, users, admin, chat, portfolio, research, market, alerts, backtest, screener, patterns
+from app.utils.security import create_default_admin, get_shared_db, close_shared_db
+from app.utils.db_indexes import bootstrap_indexes
+from app.services.analytics_service import run_daily_stats_rollup
+from app.services.user_search import bootstrap_user_search
+from app.services.activity_service import run_activity_flusher, flush_activity
+from app.services.market_data_hub import market_hub, run_market_data_hub
+from app.services.holdings_store import record_marks_on_tick
+from app.services.process_pool import shutdown_process_pool
+from app.services.nav_service import run_nav_updater
+from app.services.alert_service import alert_engine, bootstrap_alerts
+from app.services.email_service import run_email_sender
+from app.services.screener import run_screener_refresher
+from app.services.pattern_scanner import run_pattern_scanner
 
 load_dotenv()
 
@@ -72,6 +85,11 @@ app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(portfolio.router, prefix="/api/portfolio", tags=["portfolio"])
 app.include_router(research.router, prefix="/api/research", tags=["research"])
+app.include_router(market.router, prefix="/api/market", tags=["market"])
+app.include_router(alerts.router, prefix="/api/alerts", tags=["alerts"])
+app.include_router(backtest.router, prefix="/api/backtest", tags=["backtest"])
+app.include_router(screener.router, prefix="/api/screener", tags=["screener"])
+app.include_router(patterns.router, prefix="/api/patterns", tags=["patterns"])
 
 
 @app.get("/chat", response_class=HTMLResponse)
@@ -96,6 +114,34 @@ async def compare_page(request: Request, user: dict = Depends(get_current_user,
 @app.on_event("startup")
 async def startup_event():
     await create_default_admin()
+    await bootstrap_indexes()
+    await bootstrap_user_search()
+    await bootstrap_alerts()
+    market_hub.add_listener(record_marks_on_tick)
+    market_hub.add_listener(alert_engine.on_tick)
+    # Long-running background jobs; cancelled on shutdown
+    app.state.background_tasks = [
+        asyncio.create_task(run_last_login_flusher()),
+        asyncio.create_task(run_daily_stats_rollup()),
+        asyncio.create_task(run_activity_flusher()),
+        asyncio.create_task(run_market_data_hub()),
+        asyncio.create_task(run_nav_updater()),
+        asyncio.create_task(run_email_sender()),
+        asyncio.create_task(run_screener_refresher()),
+        asyncio.create_task(run_pattern_scanner()),
+    ]
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
+    try:
+        flush_last_login_writes(get_shared_db())
+        flush_activity(get_shared_db())
+    except Exception as e:
+        print(f"Final flush failed: {e}")
+    shutdown_process_pool()
+    close_shared_db()
 
 @app.get("/", response_class=HTMLResponse)
 async def landing_page(request: Request):
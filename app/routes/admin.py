@@ -1,21 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
+import asyncio
+import json
 from pymongo import MongoClient
-import pandas as pd
-import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import io
-import base64
 
 from app.config import settings
 from app.models.user import UserRole, UserCreate
-from app.services.auth import get_current_active_user, get_password_hash
-from app.utils.security import get_db, require_admin
+from app.services.auth import get_current_active_user, get_password_hash_async, invalidate_cached_user
+from app.utils.security import get_db, require_admin, password_hash_metrics
+from app.utils.db_indexes import index_health_report
+from app.services.analytics_service import get_dashboard_analytics, get_daily_stats
+from app.utils.chart_renderer import line_chart_spec, render_chart_data_uri
+from app.services.user_search import prefix_search_filter, count_users, search_keys, invalidate_user_counts
+from app.services.activity_service import emit_activity, recent_activity, serialize_activity, subscribe_activity, unsubscribe_activity
 from app.services.auth import require_admin
 
 router = APIRouter()
@@ -54,15 +54,22 @@ async def admin_analytics_page(
 @router.get("/users/list")
 async def get_users_list(
     request: Request,
+    q: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(25, ge=1, le=100),
     current_user: dict = Depends(require_admin),
     db = Depends(get_db)
 ):
-    users = list(db.users.find(
-        {"role": UserRole.USER},
-        {"hashed_password": 0}
-    ).sort("created_at", -1))
+    """Page through regular users, newest first, with optional prefix search on username, email or full name."""
+    query = prefix_search_filter(UserRole.USER.value, q)
+    projection = {"username": 1, "full_name": 1, "email": 1, "role": 1, "is_active": 1,
+                  "email_verified": 1, "created_at": 1, "last_login": 1}
+    skip = (page - 1) * page_size
+    users = db.users.find(query, projection).sort([("created_at", -1), ("_id", -1)]).skip(skip).limit(page_size)
+    total, total_is_estimate = count_users(db, query, cache_key=(q or "").strip().lower(), capped=bool(q))
+
     result = []
-    for idx, user in enumerate(users, start=1):
+    for idx, user in enumerate(users, start=skip + 1):
         result.append({
             "si_no": idx,
             "_id": str(user.get("_id", "")),
@@ -71,10 +78,17 @@ async def get_users_list(
             "email": user.get("email", ""),
             "role": user.get("role", ""),
             "is_active": user.get("is_active", True),
+            "email_verified": user.get("email_verified", False),
             "created_at": user.get("created_at").isoformat() if user.get("created_at") else None,
             "last_login": user.get("last_login").isoformat() if user.get("last_login") else None
         })
-    return result
+    return {
+        "items": result,
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "total_is_estimate": total_is_estimate
+    }
 
 @router.post("/users/{user_id}/toggle-active")
 async def toggle_user_active(
@@ -93,6 +107,9 @@ async def toggle_user_active(
         {"_id": ObjectId(user_id)},
         {"$set": {"is_active": new_status}}
     )
+    invalidate_cached_user(user.get("username"))
+    invalidate_user_counts()
+    emit_activity(current_user.get("username"), f"{'Activated' if new_status else 'Deactivated'} user {user.get('username')}", "warning")
     
     return {"message": f"User {'activated' if new_status else 'deactivated'} successfully"}
 
@@ -115,7 +132,7 @@ async def create_admin(
         raise HTTPException(status_code=400, detail="Email already exists")
     
     # Create new admin user
-    hashed_password = get_password_hash(admin_data["password"])
+    hashed_password = await get_password_hash_async(admin_data["password"])
     admin_user = {
         "username": admin_data["username"],
         "email": admin_data["email"],
@@ -124,10 +141,12 @@ async def create_admin(
         "role": UserRole.ADMIN,
         "is_active": True,
         "created_at": datetime.utcnow(),
-        "email_verified": True
+        "email_verified": True,
+        **search_keys(admin_data)
     }
     
     db.users.insert_one(admin_user)
+    emit_activity(current_user.get("username"), f"Created admin {admin_data['username']}", "warning")
     
     return {"message": "Admin user created successfully"}
 
@@ -137,114 +156,27 @@ async def get_analytics_data(
     current_user: dict = Depends(require_admin),
     db = Depends(get_db)
 ):
-    # User analytics
-    total_users = db.users.count_documents({"role": UserRole.USER})
-    active_users = db.users.count_documents({"role": UserRole.USER, "is_active": True})
-    new_users_today = db.users.count_documents({
-        "role": UserRole.USER,
-        "created_at": {"$gte": datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)}
-    })
-    
-    # Chat analytics
-    total_chats = db.chat_sessions.count_documents({})
-    total_messages = db.chat_messages.count_documents({})
-    
-    # Portfolio analytics
-    total_portfolios = db.portfolios.count_documents({})
-    
-    # Daily active users (last 7 days)
-    daily_active_data = []
-    for i in range(7):
-        date = datetime.utcnow() - timedelta(days=i)
-        start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = date.replace(hour=23, minute=59, second=59, microsecond=999999)
-        
-        daily_active = db.users.count_documents({
-            "last_login": {"$gte": start_of_day, "$lte": end_of_day}
-        })
-        daily_active_data.append({
-            "date": date.strftime("%Y-%m-%d"),
-            "active_users": daily_active
-        })
-    
-    daily_active_data.reverse()
-    
-    # Chat activity by hour (example)
-    chat_activity = []
-    for hour in range(6, 22, 3):
-        start = datetime.utcnow().replace(hour=hour, minute=0, second=0, microsecond=0)
-        end = start + timedelta(hours=3)
-        count = db.chat_messages.count_documents({
-            "created_at": {"$gte": start, "$lt": end}
-        })
-        chat_activity.append({"hour": f"{hour}:00", "messages": count})
-
-    # Feature usage (example: count by type)
-    feature_usage = [
-        {"label": "Research", "value": db.research.count_documents({}) if "research" in db.list_collection_names() else 0},
-        {"label": "Portfolio", "value": db.portfolios.count_documents({}) if "portfolios" in db.list_collection_names() else 0},
-        {"label": "Chat", "value": db.chat_sessions.count_documents({}) if "chat_sessions" in db.list_collection_names() else 0},
-        {"label": "Comparison", "value": db.chat_sessions.count_documents({"type": "compare"}) if "chat_sessions" in db.list_collection_names() else 0}
-    ]
-
-    return {
-        "user_metrics": {
-            "total_users": total_users,
-            "active_users": active_users,
-            "new_users_today": new_users_today
-        },
-        "chat_metrics": {
-            "total_chats": total_chats,
-            "total_messages": total_messages,
-            "chat_activity": chat_activity
-        },
-        "portfolio_metrics": {
-            "total_portfolios": total_portfolios
-        },
-        "daily_active_users": daily_active_data,
-        "feature_usage": feature_usage
-    }
+    return get_dashboard_analytics(db)
 
 @router.get("/analytics/charts")
 async def get_analytics_charts(
     request: Request,
+    format: str = "png",
     current_user: dict = Depends(require_admin),
     db = Depends(get_db)
 ):
-    # Generate user registration trend chart
-    dates = []
-    registrations = []
-    
-    for i in range(30):
-        date = datetime.utcnow() - timedelta(days=29-i)
-        start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = date.replace(hour=23, minute=59, second=59, microsecond=999999)
-        
-        count = db.users.count_documents({
-            "created_at": {"$gte": start_of_day, "$lte": end_of_day}
-        })
-        
-        dates.append(date.strftime("%m-%d"))
-        registrations.append(count)
-    
-    # Create matplotlib figure
-    plt.figure(figsize=(10, 6))
-    plt.plot(dates, registrations, marker='o', linewidth=2, markersize=4)
-    plt.title('User Registrations (Last 30 Days)')
-    plt.xlabel('Date')
-    plt.ylabel('Registrations')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    
-    # Convert to base64
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
-    
+    """User registration trend. `format=json` returns Plotly figure data instead of a rendered PNG."""
+    # User registration trend from the daily_stats rollup
+    rows = get_daily_stats(db, 30)
+    dates = [datetime.strptime(row["date"], "%Y-%m-%d").strftime("%m-%d") for row in rows]
+    registrations = [row["registrations"] for row in rows]
+    spec = line_chart_spec('User Registrations (Last 30 Days)', 'Date', 'Registrations', dates, registrations)
+
+    if format == "json":
+        return {"registration_chart_data": spec}
+
     return {
-        "registration_chart": f"data:image/png;base64,{image_base64}"
+        "registration_chart": await render_chart_data_uri(spec)
     }
 
 
@@ -254,52 +186,44 @@ async def get_recent_activity(
     db = Depends(get_db),
     limit: int = 20
 ):
-    """Return recent system/user activity for admin dashboard.
-    This will first try to read from an `activity_logs` collection. If that doesn't exist,
-    it will fall back to recent chat sessions and portfolio updates to provide useful data.
-    """
-    activities = []
-    # Try activity_logs collection
-    try:
-        if 'activity_logs' in db.list_collection_names():
-            cursor = db.activity_logs.find().sort('timestamp', -1).limit(limit)
-            for doc in cursor:
-                activities.append({
-                    'user': doc.get('username') or doc.get('user') or 'system',
-                    'activity': doc.get('message') or doc.get('action') or 'action',
-                    'time': doc.get('timestamp').isoformat() if doc.get('timestamp') else None,
-                    'status': doc.get('status', 'info')
-                })
-            return activities
-    except Exception:
-        # If any error, continue to fallback
-        pass
+    """Return the most recent activity events for the admin dashboard (initial load for the live stream)."""
+    return recent_activity(db, limit)
 
-    # Fallback: recent chat sessions
-    try:
-        chats = list(db.chat_sessions.find().sort('created_at', -1).limit(limit))
-        for c in chats:
-            activities.append({
-                'user': c.get('username') or c.get('user') or 'unknown',
-                'activity': f"Chat session started ({c.get('messages', 0)} msgs)",
-                'time': c.get('created_at').isoformat() if c.get('created_at') else None,
-                'status': 'success'
-            })
-    except Exception:
-        pass
 
-    # Fallback: recent portfolio updates
-    try:
-        ports = list(db.portfolios.find().sort('updated_at', -1).limit(limit))
-        for p in ports:
-            activities.append({
-                'user': p.get('username') or p.get('owner') or 'unknown',
-                'activity': 'Portfolio updated',
-                'time': p.get('updated_at').isoformat() if p.get('updated_at') else None,
-                'status': 'info'
-            })
-    except Exception:
-        pass
+@router.get('/activity/stream')
+async def stream_activity(
+    request: Request,
+    current_user: dict = Depends(require_admin)
+):
+    """Server-sent events stream of activity as routes emit it."""
+    queue = subscribe_activity()
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(serialize_activity(event))}\n\n"
+        finally:
+            unsubscribe_activity(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get('/index-health')
+async def get_index_health(
+    current_user: dict = Depends(require_admin),
+    db = Depends(get_db)
+):
+    """Explain the app's canonical queries and report which ones fall back to collection scans."""
+    return index_health_report(db)
+
 
-    # Trim to requested limit
-    return activities[:limit]
\ No newline at end of file
+@router.get('/auth-metrics')
+async def get_auth_metrics(current_user: dict = Depends(require_admin)):
+    """Password hashing latency and queue depth for the bcrypt worker pool."""
+    return password_hash_metrics.snapshot()
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from bson import ObjectId
+from bson.errors import InvalidId
+import asyncio
+import json
+
+from app.config import settings
+from app.services.auth import get_current_active_user, get_current_user
+from app.services.alert_service import ALERTS_COLLECTION, alert_engine, validate_alert, create_alert, delete_alert, list_alerts
+from app.services.symbol_index import validate_symbols
+from app.utils.security import get_db, get_shared_db
+
+router = APIRouter()
+
+
+def _serialize(alert: dict) -> dict:
+    return jsonable_encoder({k: v for k, v in alert.items() if k != "email"}, custom_encoder={ObjectId: str})
+
+
+@router.get("/")
+async def get_alerts(
+    current_user: dict = Depends(get_current_active_user),
+    db = Depends(get_db)
+):
+    """The user's alerts, oldest first; triggered ones are inactive with the triggering value."""
+    return [_serialize(alert) for alert in list_alerts(db, current_user["_id"])]
+
+
+@router.post("/")
+async def add_alert(
+    alert_data: dict,
+    current_user: dict = Depends(get_current_active_user),
+    db = Depends(get_db)
+):
+    """Register a one-shot alert.
+
+    Kinds: price_above / price_below (threshold is a price), rsi_cross_above / rsi_cross_below
+    (threshold is an RSI level) and sma_cross_above / sma_cross_below (fast and slow SMA windows,
+    default 20 and 50). Set notify_email to false to only receive it on the alerts WebSocket.
+    """
+    try:
+        condition = validate_alert(alert_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if condition["symbol"] not in await validate_symbols([condition["symbol"]]):
+        raise HTTPException(status_code=400, detail="Invalid stock symbol")
+    active = db[ALERTS_COLLECTION].count_documents({"user_id": str(current_user["_id"]), "active": True})
+    if active >= settings.alert_max_per_user:
+        raise HTTPException(status_code=400, detail=f"At most {settings.alert_max_per_user} active alerts")
+    return _serialize(create_alert(db, current_user, condition))
+
+
+@router.delete("/{alert_id}")
+async def remove_alert(
+    alert_id: str,
+    current_user: dict = Depends(get_current_active_user),
+    db = Depends(get_db)
+):
+    try:
+        object_id = ObjectId(alert_id)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    if not delete_alert(db, current_user["_id"], object_id):
+        raise HTTPException(status_code=404, detail="Alert not found")
+    return {"message": "Alert deleted successfully"}
+
+
+@router.websocket("/ws")
+async def alert_stream(websocket: WebSocket):
+    """The signed-in user's alert topic: {"type": "alert", ...} for each alert as it triggers.
+
+    Authenticated like HTTP requests, from the access_token cookie or an Authorization header;
+    inactive accounts are refused.
+    """
+    try:
+        user = await get_current_active_user(await get_current_user(websocket, get_shared_db()))
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    user_id = str(user["_id"])
+    queue = alert_engine.subscribe(user_id)
+
+    async def pump():
+        while True:
+            event = await queue.get()
+            await websocket.send_text(json.dumps(event))
+
+    sender = asyncio.create_task(pump())
+    try:
+        while True:
+            # Nothing is expected from the client; reading detects the disconnect
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        alert_engine.unsubscribe(user_id, queue)
@@ -20,7 +20,9 @@ from app.services.auth import (
     get_current_active_user,
     get_current_user
 )
-from app.utils.security import get_db, get_password_hash
+from app.utils.security import get_db, get_password_hash_async
+from app.services.user_search import search_keys, invalidate_user_counts
+from app.services.activity_service import emit_activity
 
 load_dotenv()
 
@@ -35,6 +37,7 @@ async def login_for_access_token(
 ):
     user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
+        emit_activity(form_data.username, "Failed login", "error")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -47,6 +50,8 @@ async def login_for_access_token(
         expires_delta=access_token_expires
     )
     
+    emit_activity(user["username"], "Logged in", "success")
+    
     # Set cookie
     response.set_cookie(
         key="access_token",
@@ -68,7 +73,7 @@ async def signup(user_data: dict, db = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user_data["password"])
+    hashed_password = await get_password_hash_async(user_data["password"])
     user = {
         "username": user_data["username"],
         "email": user_data["email"],
@@ -77,10 +82,13 @@ async def signup(user_data: dict, db = Depends(get_db)):
         "role": "user",
         "is_active": True,
         "created_at": datetime.utcnow(),
-        "email_verified": False
+        "email_verified": False,
+        **search_keys(user_data)
     }
     
     result = db.users.insert_one(user)
+    invalidate_user_counts()
+    emit_activity(user["username"], "Signed up", "success")
     user["_id"] = str(result.inserted_id)
     
     return {"message": "User created successfully", "user_id": user["_id"]}
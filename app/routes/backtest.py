@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+
+from app.services.auth import get_current_active_user
+from app.services.backtest import STRATEGIES, backtest_symbol, strategy_params, sweep_symbols
+from app.utils.chart_renderer import render_chart_data_uri
+
+router = APIRouter()
+
+
+@router.get("/")
+async def run_backtest(
+    request: Request,
+    symbol: str = Query(...),
+    strategy: str = Query("sma_crossover", description="sma_crossover, rsi_reversion or bollinger_breakout"),
+    fee_bps: float = Query(10.0, ge=0, le=500),
+    slippage_bps: float = Query(5.0, ge=0, le=500),
+    days: int = Query(504, ge=60, le=2520, description="Trading days of history to test over (at most the cached OHLCV_HISTORY_PERIOD)"),
+    image: bool = Query(False, description="Also render the equity chart as a PNG data URI (for reports)"),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Backtest one strategy on one symbol's cached daily bars.
+
+    Strategy parameters are passed as extra query parameters (e.g. fast=10&slow=30 for
+    sma_crossover); missing ones use the strategy defaults.
+    """
+    if strategy not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Strategy must be one of {', '.join(STRATEGIES)}")
+    overrides = {k: v for k, v in request.query_params.items() if k in STRATEGIES[strategy]}
+    try:
+        params = strategy_params(strategy, overrides)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = await backtest_symbol(symbol.upper(), strategy, params, fee_bps, slippage_bps, days)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Not enough price history for this symbol")
+    if image:
+        result["chart_image"] = await render_chart_data_uri(result["chart"])
+    return result
+
+
+@router.post("/sweep")
+async def run_parameter_sweep(
+    sweep: dict,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Parameter sweep: {"symbols": [...], "strategy": ..., "grid": {"fast": [10, 20], "slow": [50, 100]},
+    "fee_bps": 10, "slippage_bps": 5, "days": 504, "top": 20}. Returns the best `top` runs by Sharpe ratio."""
+    symbols = list(dict.fromkeys(str(s).strip().upper() for s in sweep.get("symbols") or [] if str(s).strip()))
+    strategy = sweep.get("strategy", "sma_crossover")
+    grid = sweep.get("grid") or {}
+    if not symbols:
+        raise HTTPException(status_code=400, detail="At least one symbol is required")
+    if strategy not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Strategy must be one of {', '.join(STRATEGIES)}")
+    if not isinstance(grid, dict) or not all(isinstance(v, list) and v for v in grid.values()):
+        raise HTTPException(status_code=400, detail="grid must map parameter names to non-empty lists")
+    unknown = [name for name in grid if name not in STRATEGIES[strategy]]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown parameter(s) for {strategy}: {', '.join(unknown)}")
+    try:
+        fee_bps = float(sweep.get("fee_bps", 10.0))
+        slippage_bps = float(sweep.get("slippage_bps", 5.0))
+        days = int(sweep.get("days", 504))
+        top = int(sweep.get("top", 20))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="fee_bps, slippage_bps, days and top must be numbers")
+    if not 60 <= days <= 2520 or fee_bps < 0 or slippage_bps < 0:
+        raise HTTPException(status_code=400, detail="days must be 60-2520 and costs non-negative")
+
+    try:
+        result = await sweep_symbols(symbols, strategy, grid, fee_bps, slippage_bps, days)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not result["symbols"]:
+        raise HTTPException(status_code=404, detail="Not enough price history for these symbols")
+    result["results"] = result["results"][:max(top, 1)]
+    return result
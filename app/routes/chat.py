@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query, Response
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 from pymongo import MongoClient
 from bson import ObjectId
 
 from app.config import settings
 from app.services.auth import get_current_active_user
+from app.services.chat_persistence import ChatPersistenceService, SESSION_SUMMARY_FIELDS, serialize_session
 from app.services.llm_service import llm_service
+from app.services.activity_service import emit_activity
+from app.services.dashboard_service import invalidate_dashboard
 from app.services.stock_service import StockDataService
 from app.utils.security import get_db
+from app.utils.pagination import encode_cursor, keyset_filter, parse_since
 
 router = APIRouter()
 
@@ -46,163 +50,147 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str, db: MongoClient
     }
     await manager.send_personal_message(json.dumps(welcome_message), websocket)
 
+    chat_store = ChatPersistenceService(db)
+
     try:
         while True:
             data = await websocket.receive_text()
             message_data = json.loads(data)
             
-            # Save user message to database (ensure all required fields)
+            # Store the user message right away so a dropped socket cannot lose it;
+            # the AI reply and the session counters follow at the end of the turn
             session_id = message_data.get("session_id", "")
-            chat_message = {
-                "session_id": session_id,
-                "user_id": user_id,
+            user_message = {
                 "message_type": "user",
                 "content": message_data.get("content", ""),
                 "timestamp": datetime.utcnow(),
                 "metadata": message_data.get("metadata", {})
             }
-            db.chat_messages.insert_one(chat_message)
-            # Update session's message count and timestamp
-            # Match by session_id field (session ids are stored as strings in session_id)
-            res = db.chat_sessions.update_one(
-                {"session_id": session_id, "user_id": user_id},
-                {"$inc": {"message_count": 1}, "$set": {"updated_at": datetime.utcnow()}},
-                upsert=False
-            )
-            # Fallback: try matching by ObjectId if session_id looks like an ObjectId
-            if res.matched_count == 0:
-                try:
-                    obj_id = ObjectId(session_id)
-                    db.chat_sessions.update_one(
-                        {"_id": obj_id, "user_id": user_id},
-                        {"$inc": {"message_count": 1}, "$set": {"updated_at": datetime.utcnow()}},
-                        upsert=False
-                    )
-                except Exception:
-                    pass
-
-            # Broadcast session update to all connected clients
-            try:
-                session_summary = db.chat_sessions.find_one({"session_id": session_id})
-                if session_summary:
-                    # Ensure we send both _id and session_id strings
-                    session_summary["_id"] = str(session_summary.get("_id"))
-                    session_summary["session_id"] = str(session_summary.get("session_id") or session_summary.get("_id"))
-                    session_summary["updated_at"] = session_summary["updated_at"].isoformat() if isinstance(session_summary.get("updated_at"), datetime) else session_summary.get("updated_at")
-                    await manager.broadcast(json.dumps({"type": "session_update", "session": session_summary}))
-            except Exception:
-                pass
+            # Written now, not batched with the reply, so it survives a failed or interrupted turn
+            chat_store.store_messages(session_id, user_id, [user_message])
             
             # --- Get AI response (Streaming) ---
             final_ai_content = ""
             context = "" # Context can be built here if needed for specific queries
 
-            async with StockDataService() as stock_service:
-                # For general chat, we now use the streaming endpoint
-                response_stream = await llm_service.get_streaming_llm_response(
-                    prompt=message_data.get("content"),
-                    context=context, # You can build a context here for specific queries
-                    conversation_history=message_data.get("history", [])
-                )
-
-                # Send response back to client chunk by chunk
-                for chunk in response_stream:
-                    if chunk.text:
-                        chunk_text = chunk.text
-                        final_ai_content += chunk_text
-                        response_data = json.dumps({
-                            "type": "stream",
-                            "content": chunk_text
-                        })
-                        await manager.send_personal_message(response_data, websocket)
+            try:
+                async with StockDataService() as stock_service:
+                    # For general chat, we now use the streaming endpoint
+                    response_stream = await llm_service.get_streaming_llm_response(
+                        prompt=message_data.get("content"),
+                        context=context, # You can build a context here for specific queries
+                        conversation_history=message_data.get("history", [])
+                    )
 
-            # Send an end-of-stream message
-            await manager.send_personal_message(json.dumps({"type": "stream_end"}), websocket)
+                    # Send response back to client chunk by chunk
+                    for chunk in response_stream:
+                        if chunk.text:
+                            chunk_text = chunk.text
+                            final_ai_content += chunk_text
+                            response_data = json.dumps({
+                                "type": "stream",
+                                "content": chunk_text
+                            })
+                            await manager.send_personal_message(response_data, websocket)
+
+                # Send an end-of-stream message
+                await manager.send_personal_message(json.dumps({"type": "stream_end"}), websocket)
+            finally:
+                # Save the reply even if streaming failed or the client went away
+                ai_message = {
+                    "message_type": "ai",
+                    "content": final_ai_content if final_ai_content else "I am unable to respond at the moment.",
+                    "timestamp": datetime.utcnow(),
+                    "metadata": {"type": message_data.get("type", "")}
+                }
+                session_summary = chat_store.record_turn(session_id, user_id, [ai_message], stored_earlier=1)
 
-            # Save AI response to database (ensure all required fields)
-            ai_message = {
-                "session_id": session_id,
-                "user_id": user_id,
-                "message_type": "ai",
-                "content": final_ai_content if final_ai_content else "I am unable to respond at the moment.",
-                "timestamp": datetime.utcnow(),
-                "metadata": {"type": message_data.get("type", "")}
-            }
-            db.chat_messages.insert_one(ai_message)
-            # Update session's message count and timestamp
-            res2 = db.chat_sessions.update_one(
-                {"session_id": session_id, "user_id": user_id},
-                {"$inc": {"message_count": 1}, "$set": {"updated_at": datetime.utcnow()}},
-                upsert=False
-            )
-            if res2.matched_count == 0:
+            # Broadcast session update to all connected clients
+            if session_summary:
+                invalidate_dashboard(session_summary.get("user_id"))
                 try:
-                    obj_id = ObjectId(session_id)
-                    db.chat_sessions.update_one(
-                        {"_id": obj_id, "user_id": user_id},
-                        {"$inc": {"message_count": 1}, "$set": {"updated_at": datetime.utcnow()}},
-                        upsert=False
-                    )
+                    await manager.broadcast(json.dumps({"type": "session_update", "session": session_summary}))
                 except Exception:
                     pass
-
-            # Broadcast session update after AI response
-            try:
-                session_summary = db.chat_sessions.find_one({"session_id": session_id})
-                if session_summary:
-                    session_summary["_id"] = str(session_summary.get("_id"))
-                    session_summary["session_id"] = str(session_summary.get("session_id") or session_summary.get("_id"))
-                    session_summary["updated_at"] = session_summary["updated_at"].isoformat() if isinstance(session_summary.get("updated_at"), datetime) else session_summary.get("updated_at")
-                    await manager.broadcast(json.dumps({"type": "session_update", "session": session_summary}))
-            except Exception:
-                pass
             
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
+# Fields returned by the message history endpoint
+MESSAGE_FIELDS = {"_id": 1, "session_id": 1, "message_type": 1, "content": 1, "timestamp": 1, "metadata": 1}
+
+# Overlap applied to sync tokens so writes racing the poll are not missed (clients dedupe by id)
+SYNC_OVERLAP = timedelta(seconds=2)
+
 @router.get("/sessions")
 async def get_chat_sessions(
+    response: Response,
     current_user: dict = Depends(get_current_active_user),
     user_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
     db = Depends(get_db)
 ):
+    """List chat sessions newest first, keyset-paginated by (updated_at, _id).
+
+    `cursor` continues from the `X-Next-Cursor` header of the previous page. `since` returns
+    only sessions updated at or after that time; pass back the `X-Sync-Token` header to poll.
+    Sessions deleted since then are listed in the `X-Deleted-Sessions` header (comma-separated).
+    """
     # Admins may request sessions for any user by passing user_id
     if getattr(current_user, 'get', False) and current_user.get('role') == 'admin' and user_id:
         target_user_id = user_id
     else:
         target_user_id = str(current_user["_id"])
 
-    sessions = list(db.chat_sessions.find(
-        {"user_id": target_user_id}
-    ).sort("updated_at", -1))
-    
-    for session in sessions:
-        session["_id"] = str(session["_id"])
-        # Ensure session_id is always present and string
-        session["session_id"] = str(session.get("session_id") or session["_id"])
-        if isinstance(session.get("created_at"), datetime):
-            session["created_at"] = session["created_at"].isoformat()
-        if isinstance(session.get("updated_at"), datetime):
-            session["updated_at"] = session["updated_at"].isoformat()
-    
-    return sessions
+    sync_token = datetime.utcnow() - SYNC_OVERLAP
+    query = {"user_id": target_user_id}
+    if since:
+        since_at = parse_since(since)
+        query["updated_at"] = {"$gte": since_at}
+        deleted = db.chat_session_deletions.find(
+            {"user_id": target_user_id, "deleted_at": {"$gte": since_at}}, {"session_id": 1}
+        )
+        response.headers["X-Deleted-Sessions"] = ",".join(d["session_id"] for d in deleted)
+    if cursor:
+        query.update(keyset_filter("updated_at", cursor, descending=True))
+
+    sessions = list(db.chat_sessions.find(query, SESSION_SUMMARY_FIELDS)
+                    .sort([("updated_at", -1), ("_id", -1)])
+                    .limit(limit))
+
+    if len(sessions) == limit and isinstance(sessions[-1].get("updated_at"), datetime):
+        response.headers["X-Next-Cursor"] = encode_cursor(sessions[-1]["updated_at"], sessions[-1]["_id"])
+    response.headers["X-Sync-Token"] = sync_token.isoformat()
+
+    return [serialize_session(session) for session in sessions]
 
 @router.get("/sessions/{session_id}/messages")
 async def get_session_messages(
     session_id: str,
+    response: Response,
     current_user: dict = Depends(get_current_active_user),
+    limit: int = Query(200, ge=1, le=1000),
+    cursor: Optional[str] = None,
     db = Depends(get_db)
 ):
-    from bson import ObjectId
-    
+    """List a session's messages oldest first, keyset-paginated by (timestamp, _id)."""
     user_id_str = str(current_user["_id"])
     # Allow admins to fetch messages for any session; regular users can only fetch their own
     if current_user.get('role') == 'admin':
         query = {"session_id": session_id}
     else:
         query = {"session_id": session_id, "user_id": user_id_str}
+    if cursor:
+        query.update(keyset_filter("timestamp", cursor, descending=False))
+
+    messages = list(db.chat_messages.find(query, MESSAGE_FIELDS)
+                    .sort([("timestamp", 1), ("_id", 1)])
+                    .limit(limit))
 
-    messages = list(db.chat_messages.find(query).sort("timestamp", 1))
+    if len(messages) == limit and isinstance(messages[-1].get("timestamp"), datetime):
+        response.headers["X-Next-Cursor"] = encode_cursor(messages[-1]["timestamp"], messages[-1]["_id"])
     
     for message in messages:
         message["_id"] = str(message["_id"])
@@ -232,6 +220,8 @@ async def create_chat_session(
     }
     
     db.chat_sessions.insert_one(session)
+    invalidate_dashboard(current_user["_id"])
+    emit_activity(current_user.get("username"), "Started a chat session", "success")
     
     # Return a dictionary that is JSON serializable
     return {"_id": str(new_session_id), "session_id": str(new_session_id), "title": session["title"]}
@@ -252,7 +242,13 @@ async def delete_chat_session(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Also delete associated messages
+    # Also delete associated messages, and leave a tombstone for clients syncing with `since`
     db.chat_messages.delete_many({"session_id": session_id})
+    db.chat_session_deletions.insert_one({
+        "user_id": str(current_user["_id"]),
+        "session_id": session_id,
+        "deleted_at": datetime.utcnow()
+    })
+    invalidate_dashboard(current_user["_id"])
     
     return {"message": "Session deleted successfully"}
\ No newline at end of file
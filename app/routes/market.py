@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+import asyncio
+import json
+
+from app.config import settings
+from app.services.auth import get_current_active_user, get_current_user
+from app.services.market_data_hub import market_hub
+from app.utils.security import get_shared_db
+
+router = APIRouter()
+
+
+def _parse_symbols(value) -> list:
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list):
+        return []
+    symbols = [s.strip().upper() for s in value if isinstance(s, str) and s.strip()]
+    return list(dict.fromkeys(symbols))[:settings.market_batch_size]
+
+
+@router.get("/quotes")
+async def get_quotes(
+    symbols: str = Query(..., description="Comma-separated symbols"),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Latest quotes from the shared market data cache, keyed by symbol."""
+    return await market_hub.get_quotes(_parse_symbols(symbols))
+
+
+def _offer(queue: asyncio.Queue, item):
+    """Queue `item`, dropping the oldest queued batch if the consumer has fallen behind."""
+    try:
+        queue.put_nowait(item)
+    except asyncio.QueueFull:
+        queue.get_nowait()
+        queue.put_nowait(item)
+
+
+@router.websocket("/ws")
+async def market_stream(websocket: WebSocket):
+    """Live quote topics for signed-in users (access_token cookie or Authorization header).
+
+    Clients send {"subscribe": [...]} and {"unsubscribe": [...]}; a connection follows at most
+    MARKET_WS_MAX_SYMBOLS symbols and further subscriptions are ignored. The server sends
+    {"type": "quotes", "quotes": {symbol: quote}}: the cached quotes right after a subscribe, then
+    only the symbols whose price moved on each hub poll.
+    """
+    try:
+        await get_current_active_user(await get_current_user(websocket, get_shared_db()))
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    queue = market_hub.subscribe()
+    subscribed = set()
+
+    async def pump():
+        while True:
+            quotes = await queue.get()
+            await websocket.send_text(json.dumps({"type": "quotes", "quotes": quotes}))
+
+    sender = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if not isinstance(message, dict):
+                continue
+            removed = _parse_symbols(message.get("unsubscribe"))
+            subscribed.difference_update(removed)
+            room = max(settings.market_ws_max_symbols - len(subscribed), 0)
+            added = [s for s in _parse_symbols(message.get("subscribe")) if s not in subscribed][:room]
+            subscribed.update(added)
+            market_hub.update_subscription(queue, add=added, remove=removed)
+            if added:
+                snapshot = await market_hub.get_quotes(added)
+                if snapshot:
+                    _offer(queue, snapshot)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        market_hub.unsubscribe(queue)
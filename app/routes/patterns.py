@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.services.auth import get_current_active_user
+from app.services.pattern_scanner import MAX_PATTERN_SYMBOLS, PATTERNS, scan_symbols
+from app.services.symbol_index import validate_symbols
+from app.utils.security import get_db
+
+router = APIRouter()
+
+
+@router.get("/")
+async def get_pattern_signals(
+    symbols: str = Query("", description="Comma-separated symbols (at most 50); defaults to your watchlist"),
+    pattern: str = Query("", description="Only this pattern (see /types)"),
+    days: int = Query(30, ge=1, le=365, description="Signals from the last `days` calendar days"),
+    current_user: dict = Depends(get_current_active_user),
+    db = Depends(get_db)
+):
+    """Candlestick and price/volume pattern signals per symbol, newest first."""
+    if pattern and pattern not in PATTERNS:
+        raise HTTPException(status_code=400, detail=f"Pattern must be one of {', '.join(PATTERNS)}")
+    wanted = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if len(wanted) > MAX_PATTERN_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_PATTERN_SYMBOLS} symbols allowed")
+    if wanted:
+        valid = await validate_symbols(wanted)
+        unknown = [s for s in wanted if s not in valid]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown symbol(s): {', '.join(unknown)}")
+    else:
+        wanted = await asyncio.to_thread(db.watchlists.distinct, "symbol", {"user_id": str(current_user["_id"])})
+    if not wanted:
+        return {"symbols": {}, "since": None}
+
+    since = (datetime.utcnow() - timedelta(days=days)).date().isoformat()
+    signals = await scan_symbols(wanted)
+    return {
+        "since": since,
+        "symbols": {
+            symbol: [s for s in reversed(items) if s["date"] >= since and (not pattern or s["pattern"] == pattern)]
+            for symbol, items in signals.items()
+        },
+    }
+
+
+@router.get("/types")
+async def get_pattern_types(current_user: dict = Depends(get_current_active_user)):
+    return [{"pattern": name, "label": label, "direction": direction} for name, (label, direction) in PATTERNS.items()]
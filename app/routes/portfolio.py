@@ -1,14 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any
+import asyncio
+import numpy as np
 from datetime import datetime
 from pymongo import MongoClient
 
 from app.config import settings
 from app.services.auth import get_current_active_user
-from app.services.stock_service import StockDataService
-from app.utils.security import get_db
+from app.services.stock_service import StockDataService, quote_price
+from app.services.portfolio_valuation import revalue_holdings
+from app.services.holdings_store import (
+    find_portfolio, load_positions, portfolio_totals, open_lots, add_lot, close_position, write_marks
+)
+from app.services.market_data_hub import market_hub
+from app.services.risk_engine import portfolio_risk, sector_weights, position_quantities
+from app.services.optimizer import OPTIMIZATION_METHODS, optimize_weights, rebalance_trades
+from app.services.var_engine import portfolio_var
+from app.services.nav_service import trade_day, mark_nav_dirty, update_nav, nav_series, performance_metrics
+from app.utils.chart_renderer import line_chart_spec
+from app.services.portfolio_import import (
+    LotBook, import_hash, imported_hashes, iter_csv_records, map_columns, parse_trade, write_chunk
+)
+from app.services.symbol_index import remember_symbols, validate_symbols
+from app.utils.security import get_db, get_shared_db
 import json
 from app.routes.chat import manager as chat_manager
+from app.services.activity_service import emit_activity
+from app.services.dashboard_service import invalidate_dashboard
 
 router = APIRouter()
 
@@ -17,10 +36,10 @@ async def get_user_portfolio(
     current_user: dict = Depends(get_current_active_user),
     db = Depends(get_db)
 ):
-    portfolio = db.portfolios.find_one({"user_id": current_user["_id"]})
+    portfolio = find_portfolio(db, current_user["_id"])
     
     if not portfolio:
-        # Create default portfolio if doesn't exist
+        # Create default portfolio if doesn't exist; positions live in portfolio_lots
         portfolio = {
             "user_id": current_user["_id"],
             "name": "My Portfolio",
@@ -29,11 +48,14 @@ async def get_user_portfolio(
             "updated_at": datetime.utcnow(),
             "total_value": 0,
             "cash_balance": 0,
-            "holdings": []
+            "lots_migrated": True
         }
         result = db.portfolios.insert_one(portfolio)
         portfolio["_id"] = str(result.inserted_id)
+        portfolio["holdings"] = []
     else:
+        portfolio["holdings"] = load_positions(db, portfolio["_id"])
+        portfolio["total_value"], _ = portfolio_totals(portfolio["holdings"], portfolio.get("cash_balance", 0))
         portfolio["_id"] = str(portfolio["_id"])
     
     return portfolio
@@ -43,53 +65,33 @@ async def get_portfolio_holdings(
     current_user: dict = Depends(get_current_active_user),
     db = Depends(get_db)
 ):
-    portfolio = db.portfolios.find_one({"user_id": current_user["_id"]})
+    portfolio = find_portfolio(db, current_user["_id"])
     
     if not portfolio:
         return []
     
-    # Update current prices
+    holdings = load_positions(db, portfolio["_id"])
+    if not holdings:
+        return []
+
+    # Revalue every holding from one batched quote read (kept warm by the market data hub).
+    # Only moved marks are written; position documents are never touched by revaluation.
     async with StockDataService() as stock_service:
-        updated_holdings = []
-        total_value = 0
-        
-        for holding in portfolio.get("holdings", []):
-            symbol = holding["symbol"]
-            quote = await stock_service.get_stock_quote(symbol)
-            current_price = float(quote.get('05. price', holding.get('current_price', 0)))
-            
-            updated_holding = {
-                **holding,
-                "current_price": current_price,
-                "total_value": holding["quantity"] * current_price,
-                "unrealized_pnl": (current_price - holding["average_cost"]) * holding["quantity"],
-                "unrealized_pnl_percent": ((current_price - holding["average_cost"]) / holding["average_cost"]) * 100
-            }
-            
-            updated_holdings.append(updated_holding)
-            total_value += updated_holding["total_value"]
-        
-        # Update portfolio total value
-        db.portfolios.update_one(
-            {"user_id": current_user["_id"]},
-            {
-                "$set": {
-                    "holdings": updated_holdings,
-                    "total_value": total_value + portfolio.get("cash_balance", 0),
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
+        quotes = await market_hub.get_quotes([h["symbol"] for h in holdings], service=stock_service)
+    prices = {symbol: quote_price(quote) for symbol, quote in quotes.items() if quote_price(quote) is not None}
+    updated_holdings, holdings_value, changed = revalue_holdings(holdings, prices)
+    total_value = holdings_value + portfolio.get("cash_balance", 0)
+
+    if changed:
+        write_marks(db, {updated_holdings[i]["symbol"]: updated_holdings[i]["current_price"] for i in changed})
+        invalidate_dashboard(current_user["_id"])
 
         # Broadcast portfolio update to connected clients
         try:
-            portfolio_summary = db.portfolios.find_one({"user_id": current_user["_id"]})
-            if portfolio_summary:
-                portfolio_summary["_id"] = str(portfolio_summary["_id"])
-                await chat_manager.broadcast(json.dumps({"type": "portfolio_update", "portfolio": {
-                    "total_value": portfolio_summary.get("total_value"),
-                    "cash_balance": portfolio_summary.get("cash_balance", 0)
-                }}))
+            await chat_manager.broadcast(json.dumps({"type": "portfolio_update", "portfolio": {
+                "total_value": total_value,
+                "cash_balance": portfolio.get("cash_balance", 0)
+            }}))
         except Exception:
             pass
     
@@ -108,59 +110,28 @@ async def add_holding(
     if quantity <= 0 or price <= 0:
         raise HTTPException(status_code=400, detail="Invalid quantity or price")
     
+    # Trades may be backdated; NAV history is recomputed from the trade date
+    try:
+        trade_date = trade_day(holding_data.get("trade_date") or datetime.utcnow())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid trade date")
+    if trade_date > trade_day(datetime.utcnow()):
+        raise HTTPException(status_code=400, detail="Trade date cannot be in the future")
+    
     # Get current stock price for validation
     async with StockDataService() as stock_service:
         quote = await stock_service.get_stock_quote(symbol)
-        if not quote or '05. price' not in quote:
+        if quote_price(quote) is None:
             raise HTTPException(status_code=400, detail="Invalid stock symbol")
     
-    portfolio = db.portfolios.find_one({"user_id": current_user["_id"]})
+    portfolio = find_portfolio(db, current_user["_id"])
     
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     
-    # Check if holding already exists
-    existing_holding = None
-    for holding in portfolio.get("holdings", []):
-        if holding["symbol"] == symbol:
-            existing_holding = holding
-            break
-    
-    if existing_holding:
-        # Update existing holding (average cost)
-        total_quantity = existing_holding["quantity"] + quantity
-        total_cost = (existing_holding["quantity"] * existing_holding["average_cost"]) + (quantity * price)
-        average_cost = total_cost / total_quantity
-        
-        db.portfolios.update_one(
-            {"user_id": current_user["_id"], "holdings.symbol": symbol},
-            {
-                "$set": {
-                    "holdings.$.quantity": total_quantity,
-                    "holdings.$.average_cost": average_cost,
-                    "holdings.$.current_price": price,
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
-    else:
-        # Add new holding
-        new_holding = {
-            "symbol": symbol,
-            "quantity": quantity,
-            "average_cost": price,
-            "current_price": price,
-            "total_value": quantity * price,
-            "added_at": datetime.utcnow()
-        }
-        
-        db.portfolios.update_one(
-            {"user_id": current_user["_id"]},
-            {
-                "$push": {"holdings": new_holding},
-                "$set": {"updated_at": datetime.utcnow()}
-            }
-        )
+    # Every buy opens its own lot; the average cost is derived from the open lots when read
+    add_lot(db, portfolio["_id"], symbol, quantity, price, trade_date)
+    db.portfolios.update_one({"_id": portfolio["_id"]}, {"$set": {"updated_at": datetime.utcnow()}})
     
     # Add transaction record
     transaction = {
@@ -172,43 +143,167 @@ async def add_holding(
         "total_amount": quantity * price,
         "fee": 0.0,
         "timestamp": datetime.utcnow(),
+        "trade_date": trade_date,
         "notes": holding_data.get("notes", "")
     }
     
     db.transactions.insert_one(transaction)
+    mark_nav_dirty(db, portfolio["_id"], trade_date)
+    invalidate_dashboard(current_user["_id"])
+    emit_activity(current_user.get("username"), f"Added {quantity:g} {symbol} to portfolio", "info")
 
     # Broadcast portfolio change event
     try:
-        portfolio_summary = db.portfolios.find_one({"user_id": current_user["_id"]})
-        if portfolio_summary:
-            await chat_manager.broadcast(json.dumps({"type": "portfolio_update", "portfolio": {
-                "total_value": portfolio_summary.get("total_value"),
-                "cash_balance": portfolio_summary.get("cash_balance", 0)
-            }}))
+        cash_balance = portfolio.get("cash_balance", 0)
+        total_value, _ = portfolio_totals(load_positions(db, portfolio["_id"]), cash_balance)
+        await chat_manager.broadcast(json.dumps({"type": "portfolio_update", "portfolio": {
+            "total_value": total_value,
+            "cash_balance": cash_balance
+        }}))
     except Exception:
         pass
     
     return {"message": "Holding added successfully"}
 
+@router.post("/import")
+async def import_transactions(
+    request: Request,
+    current_user: dict = Depends(get_current_active_user),
+    db = Depends(get_db)
+):
+    """Import a broker transaction CSV sent as the raw request body (Content-Type: text/csv).
+
+    Rows are parsed as the body streams in and applied in file order (oldest first) with FIFO lot
+    accounting; rows already imported (same content hash) are rejected. A row dated before an earlier
+    row or open lot of its symbol stops the import. Every IMPORT_CHUNK_SIZE rows, the ledger and the
+    touched symbols' changed lots are written with bulk_write. The response is NDJSON: "progress" lines
+    per chunk, "error" lines for rejected rows (the first 100), then a final "done" summary.
+    """
+    portfolio = find_portfolio(db, current_user["_id"])
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    lots = open_lots(db, portfolio["_id"], with_ids=True)
+    
+    async def run_import():
+        # Request-scoped dependencies are closed once streaming starts; write through the shared client
+        shared_db = get_shared_db()
+        book = LotBook(lots)
+        remember_symbols(book.lots)
+        stats = {"rows": 0, "imported": 0, "errors": 0}
+        earliest = None
+        columns = None
+        chunk: List[Dict] = []
+        seen: Dict[str, int] = {}
+        stopped = False
+        
+        def error(row, message):
+            stats["errors"] += 1
+            if stats["errors"] <= 100:
+                return json.dumps({"type": "error", "row": row, "message": message}) + "\n"
+            return ""
+        
+        async def flush():
+            nonlocal earliest, stopped
+            valid = await validate_symbols(t["symbol"] for _, t in chunk)
+            done = await asyncio.to_thread(imported_hashes, shared_db, portfolio["_id"], [t["import_hash"] for _, t in chunk])
+            candidates, applied, last_prices, lines = [], [], {}, []
+            for row, trade in chunk:
+                if trade["import_hash"] in done:
+                    lines.append(error(row, "Already imported"))
+                elif trade["symbol"] not in valid:
+                    lines.append(error(row, f"Unknown symbol {trade['symbol']}"))
+                else:
+                    candidates.append((row, trade))
+            problem = book.order_problem([t for _, t in candidates])
+            if problem is not None:
+                # Nothing from this chunk is written; earlier chunks stay imported
+                stopped = True
+                lines.append(error(candidates[problem[0]][0], problem[1]))
+                candidates = []
+            for row, trade in candidates:
+                try:
+                    trade["realized_pnl"] = book.apply(trade)
+                except ValueError as e:
+                    lines.append(error(row, str(e)))
+                    continue
+                applied.append(trade)
+                last_prices[trade["symbol"]] = trade["price"]
+                earliest = min(earliest or trade["trade_date"], trade["trade_date"])
+            if applied:
+                await asyncio.to_thread(write_chunk, shared_db, portfolio["_id"], applied, book, last_prices)
+            stats["imported"] += len(applied)
+            chunk.clear()
+            lines.append(json.dumps({"type": "progress", **stats}) + "\n")
+            return "".join(lines)
+        
+        try:
+            async for fields in iter_csv_records(request.stream()):
+                if columns is None:
+                    columns = map_columns(fields)
+                    continue
+                stats["rows"] += 1
+                try:
+                    trade = parse_trade(fields, columns)
+                    trade["import_hash"] = import_hash(trade, seen)
+                    chunk.append((stats["rows"], trade))
+                except ValueError as e:
+                    yield error(stats["rows"], str(e))
+                if len(chunk) >= settings.import_chunk_size:
+                    yield await flush()
+                    if stopped:
+                        break
+            if chunk and not stopped:
+                yield await flush()
+        except ValueError as e:
+            # Header problems abort the import before anything is written
+            yield json.dumps({"type": "error", "row": 0, "message": str(e)}) + "\n"
+        finally:
+            if earliest:
+                mark_nav_dirty(shared_db, portfolio["_id"], earliest)
+                invalidate_dashboard(current_user["_id"])
+                emit_activity(current_user.get("username"), f"Imported {stats['imported']} transactions", "info")
+        yield json.dumps({"type": "done", **stats, "stopped": stopped}) + "\n"
+    
+    return StreamingResponse(run_import(), media_type="application/x-ndjson")
+
 @router.delete("/holdings/{symbol}")
 async def remove_holding(
     symbol: str,
     current_user: dict = Depends(get_current_active_user),
     db = Depends(get_db)
 ):
-    portfolio = db.portfolios.find_one({"user_id": current_user["_id"]})
+    portfolio = find_portfolio(db, current_user["_id"])
     
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     
+    symbol = symbol.upper()
+    holding = next((h for h in load_positions(db, portfolio["_id"]) if h["symbol"] == symbol), None)
+    
     # Remove holding
-    db.portfolios.update_one(
-        {"user_id": current_user["_id"]},
-        {
-            "$pull": {"holdings": {"symbol": symbol.upper()}},
-            "$set": {"updated_at": datetime.utcnow()}
-        }
-    )
+    close_position(db, portfolio["_id"], symbol)
+    db.portfolios.update_one({"_id": portfolio["_id"]}, {"$set": {"updated_at": datetime.utcnow()}})
+    
+    # Record the sale in the ledger so NAV history drops the position from today
+    if holding:
+        price = holding.get("current_price", holding["average_cost"])
+        today = trade_day(datetime.utcnow())
+        db.transactions.insert_one({
+            "portfolio_id": str(portfolio["_id"]),
+            "symbol": symbol,
+            "type": "sell",
+            "quantity": holding["quantity"],
+            "price": price,
+            "total_amount": holding["quantity"] * price,
+            "fee": 0.0,
+            "timestamp": datetime.utcnow(),
+            "trade_date": today,
+            "notes": "Holding removed"
+        })
+        mark_nav_dirty(db, portfolio["_id"], today)
+    
+    invalidate_dashboard(current_user["_id"])
+    emit_activity(current_user.get("username"), f"Removed {symbol} from portfolio", "info")
     
     return {"message": "Holding removed successfully"}
 
@@ -217,7 +312,7 @@ async def get_portfolio_analysis(
     current_user: dict = Depends(get_current_active_user),
     db = Depends(get_db)
 ):
-    portfolio = db.portfolios.find_one({"user_id": current_user["_id"]})
+    portfolio = find_portfolio(db, current_user["_id"])
     
     if not portfolio:
         return {
@@ -231,45 +326,186 @@ async def get_portfolio_analysis(
         }
     
     # Calculate portfolio metrics
+    holdings = load_positions(db, portfolio["_id"])
+    cash_balance = portfolio.get("cash_balance", 0)
     total_invested = 0
-    total_value = portfolio.get("cash_balance", 0)
-    sector_allocation = {}
+    total_value = cash_balance
     
-    for holding in portfolio.get("holdings", []):
+    for holding in holdings:
         invested = holding["quantity"] * holding["average_cost"]
         current_value = holding["quantity"] * holding.get("current_price", holding["average_cost"])
         
         total_invested += invested
         total_value += current_value
-        
-        # Simple sector allocation (would need actual sector data)
-        sector = "Technology"  # This should come from stock data
-        sector_allocation[sector] = sector_allocation.get(sector, 0) + current_value
     
     total_pnl = total_value - total_invested
     total_pnl_percent = (total_pnl / total_invested * 100) if total_invested > 0 else 0
     
-    # Normalize sector allocation to percentages
-    for sector in sector_allocation:
-        sector_allocation[sector] = (sector_allocation[sector] / total_value) * 100
+    # Sector weights come from cached company overviews; risk from cached daily bars
+    async with StockDataService() as stock_service:
+        sector_allocation, risk = await asyncio.gather(
+            sector_weights(holdings, cash_balance, stock_service),
+            portfolio_risk(holdings)
+        )
+    
+    # Daily change and returns come from the NAV history (time-weighted, so purchases are not gains)
+    try:
+        await update_nav(db, portfolio)
+    except Exception as e:
+        print(f"NAV update failed: {e}")
+    performance = performance_metrics(nav_series(db, str(portfolio["_id"])))
+    
+    risk_metrics = {}
+    covariance = None
+    if risk:
+        risk_metrics = {
+            "volatility_percent": round(risk["volatility"] * 100, 2),
+            "beta": round(risk["beta"], 2),
+            "sharpe_ratio": round(risk["sharpe_ratio"], 2),
+            "sortino_ratio": round(risk["sortino_ratio"], 2),
+            "max_drawdown_percent": round(risk["max_drawdown"] * 100, 2)
+        }
+        covariance = {
+            "symbols": risk["symbols"],
+            "matrix": risk["covariance"].round(6).tolist(),
+            "benchmark": risk["benchmark"],
+            "observations": risk["observations"],
+            "as_of": risk["as_of"]
+        }
     
     analysis = {
         "total_value": total_value,
         "total_invested": total_invested,
         "total_pnl": total_pnl,
         "total_pnl_percent": total_pnl_percent,
-        "daily_change": 0,  # Would need historical data
-        "daily_change_percent": 0,
+        "daily_change": performance["daily_change"],
+        "daily_change_percent": performance["daily_change_percent"],
         "diversification": sector_allocation,
-        "risk_metrics": {
-            "volatility": "Medium",  # Simplified
-            "beta": 1.0,
-            "sharpe_ratio": 0.0
-        },
+        "risk_metrics": risk_metrics,
+        "covariance": covariance,
         "performance_metrics": {
-            "ytd_return": 0.0,
-            "annualized_return": 0.0
+            "ytd_return": performance["ytd_return"],
+            "annualized_return": performance["annualized_return"]
         }
     }
     
-    return analysis
\ No newline at end of file
+    return analysis
+
+
+@router.get("/nav")
+async def get_portfolio_nav(
+    days: int = Query(365, ge=1, le=3650),
+    current_user: dict = Depends(get_current_active_user),
+    db = Depends(get_db)
+):
+    """Daily NAV history for the portfolio chart, with a Plotly-format chart spec."""
+    portfolio = find_portfolio(db, current_user["_id"])
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    try:
+        await update_nav(db, portfolio)
+    except Exception as e:
+        # Serve the stored series; the background updater catches up
+        print(f"NAV update failed: {e}")
+    rows = nav_series(db, str(portfolio["_id"]), days)
+    dates = [r["date"] for r in rows]
+    nav = [round(r["nav"], 2) for r in rows]
+    return {
+        "dates": dates,
+        "nav": nav,
+        "twr_index": [r["twr_index"] for r in rows],
+        "net_flow": [r["net_flow"] for r in rows],
+        "chart": line_chart_spec("Portfolio Value", "Date", "NAV", dates, nav)
+    }
+
+
+@router.get("/var")
+async def get_portfolio_var(
+    confidence: float = Query(0.95, ge=0.5, le=0.999),
+    horizons: str = Query("1,10", description="Comma-separated horizons in trading days"),
+    paths: int = Query(10000, ge=1000),
+    seed: int = Query(None, ge=0, description="Seed for reproducible Monte Carlo results"),
+    current_user: dict = Depends(get_current_active_user),
+    db = Depends(get_db)
+):
+    """Parametric and Monte Carlo Value-at-Risk and expected shortfall (CVaR) of the current holdings,
+    as positive currency losses per horizon."""
+    try:
+        horizon_days = sorted({int(h) for h in horizons.split(",") if h.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Horizons must be comma-separated integers")
+    if not horizon_days or horizon_days[0] < 1 or horizon_days[-1] > 252:
+        raise HTTPException(status_code=400, detail="Horizons must be between 1 and 252 days")
+    if paths > settings.var_max_paths:
+        raise HTTPException(status_code=400, detail=f"At most {settings.var_max_paths} paths")
+    
+    portfolio = find_portfolio(db, current_user["_id"])
+    holdings = load_positions(db, portfolio["_id"]) if portfolio else []
+    result = await portfolio_var(holdings, confidence, horizon_days, paths, seed)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Not enough price history for the current holdings")
+    return result
+
+
+@router.get("/optimize")
+async def optimize_portfolio(
+    method: str = Query("min_variance", description="min_variance, risk_parity or frontier"),
+    max_weight: float = Query(0.4, gt=0, le=1),
+    cash_floor: float = Query(0.0, ge=0, lt=1),
+    risk_aversion: float = Query(None, gt=0, description="Frontier point; defaults to the max-Sharpe point"),
+    solver: str = Query("numpy", description="numpy, or scipy when installed"),
+    current_user: dict = Depends(get_current_active_user),
+    db = Depends(get_db)
+):
+    """Rebalancing suggestion: target weights for the current holdings and the trades to reach them.
+
+    Covariance and mean returns come from the risk engine's cache, so changing the constraints
+    does not re-download price history.
+    """
+    if method not in OPTIMIZATION_METHODS:
+        raise HTTPException(status_code=400, detail=f"Method must be one of {', '.join(OPTIMIZATION_METHODS)}")
+    if solver not in ("numpy", "scipy"):
+        raise HTTPException(status_code=400, detail="Solver must be numpy or scipy")
+    
+    portfolio = find_portfolio(db, current_user["_id"])
+    holdings = load_positions(db, portfolio["_id"]) if portfolio else []
+    risk = await portfolio_risk(holdings)
+    if risk is None:
+        raise HTTPException(status_code=404, detail="Not enough price history for the current holdings")
+    
+    symbols = risk["symbols"]
+    quantities = position_quantities(holdings)
+    current_quantities = np.array([quantities[s] for s in symbols])
+    prices = risk["last_prices"]
+    cash = portfolio.get("cash_balance", 0)
+    total_value = float(current_quantities @ prices) + cash
+    
+    try:
+        result = await asyncio.to_thread(
+            optimize_weights, method, risk["covariance"], risk["mean_returns"], max_weight, cash_floor,
+            settings.risk_free_rate, risk_aversion, solver
+        )
+    except ImportError:
+        raise HTTPException(status_code=400, detail="SciPy is not installed")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    targets = result["weights"]
+    response = {
+        "method": method,
+        "as_of": risk["as_of"],
+        "current_weights": dict(zip(symbols, (current_quantities * prices / total_value).round(4).tolist())),
+        "target_weights": dict(zip(symbols, targets.round(4).tolist())),
+        "cash_weight": round(1 - float(targets.sum()), 4),
+        "expected_return": result["expected_return"],
+        "volatility": result["volatility"],
+        "sharpe_ratio": result["sharpe_ratio"],
+        "trades": rebalance_trades(symbols, current_quantities, prices, targets, total_value),
+        "excluded": [s for s in quantities if s not in symbols]
+    }
+    if result["frontier"]:
+        response["frontier"] = [
+            {"volatility": p["volatility"], "expected_return": p["expected_return"], "sharpe_ratio": p["sharpe_ratio"]}
+            for p in result["frontier"]
+        ]
+    return response
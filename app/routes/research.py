@@ -70,8 +70,11 @@ from app.services.llm_service import llm_service
 from app.services.stock_service import StockDataService
 from app.services.research_report_service import ResearchReportService
 from app.services.stock_service import get_enhanced_research
+from app.services.research_context import build_context, gather_research_data
+from app.services.compare_analytics import MAX_COMPARE_SYMBOLS, compare_symbols, compare_table
 from app.utils.pdf_generator import PDFReportGenerator
 from app.utils.security import get_db
+from app.services.activity_service import emit_activity
 
 router = APIRouter()
 pdf_generator = PDFReportGenerator()
@@ -92,55 +95,11 @@ async def research_stock(
 
     async with StockDataService() as stock_service:
         try:
-            # Get comprehensive stock data
-            quote = await stock_service.get_stock_quote(symbol) if not categories or "financials" in categories else {}
-            overview = await stock_service.get_company_overview(symbol) if not categories or "company" in categories else {}
-            historical_data = await stock_service.get_historical_data(symbol, timeframe) if not categories or "charts" in categories else None
-            news = await stock_service.get_news_sentiment(symbol) if not categories or "news" in categories else None
-            # Fallbacks for missing data
-            mcp_context_parts = []
-            if (not quote or not overview or (historical_data is not None and historical_data.empty)):
-                # Try MCP as fallback
-                try:
-                    from app.services.mcp_service import MCPService
-                    mcp = MCPService(api_key=settings.alpha_vantage_keys[0])
-                    mcp_financials = mcp.get_financials(symbol) if not categories or "financials" in categories else {}
-                    mcp_company = mcp.get_company_info(symbol) if not categories or "company" in categories else {}
-                    mcp_news = mcp.get_news(symbol) if not categories or "news" in categories else None
-                    # Merge MCP data if available
-                    if mcp_financials:
-                        quote.update(mcp_financials)
-                        mcp_context_parts.append(f"MCP FINANCIALS: {mcp_financials}")
-                    if mcp_company:
-                        overview.update(mcp_company)
-                        mcp_context_parts.append(f"MCP COMPANY INFO: {mcp_company}")
-                    if mcp_news:
-                        news = mcp_news
-                        mcp_context_parts.append(f"MCP NEWS: {mcp_news}")
-                except Exception as mcp_err:
-                    print(f"MCP fallback failed: {mcp_err}")
-            
-            mcp_context = "\n".join(mcp_context_parts)
-            # Prepare context for LLM
-            context_parts = []
-            if not categories or "financials" in categories:
-                context_parts.append(f"CURRENT PRICE: ${quote.get('05. price', 'N/A')}")
-            if not categories or "company" in categories:
-                context_parts.append(f"COMPANY: {overview.get('Name', 'N/A')}")
-                context_parts.append(f"SECTOR: {overview.get('Sector', 'N/A')}")
-                context_parts.append(f"INDUSTRY: {overview.get('Industry', 'N/A')}")
-                context_parts.append(f"DESCRIPTION: {overview.get('Description', 'No description available')}")
-            if not categories or "financials" in categories:
-                context_parts.append(f"MARKET CAP: {overview.get('MarketCapitalization', 'N/A')}")
-                context_parts.append(f"P/E RATIO: {overview.get('PERatio', 'N/A')}")
-                context_parts.append(f"EPS: {overview.get('EPS', 'N/A')}")
-                context_parts.append(f"DIVIDEND YIELD: {overview.get('DividendYield', 'N/A')}")
-                context_parts.append(f"52W HIGH: {overview.get('52WeekHigh', 'N/A')}")
-                context_parts.append(f"52W LOW: {overview.get('52WeekLow', 'N/A')}")
-            if not categories or "news" in categories:
-                context_parts.append(f"RECENT NEWS: {json.dumps(news.get('feed', [])[:5] if news else [])}")
-            context_parts.append(f"USER QUERY: {query}")
-            context = f"STOCK: {symbol}\n" + "\n".join(context_parts) + f"\n{mcp_context}"
+            # Fetch the requested sections concurrently; optional ones that miss the deadline are dropped
+            sections, mcp_context, dropped = await gather_research_data(stock_service, symbol, timeframe, categories)
+            if dropped:
+                print(f"Research {symbol}: sent without {', '.join(dropped)} (deadline)")
+            context = build_context(symbol, query, categories, sections, mcp_context)
             # Get AI analysis
             try:
                 analysis = await llm_service.get_llm_response(query, context)
@@ -157,9 +116,11 @@ async def research_stock(
                 "analysis": structured_analysis,
                 "generated_at": datetime.utcnow(),
                 "timeframe": timeframe,
-                "categories": categories
+                "categories": categories,
+                "dropped_sections": dropped
             }
             db.research_sessions.insert_one(research_session)
+            emit_activity(current_user.get("username"), f"Researched {symbol}", "success")
             # Store embedding in vector DB for long-term memory
             try:
                 import numpy as np
@@ -179,7 +140,7 @@ async def compare_stocks(
     comparison_data: dict,
     current_user: dict = Depends(get_current_active_user)
 ):
-    symbols = comparison_data.get("symbols", [])
+    symbols = list(dict.fromkeys(str(s).strip().upper() for s in comparison_data.get("symbols") or [] if str(s).strip()))
     metrics = comparison_data.get("metrics", [])
 
     if len(symbols) < 2:
@@ -189,57 +150,7 @@ async def compare_stocks(
         raise HTTPException(status_code=400, detail="Maximum 5 symbols allowed")
 
     try:
-        # Use yfinance for real data with rate limiting
-        import yfinance as yf
-        from textblob import TextBlob
-        import time
-        comparison_result = []
-        metric_set = set(metrics) if metrics else {"price", "market_cap", "pe_ratio", "eps", "dividend_yield"}
-        # Gather data for each symbol
-        symbol_data = {}
-        for symbol in symbols:
-            try:
-                ticker = yf.Ticker(symbol)
-                # Add delay between API calls to avoid rate limiting
-                time.sleep(1)
-                info = ticker.info
-                symbol_data[symbol] = {
-                    "price": info.get("regularMarketPrice"),
-                    "market_cap": info.get("marketCap"),
-                    "pe_ratio": info.get("trailingPE"),
-                    "eps": info.get("trailingEps"),
-                    "dividend_yield": info.get("dividendYield"),
-                }
-                # Sentiment analysis
-                news = ticker.news[:3] if hasattr(ticker, 'news') and ticker.news else []
-                sentiments = []
-                for item in news:
-                    headline = item.get('title', '')
-                    blob = TextBlob(headline)
-                    sentiments.append(blob.sentiment.polarity)
-                avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0
-                symbol_data[symbol]["sentiment"] = avg_sentiment
-            except Exception as e:
-                print(f"Error processing {symbol}: {e}")
-                symbol_data[symbol] = {
-                    "price": None,
-                    "market_cap": None,
-                    "pe_ratio": None,
-                    "eps": None,
-                    "dividend_yield": None,
-                    "sentiment": 0
-                }
-        # Build comparison table
-        for metric in metric_set:
-            row = {"metric": metric}
-            for symbol in symbols:
-                row[symbol] = symbol_data[symbol].get(metric)
-            comparison_result.append(row)
-        # Add sentiment row
-        sentiment_row = {"metric": "sentiment"}
-        for symbol in symbols:
-            sentiment_row[symbol] = symbol_data[symbol]["sentiment"]
-        comparison_result.append(sentiment_row)
+        comparison_result = await compare_table(symbols, metrics)
         return {
             "symbols": symbols,
             "comparison": comparison_result,
@@ -249,6 +160,36 @@ async def compare_stocks(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Comparison failed: {str(e)}")
 
+@router.post("/compare/analytics")
+async def compare_analytics(
+    comparison_data: dict,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Return-based comparison of up to MAX_COMPARE_SYMBOLS symbols on cached daily bars:
+    {"symbols": [...], "window": 252, "beta_window": 60, "min_correlation": 0.5, "benchmark": optional}.
+
+    Returns the correlation matrix (with a clustered symbol order), peer clusters, rolling beta
+    against the benchmark and growth/relative performance curves.
+    """
+    symbols = list(dict.fromkeys(str(s).strip().upper() for s in comparison_data.get("symbols") or [] if str(s).strip()))
+    if len(symbols) < 2:
+        raise HTTPException(status_code=400, detail="At least two symbols required")
+    if len(symbols) > MAX_COMPARE_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_COMPARE_SYMBOLS} symbols allowed")
+    try:
+        window = int(comparison_data.get("window", 252))
+        beta_window = int(comparison_data.get("beta_window", 60))
+        min_correlation = float(comparison_data.get("min_correlation", 0.5))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="window, beta_window and min_correlation must be numbers")
+    if not 20 <= window <= 2520 or not 10 <= beta_window <= window or not -1 <= min_correlation <= 1:
+        raise HTTPException(status_code=400, detail="window must be 20-2520, beta_window 10-window and min_correlation -1 to 1")
+
+    result = await compare_symbols(symbols, window, beta_window, min_correlation, comparison_data.get("benchmark"))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Not enough shared price history for these symbols")
+    return result
+
 @router.post("/sentiment")
 async def analyze_sentiment(
     sentiment_data: dict,
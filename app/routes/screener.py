@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.services.auth import get_current_active_user, require_admin
+from app.services.screener import (
+    FUNDAMENTAL_FIELDS, INDICATOR_FIELDS, TEXT_FIELDS, current_snapshot, refresh_snapshot, screen
+)
+
+router = APIRouter()
+
+
+@router.get("/")
+async def run_screen(
+    filter: str = Query("", description='e.g. PERatio < 20 and rsi_14 < 30 and Sector == "Technology"'),
+    sort: str = Query("MarketCapitalization"),
+    order: str = Query("desc", description="asc or desc"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(25, ge=1, le=200),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Screen the universe snapshot with a filter expression; results are sorted and paginated.
+
+    Filters combine fields (see /fields) with comparisons, and/or/not, + - * / and `in [...]`
+    for text fields. Rows with an unknown value for a compared field do not match.
+    """
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Order must be asc or desc")
+    snapshot = current_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="The screener snapshot is still being built")
+    try:
+        return screen(snapshot, filter, sort or None, order == "desc", page, page_size)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/fields")
+async def get_fields(current_user: dict = Depends(get_current_active_user)):
+    """Fields usable in filters and sorting, with the snapshot's size and build time."""
+    snapshot = current_snapshot()
+    return {
+        "text": ["Symbol", "Market", *TEXT_FIELDS],
+        "fundamentals": list(FUNDAMENTAL_FIELDS),
+        "indicators": INDICATOR_FIELDS,
+        "universe_size": len(snapshot) if snapshot else 0,
+        "as_of": snapshot.as_of.isoformat() if snapshot else None
+    }
+
+
+@router.post("/refresh")
+async def refresh(current_user: dict = Depends(require_admin)):
+    """Rebuild the snapshot now instead of waiting for the nightly refresh."""
+    snapshot = await refresh_snapshot()
+    return {"universe_size": len(snapshot), "as_of": snapshot.as_of.isoformat()}
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.templating import Jinja2Templates
 from typing import List
 import secrets
@@ -9,8 +9,10 @@ from bson import ObjectId
 
 from app.config import settings
 from app.models.user import UserResponse, UserUpdate
-from app.services.auth import get_current_active_user
-from app.utils.security import get_db, get_password_hash
+from app.services.auth import get_current_active_user, invalidate_cached_user
+from app.utils.security import get_db, get_password_hash_async
+from app.services.user_search import search_keys
+from app.services.dashboard_service import get_dashboard_snapshot
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -69,13 +71,15 @@ async def update_profile(
         update_data["full_name"] = user_update.full_name
     
     if user_update.password:
-        update_data["hashed_password"] = get_password_hash(user_update.password)
+        update_data["hashed_password"] = await get_password_hash_async(user_update.password)
     
+    update_data.update(search_keys(update_data))
     if update_data:
         db.users.update_one(
             {"_id": current_user["_id"]},
             {"$set": update_data}
         )
+        invalidate_cached_user(current_user["username"])
     
     return {"message": "Profile updated successfully"}
 
@@ -111,6 +115,7 @@ async def verify_email(
         {"_id": current_user["_id"]},
         {"$set": {"email_verified": True}}
     )
+    invalidate_cached_user(current_user["username"])
     
     # Remove verification code
     db.email_verifications.delete_one({"_id": verification["_id"]})
@@ -156,41 +161,14 @@ async def send_verification(request_data: dict, current_user: dict = Depends(get
 
 @router.get("/dashboard-data")
 async def get_dashboard_data(
+    request: Request,
     current_user: dict = Depends(get_current_active_user),
     db = Depends(get_db)
 ):
-    # Get user's portfolio summary
-    portfolio = db.portfolios.find_one({"user_id": str(current_user["_id"])})
-    
-    # Get recent chat sessions
-    recent_chats = list(db.chat_sessions.find(
-        {"user_id": str(current_user["_id"]) }
-    ).sort("updated_at", -1).limit(5))
-
-    # Normalize recent_chats to ensure session_id and message_count are present
-    for s in recent_chats:
-        s["_id"] = str(s.get("_id"))
-        s["session_id"] = str(s.get("session_id") or s.get("_id"))
-        s["message_count"] = int(s.get("message_count") or 0)
-        if isinstance(s.get("updated_at"), datetime):
-            s["updated_at"] = s["updated_at"].isoformat()
-    
-    # Get watchlist
-    watchlist = list(db.watchlists.find(
-        {"user_id": str(current_user["_id"])}
-    ))
-    
-    return {
-        "portfolio_summary": {
-            "total_value": portfolio.get("total_value", 0) if portfolio else 0,
-            "daily_change": portfolio.get("daily_change", 0) if portfolio else 0,
-            "total_pnl": portfolio.get("total_pnl", 0) if portfolio else 0
-        },
-        "recent_chats": convert_objectid(recent_chats),
-        "watchlist": convert_objectid(watchlist),
-        # Add realtime counts for profile/account stats
-        "counts": {
-            "chat_sessions": db.chat_sessions.count_documents({"user_id": str(current_user["_id"])}) if (db is not None and current_user) else 0,
-            "research_reports": db.research_sessions.count_documents({"user_id": str(current_user["_id"])}) if (db is not None and current_user) else 0
-        }
-    }
\ No newline at end of file
+    """Dashboard summary for the current user. Served from a short-lived per-user snapshot with an
+    ETag, so unchanged polls are answered with 304 Not Modified."""
+    payload, etag = await get_dashboard_snapshot(db, current_user)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
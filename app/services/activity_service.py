@@ -0,0 +1,119 @@
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Set
+
+from app.config import settings
+from app.utils.security import get_shared_db
+
+# Capped collection holding the activity stream shown on the admin dashboard
+ACTIVITY_COLLECTION = "activity_logs"
+
+# Events emitted by routes but not yet written. Bounded: if Mongo falls behind, the oldest
+# unflushed events are dropped rather than growing memory.
+_pending: deque = deque(maxlen=settings.activity_buffer_size)
+
+# In-process event bus: one bounded queue per live admin stream
+_subscribers: Set[asyncio.Queue] = set()
+
+
+def emit_activity(user: str, activity: str, status: str = "info", **details):
+    """Record an activity event. Cheap and non-blocking; call from the event loop (i.e. route handlers)."""
+    event = {
+        "user": user or "system",
+        "activity": activity,
+        "status": status,
+        "timestamp": datetime.utcnow(),
+    }
+    if details:
+        event["details"] = details
+    _pending.append(event)
+    for queue in list(_subscribers):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop the event for that stream only
+            pass
+
+
+def subscribe_activity() -> asyncio.Queue:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+    _subscribers.add(queue)
+    return queue
+
+
+def unsubscribe_activity(queue: asyncio.Queue):
+    _subscribers.discard(queue)
+
+
+def serialize_activity(event: Dict) -> Dict:
+    """Shape an activity event for the admin dashboard table."""
+    timestamp = event.get("timestamp")
+    return {
+        "user": event.get("user") or "system",
+        "activity": event.get("activity") or "action",
+        "time": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp,
+        "status": event.get("status", "info")
+    }
+
+
+def take_pending_activity() -> List[Dict]:
+    """Swap out the buffered events. Runs on the event loop thread, where events are emitted."""
+    batch = [dict(event) for event in _pending]
+    _pending.clear()
+    return batch
+
+
+def write_activity(db, batch: List[Dict]) -> int:
+    """Write a batch of events to the capped collection in one insert_many. Safe to run in a worker thread."""
+    if batch:
+        db[ACTIVITY_COLLECTION].insert_many(batch, ordered=False)
+    return len(batch)
+
+
+def flush_activity(db) -> int:
+    """Write all buffered events in one insert_many."""
+    return write_activity(db, take_pending_activity())
+
+
+def requeue_activity(batch: List[Dict]):
+    """Put a batch that failed to write back in front of the buffer, as far as the buffer has room.
+
+    Events emitted since are newer and are never displaced; the oldest of the batch are dropped first.
+    """
+    room = (_pending.maxlen or len(batch)) - len(_pending)
+    if room > 0:
+        _pending.extendleft(reversed(batch[-room:]))
+
+
+def ensure_activity_log(db):
+    """Create the capped activity collection, converting an existing uncapped one."""
+    size = settings.activity_log_max_bytes
+    if ACTIVITY_COLLECTION not in db.list_collection_names():
+        db.create_collection(ACTIVITY_COLLECTION, capped=True, size=size)
+    elif not db[ACTIVITY_COLLECTION].options().get("capped"):
+        db.command("convertToCapped", ACTIVITY_COLLECTION, size=size)
+
+
+async def run_activity_flusher():
+    """Background task: create the capped collection, then flush buffered events in batches."""
+    try:
+        await asyncio.to_thread(ensure_activity_log, get_shared_db())
+    except Exception as e:
+        print(f"Activity log setup failed: {e}")
+    while True:
+        await asyncio.sleep(settings.activity_flush_interval)
+        batch = take_pending_activity()
+        try:
+            await asyncio.to_thread(write_activity, get_shared_db(), batch)
+        except Exception as e:
+            print(f"Activity flush failed: {e}")
+            requeue_activity(batch)
+
+
+def recent_activity(db, limit: int = 20) -> List[Dict]:
+    """Newest events first: unflushed events from the buffer, then the capped collection in reverse insertion order."""
+    events = list(_pending)[::-1][:limit]
+    if len(events) < limit:
+        events.extend(db[ACTIVITY_COLLECTION].find({}, {"_id": 0}).sort("$natural", -1).limit(limit - len(events)))
+    return [serialize_activity(event) for event in events]
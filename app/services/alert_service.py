@@ -0,0 +1,328 @@
+import asyncio
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from pymongo import ASCENDING
+
+from app.services.email_service import queue_email
+from app.services.indicators import rsi, sma
+from app.services.ohlcv_cache import get_daily_bars
+from app.services.stock_service import quote_price
+from app.utils.security import get_shared_db
+
+# User alert conditions:
+#   {user_id, email, symbol, kind, threshold, fast, slow, notify_email, active, created_at,
+#    triggered_at, triggered_value}
+# Alerts are one-shot: once triggered they are deactivated and leave the in-memory index.
+ALERTS_COLLECTION = "alerts"
+
+# Price level alerts fire when the price is at or beyond the threshold
+PRICE_KINDS = ("price_above", "price_below")
+# RSI alerts fire when RSI crosses the threshold in that direction
+RSI_KINDS = ("rsi_cross_above", "rsi_cross_below")
+# SMA alerts fire when the fast SMA crosses the slow one in that direction
+SMA_KINDS = ("sma_cross_above", "sma_cross_below")
+ALERT_KINDS = PRICE_KINDS + RSI_KINDS + SMA_KINDS
+
+RSI_PERIOD = 14
+
+
+def validate_alert(data: Dict) -> Dict:
+    """Normalized alert condition from user input; raises ValueError describing the first problem."""
+    kind = data.get("kind")
+    if kind not in ALERT_KINDS:
+        raise ValueError(f"Kind must be one of {', '.join(ALERT_KINDS)}")
+    symbol = str(data.get("symbol") or "").strip().upper()
+    if not symbol:
+        raise ValueError("Missing symbol")
+    condition = {"symbol": symbol, "kind": kind, "notify_email": bool(data.get("notify_email", True))}
+    if kind in SMA_KINDS:
+        try:
+            fast, slow = int(data.get("fast", 20)), int(data.get("slow", 50))
+        except (TypeError, ValueError):
+            raise ValueError("fast and slow must be integers")
+        if not 2 <= fast < slow <= 200:
+            raise ValueError("SMA windows must satisfy 2 <= fast < slow <= 200")
+        condition.update(fast=fast, slow=slow)
+        return condition
+    try:
+        threshold = float(data.get("threshold"))
+    except (TypeError, ValueError):
+        raise ValueError("threshold must be a number")
+    if kind in RSI_KINDS and not 0 < threshold < 100:
+        raise ValueError("RSI thresholds must be between 0 and 100")
+    if kind in PRICE_KINDS and threshold <= 0:
+        raise ValueError("Price thresholds must be positive")
+    condition["threshold"] = threshold
+    return condition
+
+
+def _threshold(entry: Tuple[float, str]) -> float:
+    return entry[0]
+
+
+class AlertIndex:
+    """Active alerts keyed by symbol, with thresholds kept sorted per (symbol, kind).
+
+    A tick for one symbol only looks at that symbol's alerts, and bisection finds the triggered
+    thresholds without scanning the untriggered ones: price levels are a prefix or suffix of the
+    sorted list, and RSI crossings are the thresholds inside the (previous, current] interval.
+    """
+
+    def __init__(self):
+        self._thresholds: Dict[Tuple[str, str], List[Tuple[float, str]]] = {}
+        # symbol -> (fast, slow) -> {kind: {alert ids}}
+        self._crossovers: Dict[str, Dict[Tuple[int, int], Dict[str, Set[str]]]] = {}
+        self._alerts: Dict[str, Dict] = {}
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def symbols(self) -> Set[str]:
+        return {s for s, _ in self._thresholds} | set(self._crossovers)
+
+    def indicator_symbols(self) -> Set[str]:
+        """Symbols with RSI or SMA alerts, which need daily bars to evaluate."""
+        return {s for s, kind in self._thresholds if kind in RSI_KINDS} | set(self._crossovers)
+
+    def add(self, alert: Dict):
+        alert_id = str(alert["_id"])
+        if alert_id in self._alerts:
+            return
+        self._alerts[alert_id] = alert
+        symbol, kind = alert["symbol"], alert["kind"]
+        if kind in SMA_KINDS:
+            by_kind = self._crossovers.setdefault(symbol, {}).setdefault((alert["fast"], alert["slow"]), {})
+            by_kind.setdefault(kind, set()).add(alert_id)
+        else:
+            insort(self._thresholds.setdefault((symbol, kind), []), (alert["threshold"], alert_id), key=_threshold)
+
+    def remove(self, alert_id: str) -> Optional[Dict]:
+        alert = self._alerts.pop(alert_id, None)
+        if alert is None:
+            return None
+        symbol, kind = alert["symbol"], alert["kind"]
+        if kind in SMA_KINDS:
+            pairs = self._crossovers[symbol]
+            by_kind = pairs[(alert["fast"], alert["slow"])]
+            by_kind[kind].discard(alert_id)
+            if not by_kind[kind]:
+                del by_kind[kind]
+            if not by_kind:
+                del pairs[(alert["fast"], alert["slow"])]
+            if not pairs:
+                del self._crossovers[symbol]
+        else:
+            entries = self._thresholds[(symbol, kind)]
+            i = bisect_left(entries, alert["threshold"], key=_threshold)
+            while entries[i][1] != alert_id:
+                i += 1
+            del entries[i]
+            if not entries:
+                del self._thresholds[(symbol, kind)]
+        return alert
+
+    def match_price(self, symbol: str, price: float) -> List[str]:
+        above = self._thresholds.get((symbol, "price_above"), [])
+        below = self._thresholds.get((symbol, "price_below"), [])
+        hits = above[:bisect_right(above, price, key=_threshold)]
+        hits += below[bisect_left(below, price, key=_threshold):]
+        return [alert_id for _, alert_id in hits]
+
+    def match_rsi(self, symbol: str, previous: float, current: float) -> List[str]:
+        if previous < current:
+            entries = self._thresholds.get((symbol, "rsi_cross_above"), [])
+            hits = entries[bisect_right(entries, previous, key=_threshold):bisect_right(entries, current, key=_threshold)]
+        else:
+            entries = self._thresholds.get((symbol, "rsi_cross_below"), [])
+            hits = entries[bisect_left(entries, current, key=_threshold):bisect_left(entries, previous, key=_threshold)]
+        return [alert_id for _, alert_id in hits]
+
+    def crossover_windows(self, symbol: str) -> List[Tuple[int, int]]:
+        return list(self._crossovers.get(symbol, {}))
+
+    def match_crossover(self, symbol: str, window: Tuple[int, int], previous: float, current: float) -> List[str]:
+        """Alerts for a fast-minus-slow SMA spread moving from `previous` to `current`."""
+        by_kind = self._crossovers.get(symbol, {}).get(window, {})
+        if previous <= 0 < current:
+            return list(by_kind.get("sma_cross_above", ()))
+        if previous >= 0 > current:
+            return list(by_kind.get("sma_cross_below", ()))
+        return []
+
+
+def indicator_values(closes: np.ndarray, windows: Iterable[Tuple[int, int]]) -> Dict:
+    """Latest and previous RSI and SMA spreads for a close series (the last close may be provisional)."""
+    values = {}
+    r = rsi(closes, RSI_PERIOD)
+    if len(r) >= 2 and not np.isnan(r[-2:]).any():
+        values["rsi"] = (float(r[-2]), float(r[-1]))
+    for fast, slow in windows:
+        spread = sma(closes, fast) - sma(closes, slow)
+        if len(spread) >= 2 and not np.isnan(spread[-2:]).any():
+            values[(fast, slow)] = (float(spread[-2]), float(spread[-1]))
+    return values
+
+
+def describe_alert(alert: Dict) -> str:
+    kind = alert["kind"]
+    if kind in SMA_KINDS:
+        direction = "above" if kind == "sma_cross_above" else "below"
+        return f"{alert['symbol']} SMA{alert['fast']} crossed {direction} SMA{alert['slow']}"
+    if kind in RSI_KINDS:
+        direction = "above" if kind == "rsi_cross_above" else "below"
+        return f"{alert['symbol']} RSI({RSI_PERIOD}) crossed {direction} {alert['threshold']:g}"
+    direction = "above" if kind == "price_above" else "below"
+    return f"{alert['symbol']} price is {direction} {alert['threshold']:g}"
+
+
+def claim_triggered(db, fired: List[Tuple[Dict, float]], when: datetime) -> List[Tuple[Dict, float]]:
+    """Deactivate each fired alert with a conditional one-shot update and return those it matched.
+
+    An alert already deactivated elsewhere (deleted, or fired by another worker) matches nothing and
+    is not delivered again.
+    """
+    claimed = []
+    for alert, value in fired:
+        result = db[ALERTS_COLLECTION].update_one(
+            {"_id": alert["_id"], "active": True},
+            {"$set": {"active": False, "triggered_at": when, "triggered_value": value}}
+        )
+        if result.modified_count == 1:
+            claimed.append((alert, value))
+    return claimed
+
+
+class AlertEngine:
+    """Evaluates the alert index against market data hub ticks and delivers triggered alerts.
+
+    Indicators are computed from cached daily bars with the tick price as today's provisional
+    close, and only for ticked symbols that have indicator alerts. Crossings compare with the value
+    from the symbol's previous evaluation (the prior close's value on the first one).
+    """
+
+    def __init__(self):
+        self.index = AlertIndex()
+        self._last: Dict[str, Dict] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def load(self, db) -> int:
+        for alert in db[ALERTS_COLLECTION].find({"active": True}):
+            self.index.add(alert)
+        return len(self.index)
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        """Queue receiving this user's triggered alerts."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        self._subscribers.setdefault(str(user_id), set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(str(user_id))
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[str(user_id)]
+
+    def evaluate(self, symbol: str, price: float, closes: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """(alert id, triggering value) pairs for one symbol at `price`; `closes` end with that price."""
+        hits = [(alert_id, price) for alert_id in self.index.match_price(symbol, price)]
+        if closes is None:
+            return hits
+        values = indicator_values(closes, self.index.crossover_windows(symbol))
+        last = self._last.setdefault(symbol, {})
+        for key, (prior, current) in values.items():
+            previous = last.get(key, prior)
+            if key == "rsi":
+                hits += [(alert_id, current) for alert_id in self.index.match_rsi(symbol, previous, current)]
+            else:
+                hits += [(alert_id, current) for alert_id in self.index.match_crossover(symbol, key, previous, current)]
+            last[key] = current
+        return hits
+
+    async def on_tick(self, ticks: Dict[str, Dict]):
+        """Market data hub listener."""
+        watched = self.index.symbols()
+        prices = {s: quote_price(q) for s, q in ticks.items() if s in watched and quote_price(q) is not None}
+        if not prices:
+            return
+        indicator_symbols = [s for s in prices if s in self.index.indicator_symbols()]
+        bars = await get_daily_bars(indicator_symbols) if indicator_symbols else {}
+        today = np.datetime64(datetime.utcnow().date())
+        hits = []
+        for symbol, price in prices.items():
+            closes = None
+            frame = bars.get(symbol)
+            if frame is not None:
+                history = frame["Close"]
+                if history.index[-1].to_datetime64() >= today:
+                    history = history.iloc[:-1]
+                closes = np.append(history.to_numpy(), price)
+            hits += self.evaluate(symbol, price, closes)
+        if hits:
+            await self.trigger(hits)
+
+    async def trigger(self, hits: List[Tuple[str, float]]):
+        """Deactivate triggered alerts, then deliver the ones this call deactivated."""
+        now = datetime.utcnow()
+        fired = []
+        for alert_id, value in hits:
+            alert = self.index.remove(alert_id)
+            if alert is not None:
+                fired.append((alert, value))
+        if not fired:
+            return
+        claimed = await asyncio.to_thread(claim_triggered, get_shared_db(), fired, now)
+        for alert, value in claimed:
+            self.deliver(alert, value, now)
+
+    def deliver(self, alert: Dict, value: float, when: datetime):
+        message = describe_alert(alert)
+        event = {"type": "alert", "alert_id": str(alert["_id"]), "symbol": alert["symbol"], "kind": alert["kind"],
+                 "message": message, "value": value, "triggered_at": when.isoformat()}
+        for queue in list(self._subscribers.get(alert["user_id"], ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                pass
+        if alert.get("notify_email") and alert.get("email"):
+            queue_email(alert["email"], f"AGENSTOCK alert: {message}",
+                        f"<html><body><p>{message} (at {value:.2f}, {when:%Y-%m-%d %H:%M} UTC).</p></body></html>")
+
+
+alert_engine = AlertEngine()
+
+
+def create_alert(db, user: Dict, condition: Dict) -> Dict:
+    alert = {
+        "user_id": str(user["_id"]),
+        "email": user.get("email"),
+        **condition,
+        "active": True,
+        "created_at": datetime.utcnow(),
+    }
+    alert["_id"] = db[ALERTS_COLLECTION].insert_one(alert).inserted_id
+    alert_engine.index.add(alert)
+    return alert
+
+
+def delete_alert(db, user_id: str, alert_id) -> bool:
+    deleted = db[ALERTS_COLLECTION].delete_one({"_id": alert_id, "user_id": str(user_id)}).deleted_count
+    if deleted:
+        alert_engine.index.remove(str(alert_id))
+    return bool(deleted)
+
+
+def list_alerts(db, user_id: str) -> List[Dict]:
+    return list(db[ALERTS_COLLECTION].find({"user_id": str(user_id)}).sort("created_at", ASCENDING))
+
+
+async def bootstrap_alerts():
+    """Load active alerts into the in-memory index at startup."""
+    try:
+        count = await asyncio.to_thread(alert_engine.load, get_shared_db())
+        print(f"Loaded {count} active alerts")
+    except Exception as e:
+        print(f"Alert index load failed: {e}")
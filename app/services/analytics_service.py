@@ -0,0 +1,174 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from pymongo import ReplaceOne
+
+from app.config import settings
+from app.models.user import UserRole
+from app.utils.security import get_shared_db
+from app.utils.ttl_cache import TTLCache
+
+# Rollup collection: one document per UTC day, keyed by "YYYY-MM-DD"
+DAILY_STATS = "daily_stats"
+ROLLUP_BACKFILL_DAYS = 30
+
+# Final admin dashboard payload, shared by every admin for a short TTL
+_dashboard_cache = TTLCache(ttl=settings.analytics_cache_ttl, max_entries=4)
+
+
+def _start_of_day(dt: datetime) -> datetime:
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _count_by_day(collection, field: str, start: datetime, end: datetime, match: Optional[Dict] = None) -> Dict[str, int]:
+    """Count documents per UTC day of `field` within [start, end) with one $group pipeline."""
+    pipeline = [
+        {"$match": {field: {"$gte": start, "$lt": end}, **(match or {})}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": f"${field}"}},
+            "count": {"$sum": 1}
+        }}
+    ]
+    return {row["_id"]: row["count"] for row in collection.aggregate(pipeline)}
+
+
+def refresh_daily_stats(db, start: datetime, end: datetime) -> int:
+    """Recompute rollup rows for every day in [start, end) and upsert them in one bulk write."""
+    registrations = _count_by_day(db.users, "created_at", start, end)
+    active_users = _count_by_day(db.users, "last_login", start, end)
+    messages = _count_by_day(db.chat_messages, "timestamp", start, end)
+    chat_sessions = _count_by_day(db.chat_sessions, "created_at", start, end)
+
+    now = datetime.utcnow()
+    ops = []
+    day = start
+    while day < end:
+        key = day.strftime("%Y-%m-%d")
+        ops.append(ReplaceOne({"_id": key}, {
+            "date": day,
+            "registrations": registrations.get(key, 0),
+            "active_users": active_users.get(key, 0),
+            "messages": messages.get(key, 0),
+            "chat_sessions": chat_sessions.get(key, 0),
+            "updated_at": now
+        }, upsert=True))
+        day += timedelta(days=1)
+    if ops:
+        db[DAILY_STATS].bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def update_daily_stats(db, backfill: bool = False) -> int:
+    """Incremental rollup: refresh today and yesterday (closing it out), or backfill missing days.
+
+    Closed days are not recomputed afterwards, so `active_users` for a past day keeps the value
+    observed when the day ended even though `last_login` moves on.
+    """
+    today = _start_of_day(datetime.utcnow())
+    end = today + timedelta(days=1)
+    start = today - timedelta(days=1)
+    if backfill:
+        first = today - timedelta(days=ROLLUP_BACKFILL_DAYS - 1)
+        existing = {row["_id"] for row in db[DAILY_STATS].find(
+            {"_id": {"$gte": first.strftime("%Y-%m-%d")}}, {"_id": 1})}
+        day = first
+        while day < start and day.strftime("%Y-%m-%d") in existing:
+            day += timedelta(days=1)
+        start = min(start, day)
+    return refresh_daily_stats(db, start, end)
+
+
+async def run_daily_stats_rollup():
+    """Background task: backfill on startup, then keep today's rollup row current."""
+    backfill = True
+    while True:
+        try:
+            await asyncio.to_thread(update_daily_stats, get_shared_db(), backfill)
+            backfill = False
+        except Exception as e:
+            print(f"daily_stats rollup failed: {e}")
+        await asyncio.sleep(settings.analytics_rollup_interval)
+
+
+def get_daily_stats(db, days: int) -> List[Dict]:
+    """Return one rollup row per day for the last `days` days (oldest first), zero-filled."""
+    today = _start_of_day(datetime.utcnow())
+    first = today - timedelta(days=days - 1)
+    rows = {row["_id"]: row for row in db[DAILY_STATS].find(
+        {"_id": {"$gte": first.strftime("%Y-%m-%d")}})}
+    result = []
+    for i in range(days):
+        day = first + timedelta(days=i)
+        key = day.strftime("%Y-%m-%d")
+        row = rows.get(key, {})
+        result.append({
+            "date": key,
+            "registrations": row.get("registrations", 0),
+            "active_users": row.get("active_users", 0),
+            "messages": row.get("messages", 0),
+            "chat_sessions": row.get("chat_sessions", 0),
+        })
+    return result
+
+
+def _user_metrics(db, today: datetime) -> Dict[str, int]:
+    pipeline = [
+        {"$match": {"role": UserRole.USER.value}},
+        {"$group": {
+            "_id": None,
+            "total_users": {"$sum": 1},
+            "active_users": {"$sum": {"$cond": [{"$eq": ["$is_active", True]}, 1, 0]}},
+            "new_users_today": {"$sum": {"$cond": [{"$gte": ["$created_at", today]}, 1, 0]}}
+        }}
+    ]
+    row = next(db.users.aggregate(pipeline), None) or {}
+    return {
+        "total_users": row.get("total_users", 0),
+        "active_users": row.get("active_users", 0),
+        "new_users_today": row.get("new_users_today", 0)
+    }
+
+
+def _chat_activity_today(db, today: datetime) -> List[Dict]:
+    """Messages per 3-hour bucket from 06:00 UTC today, in one pipeline."""
+    pipeline = [
+        {"$match": {"timestamp": {"$gte": today.replace(hour=6), "$lt": today + timedelta(days=1)}}},
+        {"$group": {
+            "_id": {"$subtract": [{"$hour": "$timestamp"}, {"$mod": [{"$subtract": [{"$hour": "$timestamp"}, 6]}, 3]}]},
+            "count": {"$sum": 1}
+        }}
+    ]
+    counts = {row["_id"]: row["count"] for row in db.chat_messages.aggregate(pipeline)}
+    return [{"hour": f"{hour}:00", "messages": counts.get(hour, 0)} for hour in range(6, 22, 3)]
+
+
+def build_dashboard_analytics(db) -> Dict:
+    today = _start_of_day(datetime.utcnow())
+    weekly = get_daily_stats(db, 7)
+    return {
+        "user_metrics": _user_metrics(db, today),
+        "chat_metrics": {
+            "total_chats": db.chat_sessions.estimated_document_count(),
+            "total_messages": db.chat_messages.estimated_document_count(),
+            "chat_activity": _chat_activity_today(db, today)
+        },
+        "portfolio_metrics": {
+            "total_portfolios": db.portfolios.estimated_document_count()
+        },
+        "daily_active_users": [{"date": row["date"], "active_users": row["active_users"]} for row in weekly],
+        "feature_usage": [
+            {"label": "Research", "value": db.research_sessions.estimated_document_count()},
+            {"label": "Portfolio", "value": db.portfolios.estimated_document_count()},
+            {"label": "Chat", "value": db.chat_sessions.estimated_document_count()},
+            {"label": "Comparison", "value": db.chat_sessions.count_documents({"type": "compare"})}
+        ]
+    }
+
+
+def get_dashboard_analytics(db) -> Dict:
+    """Admin dashboard payload, cached for ANALYTICS_CACHE_TTL seconds."""
+    payload = _dashboard_cache.get("dashboard")
+    if payload is None:
+        payload = build_dashboard_analytics(db)
+        _dashboard_cache.set("dashboard", payload)
+    return payload
@@ -3,23 +3,91 @@ from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+import asyncio
+import time
+from typing import Dict
 import os
 from dotenv import load_dotenv
 
 from app.config import settings
 from app.models.user import TokenData
-from app.utils.security import get_db, verify_password, get_password_hash
+from app.utils.security import get_db, get_shared_db, verify_password, get_password_hash, verify_password_async, get_password_hash_async
+from app.utils.ttl_cache import TTLCache
 
 load_dotenv()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
+# Resolved user documents keyed by token subject (username)
+_user_cache = TTLCache(ttl=settings.auth_user_cache_ttl, max_entries=10000)
+
+# Coalesced last_login writes: username -> time of the latest authenticated request
+_pending_last_login: Dict[str, datetime] = {}
+# username -> monotonic time the last write was queued, used to debounce writes per user
+_last_login_queued: Dict[str, float] = {}
+
+def invalidate_cached_user(username: Optional[str] = None):
+    """Drop a cached user (or all users) after a profile, role or status change."""
+    if username is None:
+        _user_cache.clear()
+    else:
+        _user_cache.pop(username)
+
+def _record_last_login(username: str):
+    now = time.monotonic()
+    queued_at = _last_login_queued.get(username)
+    if queued_at is not None and now - queued_at < settings.last_login_write_interval:
+        return
+    _last_login_queued[username] = now
+    _pending_last_login[username] = datetime.utcnow()
+
+def take_pending_last_login() -> Dict[str, datetime]:
+    """Swap out the pending last_login timestamps and prune expired debounce entries.
+
+    Must run on the event loop thread, which is the only thread that touches these maps.
+    """
+    global _pending_last_login
+    pending, _pending_last_login = _pending_last_login, {}
+    # Forget debounce entries that have expired so the map only tracks recently active users
+    cutoff = time.monotonic() - settings.last_login_write_interval
+    for username in [u for u, queued_at in _last_login_queued.items() if queued_at < cutoff]:
+        _last_login_queued.pop(username, None)
+    return pending
+
+def write_last_login(db, pending: Dict[str, datetime]) -> int:
+    """Write a snapshot of last_login timestamps in one bulk_write. Safe to run in a worker thread."""
+    if not pending:
+        return 0
+    db.users.bulk_write(
+        [UpdateOne({"username": username}, {"$max": {"last_login": ts}}) for username, ts in pending.items()],
+        ordered=False
+    )
+    return len(pending)
+
+def flush_last_login_writes(db) -> int:
+    """Write all pending last_login timestamps in one bulk_write. Returns the number of users updated."""
+    return write_last_login(db, take_pending_last_login())
+
+async def run_last_login_flusher():
+    """Background task: periodically flush coalesced last_login writes."""
+    while True:
+        await asyncio.sleep(settings.last_login_flush_interval)
+        pending = take_pending_last_login()
+        try:
+            await asyncio.to_thread(write_last_login, get_shared_db(), pending)
+        except Exception as e:
+            print(f"last_login flush failed: {e}")
+            # Keep the batch for the next flush; newer timestamps recorded meanwhile win
+            for username, ts in pending.items():
+                if _pending_last_login.get(username, ts) <= ts:
+                    _pending_last_login[username] = ts
+
 async def authenticate_user(db: MongoClient, username: str, password: str):
     user = db.users.find_one({"username": username})
     if not user:
         return False
-    if not verify_password(password, user["hashed_password"]):
+    if not await verify_password_async(password, user["hashed_password"]):
         return False
     return user
 
@@ -69,14 +137,15 @@ async def get_current_user(request: Request, db: MongoClient = Depends(get_db)):
         token_data = TokenData(username=username, role=role)
     except JWTError:
         raise credentials_exception
-    user = db.users.find_one({"username": token_data.username})
+    user = _user_cache.get(token_data.username)
     if user is None:
-        raise credentials_exception
-    db.users.update_one(
-        {"username": token_data.username},
-        {"$set": {"last_login": datetime.utcnow()}}
-    )
-    return user
+        user = db.users.find_one({"username": token_data.username})
+        if user is None:
+            raise credentials_exception
+        _user_cache.set(token_data.username, user)
+    _record_last_login(token_data.username)
+    # Hand out a copy so request handlers cannot mutate the cached document
+    return dict(user)
 
 async def get_current_active_user(current_user: dict = Depends(get_current_user)):
     if not current_user.get("is_active", True):
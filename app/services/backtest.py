@@ -0,0 +1,245 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.config import settings
+from app.services.indicators import bollinger, rsi, sma
+from app.services.ohlcv_cache import get_daily_bars
+from app.services.process_pool import get_process_pool
+from app.services.risk_engine import TRADING_DAYS
+from app.utils.chart_renderer import line_chart_spec
+
+# Strategy -> default parameters. Strategies are long-only and fully invested while in a position.
+STRATEGIES = {
+    # Long while the fast SMA is above the slow one
+    "sma_crossover": {"fast": 20, "slow": 50},
+    # Buy when RSI drops below `lower`, sell when it rises above `upper`
+    "rsi_reversion": {"period": 14, "lower": 30, "upper": 70},
+    # Buy when the close breaks above the upper band, sell when it falls back below the middle band
+    "bollinger_breakout": {"window": 20, "width": 2.0},
+}
+
+# Largest grid a single sweep may evaluate (parameter combinations x symbols)
+MAX_SWEEP_RUNS = 5000
+
+# Parameter sets per process pool task
+SWEEP_CHUNK = 50
+
+# Fewest daily bars worth backtesting
+MIN_BARS = 60
+
+
+def _hold_between(entries: np.ndarray, exits: np.ndarray) -> np.ndarray:
+    """1.0 from each entry signal until the next exit signal, else 0.0 (an exit wins on the same bar)."""
+    state = np.where(exits, 0.0, np.where(entries, 1.0, np.nan))
+    # Forward-fill the last signal without a Python loop
+    filled = np.where(np.isnan(state), 0, np.arange(len(state)))
+    np.maximum.accumulate(filled, out=filled)
+    held = state[filled]
+    return np.where(np.isnan(held), 0.0, held)
+
+
+def strategy_positions(strategy: str, closes: np.ndarray, params: Dict) -> np.ndarray:
+    """Target position (1 long, 0 flat) decided at each bar's close."""
+    if strategy == "sma_crossover":
+        return (sma(closes, params["fast"]) > sma(closes, params["slow"])).astype(float)
+    if strategy == "rsi_reversion":
+        r = rsi(closes, params["period"])
+        return _hold_between(r < params["lower"], r > params["upper"])
+    if strategy == "bollinger_breakout":
+        middle, upper, _ = bollinger(closes, params["window"], params["width"])
+        return _hold_between(closes > upper, closes < middle)
+    raise ValueError(f"Unknown strategy '{strategy}'")
+
+
+def strategy_params(strategy: str, overrides: Dict) -> Dict:
+    """Defaults for `strategy` with `overrides` applied; raises ValueError for unknown or invalid ones."""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Strategy must be one of {', '.join(STRATEGIES)}")
+    params = dict(STRATEGIES[strategy])
+    for name, value in overrides.items():
+        if name not in params:
+            raise ValueError(f"Unknown parameter '{name}' for {strategy}")
+        params[name] = type(params[name])(value)
+    if strategy == "sma_crossover" and not 1 <= params["fast"] < params["slow"]:
+        raise ValueError("fast must be below slow")
+    if strategy == "rsi_reversion" and params["period"] < 2:
+        raise ValueError("period must be at least 2")
+    if strategy == "rsi_reversion" and not 0 < params["lower"] < params["upper"] < 100:
+        raise ValueError("RSI levels must satisfy 0 < lower < upper < 100")
+    if strategy == "bollinger_breakout" and (params["window"] < 2 or params["width"] <= 0):
+        raise ValueError("window must be at least 2 and width positive")
+    return params
+
+
+def simulate(closes: np.ndarray, positions: np.ndarray, fee_bps: float, slippage_bps: float) -> Dict[str, np.ndarray]:
+    """Daily strategy returns and equity for target `positions`.
+
+    A position decided at a close is held over the next bar. Every change in position pays the fee
+    plus slippage (both in basis points of the traded value).
+    """
+    returns = np.diff(closes) / closes[:-1]
+    held = positions[:-1]
+    turnover = np.abs(np.diff(positions, prepend=0.0))[:-1]
+    strategy_returns = held * returns - turnover * (fee_bps + slippage_bps) / 10_000
+    return {
+        "returns": strategy_returns,
+        "held": held,
+        "equity": np.concatenate(([1.0], np.cumprod(1 + strategy_returns))),
+        "benchmark": closes / closes[0],
+    }
+
+
+def backtest_stats(run: Dict[str, np.ndarray], risk_free_rate: float) -> Dict[str, float]:
+    returns, held, equity = run["returns"], run["held"], run["equity"]
+    days = len(returns)
+    total = float(equity[-1] - 1)
+    volatility = float(returns.std(ddof=1) * np.sqrt(TRADING_DAYS)) if days > 1 else 0.0
+    annualized = float(equity[-1] ** (TRADING_DAYS / days) - 1) if days and equity[-1] > 0 else -1.0
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+
+    # Round trips: each entry's run of held bars, plus the following bar that pays the exit cost
+    change = np.diff(held, prepend=0.0)
+    trade_id = np.cumsum(change > 0)
+    in_trade = (held > 0) | (change < 0)
+    trades = int(trade_id[-1]) if days else 0
+    trade_returns = np.expm1(np.bincount(trade_id[in_trade], weights=np.log1p(returns[in_trade]),
+                                         minlength=trades + 1)[1:])
+    return {
+        "total_return": total,
+        "annualized_return": annualized,
+        "volatility": volatility,
+        "sharpe_ratio": (annualized - risk_free_rate) / volatility if volatility > 0 else 0.0,
+        "max_drawdown": float(drawdown.min()),
+        "trades": trades,
+        "win_rate": float((trade_returns > 0).mean()) if trade_returns.size else 0.0,
+        "exposure": float(held.mean()) if days else 0.0,
+        "buy_and_hold_return": float(run["benchmark"][-1] - 1),
+    }
+
+
+def parameter_grid(strategy: str, grid: Dict[str, List]) -> List[Dict]:
+    """Every valid combination of the `grid` values (other parameters at their defaults)."""
+    names = list(grid)
+    combinations = []
+    for values in product(*(grid[name] for name in names)):
+        try:
+            combinations.append(strategy_params(strategy, dict(zip(names, values))))
+        except ValueError:
+            # e.g. fast >= slow: not a meaningful combination, skip it
+            continue
+    return combinations
+
+
+def sweep_chunk(strategy: str, symbol: str, closes: np.ndarray, param_sets: List[Dict],
+                fee_bps: float, slippage_bps: float, risk_free_rate: float) -> List[Dict]:
+    """Stats for one symbol under each parameter set; the unit of work sent to the process pool."""
+    results = []
+    for params in param_sets:
+        run = simulate(closes, strategy_positions(strategy, closes, params), fee_bps, slippage_bps)
+        results.append({"symbol": symbol, "params": params, **backtest_stats(run, risk_free_rate)})
+    return results
+
+
+def run_sweep(strategy: str, closes: Dict[str, np.ndarray], param_sets: List[Dict], fee_bps: float,
+              slippage_bps: float, risk_free_rate: float, pool: Optional[ProcessPoolExecutor] = None) -> List[Dict]:
+    """Every (symbol, parameter set) run, in chunks of SWEEP_CHUNK parameter sets.
+
+    With a pool, chunks run in parallel; results are the same as running them in-process.
+    """
+    tasks = [(strategy, symbol, series, param_sets[start:start + SWEEP_CHUNK], fee_bps, slippage_bps, risk_free_rate)
+             for symbol, series in closes.items() for start in range(0, len(param_sets), SWEEP_CHUNK)]
+    if pool is None:
+        chunks = [sweep_chunk(*task) for task in tasks]
+    else:
+        chunks = list(pool.map(sweep_chunk, *zip(*tasks)))
+    return [result for chunk in chunks for result in chunk]
+
+
+async def load_closes(symbols: List[str], days: int) -> Dict[str, pd.Series]:
+    """The last `days` daily closes per symbol from the OHLCV cache; symbols without enough history are left out.
+
+    The cache only holds OHLCV_HISTORY_PERIOD of bars, so a series may be shorter than `days`.
+    """
+    bars = await get_daily_bars(symbols)
+    closes = {}
+    for symbol in symbols:
+        if symbol in bars:
+            series = bars[symbol]["Close"].iloc[-days:]
+            if len(series) >= MIN_BARS:
+                closes[symbol] = series
+    return closes
+
+
+def equity_chart_spec(title: str, dates: List[str], equity: List[float], benchmark: List[float]) -> Dict:
+    """Strategy equity against buy and hold, as a Plotly figure the renderer can also turn into a PNG."""
+    spec = line_chart_spec(title, "Date", "Growth of 1", dates, equity)
+    spec["data"][0].update(name="Strategy", mode="lines")
+    spec["data"].append({"x": dates, "y": benchmark, "type": "scatter", "mode": "lines",
+                         "name": "Buy & hold", "line": {"width": 1, "dash": "dot"}})
+    return spec
+
+
+async def backtest_symbol(symbol: str, strategy: str, params: Dict, fee_bps: float, slippage_bps: float,
+                          days: int) -> Optional[Dict]:
+    """One strategy run with stats, the equity curve and a chart spec; None without enough history.
+
+    `truncated` is set when the cached history holds fewer than the requested `days` bars.
+    """
+    closes = (await load_closes([symbol], days)).get(symbol)
+    if closes is None:
+        return None
+    prices = closes.to_numpy()
+    run = simulate(prices, strategy_positions(strategy, prices, params), fee_bps, slippage_bps)
+    dates = [d.date().isoformat() for d in closes.index]
+    equity = np.round(run["equity"], 6).tolist()
+    benchmark = np.round(run["benchmark"], 6).tolist()
+    return {
+        "symbol": symbol,
+        "strategy": strategy,
+        "params": params,
+        "fee_bps": fee_bps,
+        "slippage_bps": slippage_bps,
+        "start": dates[0],
+        "end": dates[-1],
+        "requested_days": days,
+        "bars": len(dates),
+        "truncated": len(dates) < days,
+        "stats": backtest_stats(run, settings.risk_free_rate),
+        "dates": dates,
+        "equity": equity,
+        "benchmark": benchmark,
+        "positions": run["held"].astype(int).tolist(),
+        "chart": equity_chart_spec(f"{symbol} {strategy.replace('_', ' ')}", dates, equity, benchmark),
+    }
+
+
+async def sweep_symbols(symbols: List[str], strategy: str, grid: Dict[str, List], fee_bps: float,
+                        slippage_bps: float, days: int) -> Dict:
+    """Parameter sweep across symbols, ranked by Sharpe ratio. Sweeps of BACKTEST_PARALLEL_RUNS runs
+    or more fan out across the process pool. `truncated` lists symbols with fewer cached bars than `days`."""
+    param_sets = parameter_grid(strategy, grid)
+    if not param_sets:
+        raise ValueError("The grid has no valid parameter combinations")
+    if len(param_sets) * len(symbols) > MAX_SWEEP_RUNS:
+        raise ValueError(f"At most {MAX_SWEEP_RUNS} runs (parameter combinations x symbols) per sweep")
+    closes = await load_closes(symbols, days)
+    runs = len(param_sets) * len(closes)
+    pool = get_process_pool() if runs >= settings.backtest_parallel_runs else None
+    results = await asyncio.to_thread(
+        run_sweep, strategy, {s: c.to_numpy() for s, c in closes.items()}, param_sets,
+        fee_bps, slippage_bps, settings.risk_free_rate, pool
+    )
+    results.sort(key=lambda r: r["sharpe_ratio"], reverse=True)
+    return {
+        "strategy": strategy,
+        "symbols": list(closes),
+        "excluded": [s for s in symbols if s not in closes],
+        "truncated": {s: len(c) for s, c in closes.items() if len(c) < days},
+        "runs": len(results),
+        "results": results,
+    }
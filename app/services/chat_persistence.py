@@ -0,0 +1,98 @@
+from typing import Dict, List, Optional, Any
+from datetime import datetime
+from bson import ObjectId
+from pymongo import InsertOne, ReturnDocument
+
+# Fields sent to clients for a session summary (list views and session_update broadcasts)
+SESSION_SUMMARY_FIELDS = {
+    "_id": 1,
+    "session_id": 1,
+    "user_id": 1,
+    "title": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "message_count": 1,
+    "is_active": 1,
+}
+
+
+def serialize_session(session: Dict) -> Dict:
+    """Make a chat_sessions document JSON serializable, always exposing `_id` and `session_id` as strings."""
+    session["_id"] = str(session.get("_id"))
+    session["session_id"] = str(session.get("session_id") or session["_id"])
+    if isinstance(session.get("created_at"), datetime):
+        session["created_at"] = session["created_at"].isoformat()
+    if isinstance(session.get("updated_at"), datetime):
+        session["updated_at"] = session["updated_at"].isoformat()
+    return session
+
+
+class ChatPersistenceService:
+    """Write path for chat turns.
+
+    A session id is resolved to its chat_sessions document once per connection, so later
+    writes address the session by `_id` directly. Sessions only resolve for their owner, so a
+    client cannot write into another user's history by sending their session id. The user
+    message is stored as soon as it arrives; the AI reply is stored at the end of the turn with
+    a single `find_one_and_update` on chat_sessions, whose returned document doubles as the
+    broadcast summary.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._sessions: Dict[tuple, Optional[Dict]] = {}
+
+    def resolve_session(self, session_id: str, user_id: str) -> Optional[Dict]:
+        """Return `{_id, session_id, user_id}` for a session id owned by `user_id`, or None."""
+        if not session_id:
+            return None
+        key = (session_id, user_id)
+        if key in self._sessions:
+            return self._sessions[key]
+
+        projection = {"_id": 1, "session_id": 1, "user_id": 1}
+        session = self.db.chat_sessions.find_one({"session_id": session_id, "user_id": user_id}, projection)
+        if session is None and ObjectId.is_valid(session_id):
+            session = self.db.chat_sessions.find_one({"_id": ObjectId(session_id), "user_id": user_id}, projection)
+        if session is not None:
+            session["session_id"] = str(session.get("session_id") or session["_id"])
+        self._sessions[key] = session
+        return session
+
+    def store_messages(self, session_id: str, user_id: str, messages: List[Dict[str, Any]]) -> Optional[Dict]:
+        """Insert messages under the canonical session id and `user_id`; returns the resolved session.
+
+        Messages for a session the user does not own are stored under the id the client sent and
+        the user's own id, so they never show up in someone else's history.
+        """
+        session = self.resolve_session(session_id, user_id)
+        if messages:
+            canonical_id = session["session_id"] if session else session_id
+            self.db.chat_messages.bulk_write(
+                [InsertOne({**message, "session_id": canonical_id, "user_id": user_id}) for message in messages],
+                ordered=True
+            )
+        return session
+
+    def record_turn(self, session_id: str, user_id: str, messages: List[Dict[str, Any]],
+                    stored_earlier: int = 0) -> Optional[Dict]:
+        """Persist the remaining messages of one turn and bump the session counters.
+
+        `stored_earlier` counts messages of this turn already written with `store_messages`. The chat
+        socket stores the user's message on arrival and the reply here, so a turn costs two message
+        writes instead of one bulk_write: a dropped connection or failed model call must not lose
+        what the user sent, which a single write at the end of the turn would.
+        Returns the serialized session summary, or None when the session is unknown to this user.
+        """
+        session = self.store_messages(session_id, user_id, messages)
+        count = len(messages) + stored_earlier
+        if session is None or not count:
+            return None
+
+        summary = self.db.chat_sessions.find_one_and_update(
+            {"_id": session["_id"]},
+            {"$inc": {"message_count": count}, "$set": {"updated_at": datetime.utcnow()}},
+            projection=SESSION_SUMMARY_FIELDS,
+            return_document=ReturnDocument.AFTER
+        )
+        return serialize_session(summary) if summary else None
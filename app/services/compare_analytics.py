@@ -0,0 +1,250 @@
+import asyncio
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.ohlcv_cache import close_matrix, get_daily_bars
+from app.services.risk_engine import TRADING_DAYS, benchmark_for
+from app.services.stock_service import StockDataService, quote_price, to_yf_symbol
+from app.utils.ttl_cache import TTLCache
+
+# Most symbols one comparison may include (e.g. a whole sector)
+MAX_COMPARE_SYMBOLS = 50
+
+# Fewest shared daily returns worth comparing
+MIN_RETURNS = 20
+
+# Results keyed by (symbol set, window, beta window, benchmark, last bar date)
+_compare_cache = TTLCache(ttl=settings.ohlcv_cache_ttl, max_entries=500)
+
+# Point-in-time metrics table: metric -> company overview field (price comes from quotes, sentiment from news)
+TABLE_METRICS = {
+    "price": None,
+    "market_cap": "MarketCapitalization",
+    "pe_ratio": "PERatio",
+    "eps": "EPS",
+    "dividend_yield": "DividendYield",
+}
+
+# Headlines scored for the compare sentiment row (the latest few, as the compare table always has)
+SENTIMENT_HEADLINES = 3
+
+# Metrics tables keyed by (symbols, metrics)
+_table_cache = TTLCache(ttl=settings.compare_cache_ttl, max_entries=500)
+
+
+def correlation_matrix(returns: np.ndarray) -> np.ndarray:
+    """Pairwise correlation of the (bars x symbols) return columns; flat series correlate 0 with everything."""
+    centered = returns - returns.mean(axis=0)
+    norms = np.sqrt((centered ** 2).sum(axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = (centered.T @ centered) / np.outer(norms, norms)
+    corr = np.nan_to_num(corr)
+    np.fill_diagonal(corr, 1.0)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def rolling_beta(returns: np.ndarray, benchmark: np.ndarray, window: int) -> np.ndarray:
+    """((bars - window + 1) x symbols) beta of each column against `benchmark` over trailing windows.
+
+    Uses running sums, so every window and symbol is computed at once in O(bars x symbols).
+    """
+    def window_sums(a):
+        csum = np.cumsum(np.concatenate((np.zeros((1,) + a.shape[1:]), a)), axis=0)
+        return csum[window:] - csum[:-window]
+
+    sum_x = window_sums(returns)
+    sum_b = window_sums(benchmark)
+    sum_xb = window_sums(returns * benchmark[:, None])
+    sum_bb = window_sums(benchmark ** 2)
+    covariance = sum_xb - sum_x * sum_b[:, None] / window
+    variance = sum_bb - sum_b ** 2 / window
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = covariance / variance[:, None]
+    return np.where(variance[:, None] > 0, beta, np.nan)
+
+
+def average_linkage(distances: np.ndarray) -> List[List[float]]:
+    """Agglomerative clustering with average linkage (UPGMA) on a symmetric distance matrix.
+
+    Returns merges in scipy's linkage layout: [cluster a, cluster b, distance, size], where ids below
+    n are the input items and n + i is the cluster formed by merge i.
+    """
+    n = len(distances)
+    d = distances.astype(float).copy()
+    np.fill_diagonal(d, np.inf)
+    ids = list(range(n))
+    sizes = [1] * n
+    active = np.ones(n, dtype=bool)
+    merges = []
+    for step in range(n - 1):
+        masked = np.where(active[:, None] & active[None, :], d, np.inf)
+        i, j = divmod(int(np.argmin(masked)), n)
+        if i > j:
+            i, j = j, i
+        size = sizes[i] + sizes[j]
+        merges.append([ids[i], ids[j], float(d[i, j]), size])
+        # Average distance from the merged cluster to every other one, weighted by cluster sizes
+        d[i, :] = (d[i, :] * sizes[i] + d[j, :] * sizes[j]) / size
+        d[:, i] = d[i, :]
+        d[i, i] = np.inf
+        active[j] = False
+        ids[i], sizes[i] = n + step, size
+    return merges
+
+
+def leaf_order(merges: List[List[float]], n: int) -> List[int]:
+    """Items in dendrogram order, so similar symbols sit next to each other (e.g. for a heatmap)."""
+    if n == 1:
+        return [0]
+
+    def leaves(node):
+        if node < n:
+            return [node]
+        a, b = merges[node - n][:2]
+        return leaves(int(a)) + leaves(int(b))
+
+    return leaves(2 * n - 2)
+
+
+def cut_clusters(merges: List[List[float]], n: int, max_distance: float) -> List[int]:
+    """Flat cluster label per item: merges up to `max_distance` join clusters, later ones are left out."""
+    parent = list(range(2 * n - 1))
+
+    def root(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for step, (a, b, distance, _) in enumerate(merges):
+        if distance > max_distance:
+            break
+        parent[root(int(a))] = n + step
+        parent[root(int(b))] = n + step
+    roots = [root(i) for i in range(n)]
+    labels = {r: k for k, r in enumerate(dict.fromkeys(roots))}
+    return [labels[r] for r in roots]
+
+
+def compare_returns(closes: np.ndarray, symbols: List[str], beta_window: int, min_correlation: float) -> Dict:
+    """Analytics for aligned (bars x symbols + 1) closes with the benchmark in the last column."""
+    returns = closes[1:] / closes[:-1] - 1
+    assets, benchmark = returns[:, :-1], returns[:, -1]
+    corr = correlation_matrix(assets)
+    merges = average_linkage(1 - corr)
+    n = len(symbols)
+    labels = cut_clusters(merges, n, 1 - min_correlation)
+    clusters: Dict[int, List[str]] = {}
+    for symbol, label in zip(symbols, labels):
+        clusters.setdefault(label, []).append(symbol)
+
+    growth = closes / closes[0]
+    window = min(beta_window, len(returns))
+    return {
+        "correlation": np.round(corr, 4),
+        "order": [symbols[i] for i in leaf_order(merges, n)],
+        "linkage": merges,
+        "clusters": list(clusters.values()),
+        "beta": np.round(rolling_beta(assets, benchmark, window), 4),
+        "beta_window": window,
+        "growth": np.round(growth[:, :-1], 6),
+        "relative": np.round(growth[:, :-1] / growth[:, -1:], 6),
+        "volatility": np.round(assets.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS), 4),
+        "total_return": np.round(growth[-1, :-1] - 1, 4),
+    }
+
+
+def _series(matrix: np.ndarray, symbols: List[str]) -> Dict[str, List]:
+    """Column per symbol as a JSON-ready list (NaN as None)."""
+    return {s: [None if np.isnan(v) else float(v) for v in matrix[:, k]] for k, s in enumerate(symbols)}
+
+
+async def compare_symbols(symbols: List[str], window: int, beta_window: int, min_correlation: float = 0.5,
+                          benchmark: Optional[str] = None) -> Optional[Dict]:
+    """Correlation matrix, clusters, rolling beta and relative performance over the last `window`
+    shared daily returns. None without MIN_RETURNS shared returns; symbols without bars are excluded."""
+    benchmark = (benchmark or benchmark_for(symbols)).upper()
+    bars = await get_daily_bars(symbols + [benchmark])
+    used = [s for s in symbols if s in bars and s != benchmark]
+    if len(used) < 2 or benchmark not in bars:
+        return None
+    closes = close_matrix(bars, used + [benchmark], window)
+    if len(closes) <= MIN_RETURNS:
+        return None
+
+    key = (tuple(used), window, beta_window, round(min_correlation, 4), benchmark, closes.index[-1].isoformat())
+    cached = _compare_cache.get(key)
+    if cached is not None:
+        return cached
+
+    stats = await asyncio.to_thread(compare_returns, closes.to_numpy(), used, beta_window, min_correlation)
+    dates = [d.date().isoformat() for d in closes.index]
+    result = {
+        "symbols": used,
+        "excluded": [s for s in symbols if s not in used],
+        "benchmark": benchmark,
+        "start": dates[0],
+        "end": dates[-1],
+        "observations": len(dates) - 1,
+        "correlation": stats["correlation"].tolist(),
+        "order": stats["order"],
+        "clusters": stats["clusters"],
+        "linkage": stats["linkage"],
+        "beta_window": stats["beta_window"],
+        "beta_dates": dates[stats["beta_window"]:],
+        "rolling_beta": _series(stats["beta"], used),
+        "dates": dates,
+        "growth": _series(stats["growth"], used),
+        "relative": _series(stats["relative"], used),
+        "summary": [
+            {"symbol": s, "total_return": float(stats["total_return"][k]), "volatility": float(stats["volatility"][k]),
+             "beta": None if np.isnan(stats["beta"][-1, k]) else float(stats["beta"][-1, k])}
+            for k, s in enumerate(used)
+        ],
+    }
+    _compare_cache.set(key, result)
+    return result
+
+
+async def compare_table(symbols: List[str], metrics: List[str]) -> List[Dict]:
+    """Metric rows ({"metric": name, SYMBOL: value, ...}) plus a sentiment row.
+
+    Prices come from one batched quote request; overviews and headline sentiment are fetched
+    concurrently per symbol through the cached, provider-throttled stock service paths.
+    """
+    metrics = [m for m in metrics if m in TABLE_METRICS] or list(TABLE_METRICS)
+    key = (tuple(symbols), tuple(metrics))
+    cached = _table_cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def safe(coro, symbol, what):
+        try:
+            return await coro
+        except Exception as e:
+            print(f"Compare {what} failed for {symbol}: {e}")
+            return {}
+
+    # A session-backed service, so the AlphaVantage quote and overview fallbacks can run
+    async with StockDataService() as service:
+        quotes, overviews, sentiments = await asyncio.gather(
+            service.get_stock_quotes(symbols),
+            asyncio.gather(*(safe(service.get_company_overview(s), s, "overview") for s in symbols)),
+            asyncio.gather(*(safe(service.get_yf_sentiment(to_yf_symbol(s), SENTIMENT_HEADLINES), s, "sentiment")
+                             for s in symbols)),
+        )
+    rows = []
+    for metric in metrics:
+        row = {"metric": metric}
+        for symbol, overview in zip(symbols, overviews):
+            field = TABLE_METRICS[metric]
+            row[symbol] = quote_price(quotes.get(symbol)) if field is None else (overview or {}).get(field)
+        rows.append(row)
+    sentiment_row = {"metric": "sentiment"}
+    for symbol, sentiment in zip(symbols, sentiments):
+        sentiment_row[symbol] = (sentiment or {}).get("avg_sentiment", 0)
+    rows.append(sentiment_row)
+    _table_cache.set(key, rows)
+    return rows
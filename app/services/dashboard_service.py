@@ -0,0 +1,100 @@
+import asyncio
+import hashlib
+import json
+from typing import Dict, Tuple
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from app.config import settings
+from app.services.chat_persistence import serialize_session
+from app.services.holdings_store import load_positions, migrate_embedded_holdings, portfolio_totals
+from app.utils.ttl_cache import TTLCache
+
+# Per-user dashboard payloads with their ETag, keyed by the user id string
+_snapshots = TTLCache(ttl=settings.dashboard_cache_ttl, max_entries=10000)
+
+
+def invalidate_dashboard(user_id):
+    """Drop a user's cached dashboard after a chat, portfolio or watchlist write."""
+    if user_id is not None:
+        _snapshots.pop(str(user_id))
+
+
+def _chat_summary(db, user_id: str) -> Dict:
+    """Recent sessions and the session count in one $facet round trip."""
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$facet": {
+            "recent": [
+                {"$sort": {"updated_at": -1}},
+                {"$limit": 5},
+                {"$project": {"title": 1, "session_id": 1, "created_at": 1, "updated_at": 1, "message_count": 1}}
+            ],
+            "total": [{"$count": "n"}]
+        }}
+    ]
+    row = next(db.chat_sessions.aggregate(pipeline), None) or {}
+    total = row.get("total") or [{}]
+    return {"recent": row.get("recent", []), "count": total[0].get("n", 0)}
+
+
+def _portfolio_summary(db, user) -> Dict:
+    # Portfolios are keyed by the user's ObjectId; accept the string form as well
+    portfolio = db.portfolios.find_one(
+        {"user_id": {"$in": [user["_id"], str(user["_id"])]}},
+        {"cash_balance": 1, "daily_change": 1, "lots_migrated": 1, "holdings": 1}
+    )
+    if not portfolio:
+        return {}
+    portfolio = migrate_embedded_holdings(db, portfolio)
+    total_value, total_pnl = portfolio_totals(load_positions(db, portfolio["_id"]), portfolio.get("cash_balance", 0))
+    return {"total_value": total_value, "daily_change": portfolio.get("daily_change", 0), "total_pnl": total_pnl}
+
+
+def _watchlist(db, user_id: str):
+    return list(db.watchlists.find({"user_id": user_id}))
+
+
+async def build_dashboard_snapshot(db, user) -> Dict:
+    """Gather the dashboard queries concurrently and assemble the JSON-ready payload."""
+    user_id = str(user["_id"])
+    portfolio, chats, watchlist, research_count = await asyncio.gather(
+        asyncio.to_thread(_portfolio_summary, db, user),
+        asyncio.to_thread(_chat_summary, db, user_id),
+        asyncio.to_thread(_watchlist, db, user_id),
+        asyncio.to_thread(db.research_sessions.count_documents, {"user_id": user_id})
+    )
+
+    recent_chats = []
+    for session in chats["recent"]:
+        session = serialize_session(session)
+        session["message_count"] = int(session.get("message_count") or 0)
+        recent_chats.append(session)
+
+    return jsonable_encoder({
+        "portfolio_summary": {
+            "total_value": portfolio.get("total_value", 0),
+            "daily_change": portfolio.get("daily_change", 0),
+            "total_pnl": portfolio.get("total_pnl", 0)
+        },
+        "recent_chats": recent_chats,
+        "watchlist": watchlist,
+        # Realtime counts for profile/account stats
+        "counts": {
+            "chat_sessions": chats["count"],
+            "research_reports": research_count
+        }
+    }, custom_encoder={ObjectId: str})
+
+
+async def get_dashboard_snapshot(db, user) -> Tuple[Dict, str]:
+    """Return (payload, etag) for a user's dashboard, cached for DASHBOARD_CACHE_TTL seconds."""
+    key = str(user["_id"])
+    cached = _snapshots.get(key)
+    if cached is not None:
+        return cached
+    payload = await build_dashboard_snapshot(db, user)
+    etag = '"' + hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest() + '"'
+    _snapshots.set(key, (payload, etag))
+    return payload, etag
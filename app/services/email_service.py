@@ -1,8 +1,13 @@
+import asyncio
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from app.config import settings
 
+# Outgoing notification emails (e.g. triggered alerts), sent one at a time by run_email_sender.
+# Bounded: if SMTP falls behind, new notifications are dropped rather than growing memory.
+_outbox: asyncio.Queue = asyncio.Queue(maxsize=settings.email_queue_size)
+
 async def send_verification_email(email: str, verification_code: str):
     """Send email verification code to user"""
     
@@ -24,9 +29,30 @@ async def send_verification_email(email: str, verification_code: str):
     
     return await send_email(email, subject, body)
 
+def queue_email(to_email: str, subject: str, body: str) -> bool:
+    """Queue a notification email without blocking; returns False if the queue is full."""
+    try:
+        _outbox.put_nowait((to_email, subject, body))
+        return True
+    except asyncio.QueueFull:
+        print(f"Email queue full, dropping email to {to_email}")
+        return False
+
+async def run_email_sender():
+    """Background task: deliver queued emails, each in a worker thread so SMTP never blocks the event loop."""
+    while True:
+        to_email, subject, body = await _outbox.get()
+        try:
+            await asyncio.to_thread(_deliver, to_email, subject, body)
+        except Exception:
+            # Already logged by _deliver
+            pass
+
 async def send_email(to_email: str, subject: str, body: str):
     """Send email using SMTP"""
-    
+    return _deliver(to_email, subject, body)
+
+def _deliver(to_email: str, subject: str, body: str):
     try:
         # Create message
         msg = MIMEMultipart()
@@ -0,0 +1,159 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.services.nav_service import trade_day
+from app.services.portfolio_valuation import revalue_holdings
+from app.services.stock_service import quote_price
+from app.utils.security import get_shared_db
+
+# Open tax lots, one document per lot: {portfolio_id, symbol, quantity, price, trade_date, opened_at}.
+# `price` is the cost per share including fees. Closed lots are deleted; the ledger keeps the history.
+LOTS_COLLECTION = "portfolio_lots"
+
+# Latest mark per symbol, shared by every portfolio: {symbol, price, updated_at}. Revaluation only
+# touches these, so it never rewrites position data or contends with trades.
+MARKS_COLLECTION = "price_marks"
+
+
+def lot_document(portfolio_id, symbol: str, quantity: float, price: float, trade_date: str,
+                 opened_at: Optional[datetime] = None) -> Dict:
+    return {
+        "portfolio_id": str(portfolio_id),
+        "symbol": symbol.upper(),
+        "quantity": float(quantity),
+        "price": float(price),
+        "trade_date": trade_date,
+        "opened_at": opened_at or datetime.utcnow(),
+    }
+
+
+def seed_mark_ops(prices: Dict[str, float]) -> List[UpdateOne]:
+    """Upserts giving symbols a mark only if they have none yet (e.g. the trade price of a first buy)."""
+    now = datetime.utcnow()
+    return [UpdateOne({"symbol": symbol}, {"$setOnInsert": {"price": price, "updated_at": now}}, upsert=True)
+            for symbol, price in prices.items()]
+
+
+def write_marks(db, prices: Dict[str, float]):
+    """Record new marks for `prices` in one bulk_write."""
+    if not prices:
+        return
+    now = datetime.utcnow()
+    db[MARKS_COLLECTION].bulk_write([
+        UpdateOne({"symbol": symbol}, {"$set": {"price": price, "updated_at": now}}, upsert=True)
+        for symbol, price in prices.items()
+    ], ordered=False)
+
+
+def migrate_embedded_holdings(db, portfolio: Dict) -> Dict:
+    """Lazily move a portfolio's legacy embedded `holdings` array into lot documents and marks.
+
+    Lots are upserted under ids derived from the portfolio, symbol and position in the array, so a
+    migration that is interrupted or runs concurrently writes each lot once. The portfolio is only
+    flagged as migrated, and its array removed, after the lots are stored.
+    Returns the portfolio without the embedded array.
+    """
+    if portfolio.get("lots_migrated"):
+        return portfolio
+    ops, marks = [], {}
+    for i, h in enumerate(portfolio.get("holdings") or []):
+        symbol = h["symbol"].upper()
+        opened_at = h.get("added_at") if isinstance(h.get("added_at"), datetime) else None
+        for j, lot in enumerate(h.get("lots") or [{"quantity": h.get("quantity") or 0, "price": h.get("average_cost") or 0,
+                                                    "trade_date": trade_day(opened_at or datetime.utcnow())}]):
+            if lot["quantity"] > 0:
+                document = lot_document(portfolio["_id"], symbol, lot["quantity"], lot["price"], lot["trade_date"], opened_at)
+                ops.append(UpdateOne({"_id": f"{portfolio['_id']}:{symbol}:{i}.{j}"}, {"$setOnInsert": document}, upsert=True))
+        if h.get("current_price"):
+            marks[symbol] = float(h["current_price"])
+    if ops:
+        try:
+            db[LOTS_COLLECTION].bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # A concurrent migration inserted the same lot first
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+    if marks:
+        db[MARKS_COLLECTION].bulk_write(seed_mark_ops(marks), ordered=False)
+    db.portfolios.update_one({"_id": portfolio["_id"]}, {"$set": {"lots_migrated": True}, "$unset": {"holdings": ""}})
+    portfolio = {k: v for k, v in portfolio.items() if k != "holdings"}
+    portfolio["lots_migrated"] = True
+    return portfolio
+
+
+def find_portfolio(db, user_id) -> Optional[Dict]:
+    """A user's portfolio document, migrated to the lot store if needed."""
+    portfolio = db.portfolios.find_one({"user_id": user_id})
+    return migrate_embedded_holdings(db, portfolio) if portfolio else None
+
+
+def load_positions(db, portfolio_id) -> List[Dict]:
+    """Holdings aggregated from open lots and joined with their marks in one pipeline.
+
+    Each position has the shape the portfolio API has always returned: symbol, quantity,
+    average_cost, current_price (the mark, or cost if unmarked), total_value, unrealized P&L and added_at.
+    """
+    rows = db[LOTS_COLLECTION].aggregate([
+        {"$match": {"portfolio_id": str(portfolio_id)}},
+        {"$group": {
+            "_id": "$symbol",
+            "quantity": {"$sum": "$quantity"},
+            "cost": {"$sum": {"$multiply": ["$quantity", "$price"]}},
+            "added_at": {"$min": "$opened_at"},
+        }},
+        {"$lookup": {"from": MARKS_COLLECTION, "localField": "_id", "foreignField": "symbol", "as": "mark"}},
+        {"$sort": {"_id": 1}},
+    ])
+    positions, marks = [], {}
+    for row in rows:
+        if row["quantity"] <= 1e-9:
+            continue
+        average_cost = row["cost"] / row["quantity"]
+        positions.append({
+            "symbol": row["_id"],
+            "quantity": row["quantity"],
+            "average_cost": average_cost,
+            "current_price": average_cost,
+            "added_at": row["added_at"],
+        })
+        if row["mark"]:
+            marks[row["_id"]] = row["mark"][0]["price"]
+    positions, _, _ = revalue_holdings(positions, marks)
+    return positions
+
+
+def portfolio_totals(positions: List[Dict], cash_balance: float) -> Tuple[float, float]:
+    """(total value including cash, unrealized P&L) of loaded positions."""
+    value = sum(p["total_value"] for p in positions)
+    return value + cash_balance, sum(p["unrealized_pnl"] for p in positions)
+
+
+def open_lots(db, portfolio_id, symbols: Optional[Iterable[str]] = None, with_ids: bool = False) -> List[Dict]:
+    """Open lots oldest first (FIFO order), optionally for some symbols only."""
+    query = {"portfolio_id": str(portfolio_id)}
+    if symbols is not None:
+        query["symbol"] = {"$in": [s.upper() for s in symbols]}
+    projection = None if with_ids else {"_id": 0}
+    return list(db[LOTS_COLLECTION].find(query, projection).sort([("trade_date", 1), ("opened_at", 1)]))
+
+
+def add_lot(db, portfolio_id, symbol: str, quantity: float, price: float, trade_date: str):
+    """Open a lot for a buy; the symbol gets the trade price as its mark if it has none yet."""
+    db[LOTS_COLLECTION].insert_one(lot_document(portfolio_id, symbol, quantity, price, trade_date))
+    db[MARKS_COLLECTION].bulk_write(seed_mark_ops({symbol.upper(): price}))
+
+
+def close_position(db, portfolio_id, symbol: str) -> int:
+    """Close every open lot of a symbol; returns how many were closed."""
+    return db[LOTS_COLLECTION].delete_many({"portfolio_id": str(portfolio_id), "symbol": symbol.upper()}).deleted_count
+
+
+async def record_marks_on_tick(ticks: Dict[str, Dict]):
+    """Market data hub listener: store the new marks. Positions are valued from them when read."""
+    prices = {symbol: quote_price(quote) for symbol, quote in ticks.items() if quote_price(quote) is not None}
+    if prices:
+        await asyncio.to_thread(write_marks, get_shared_db(), prices)
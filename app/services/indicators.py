@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+
+def sma(closes: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average; NaN until `window` closes are available."""
+    closes = np.asarray(closes, dtype=float)
+    out = np.full(len(closes), np.nan)
+    if len(closes) >= window:
+        csum = np.cumsum(np.insert(closes, 0, 0.0))
+        out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+
+def rsi(closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """Wilder's relative strength index (0-100); NaN for the first `period` closes."""
+    delta = np.diff(np.asarray(closes, dtype=float), prepend=np.nan)
+    gains = pd.Series(np.clip(delta, 0, None))
+    losses = pd.Series(np.clip(-delta, 0, None))
+    avg_gain = gains.ewm(alpha=1 / period, adjust=False, min_periods=period).mean().to_numpy()
+    avg_loss = losses.ewm(alpha=1 / period, adjust=False, min_periods=period).mean().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100 - 100 / (1 + avg_gain / avg_loss)
+    # No losses in the window: RSI is 100 (or undefined if the price did not move at all)
+    return np.where((avg_loss == 0) & (avg_gain > 0), 100.0, out)
+
+
+def bollinger(closes: np.ndarray, window: int = 20, width: float = 2.0):
+    """(middle, upper, lower) Bollinger bands: SMA plus/minus `width` population standard deviations."""
+    closes = np.asarray(closes, dtype=float)
+    middle = sma(closes, window)
+    std = np.full(len(closes), np.nan)
+    if len(closes) >= window:
+        std[window - 1:] = np.lib.stride_tricks.sliding_window_view(closes, window).std(axis=1)
+    return middle, middle + width * std, middle - width * std
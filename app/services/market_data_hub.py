@@ -0,0 +1,161 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from app.config import settings
+from app.services.alert_service import ALERTS_COLLECTION
+from app.services.holdings_store import LOTS_COLLECTION
+from app.services.stock_service import StockDataService, stock_service, detect_market, is_market_open, cache_quote, quote_price
+from app.utils.security import get_shared_db
+
+# Called with {symbol: quote} for every symbol whose price moved in a poll
+TickListener = Callable[[Dict[str, Dict]], Awaitable[None]]
+
+# Scheduler resolution: how often the hub checks which symbols are due (seconds)
+_SCHEDULER_TICK = 5
+
+
+def load_tracked_symbols(db) -> Set[str]:
+    """Union of symbols held in any portfolio, listed on any watchlist or watched by an active alert."""
+    symbols = set(db[LOTS_COLLECTION].distinct("symbol"))
+    # Portfolios not yet migrated to lot documents
+    symbols.update(db.portfolios.distinct("holdings.symbol"))
+    symbols.update(db.watchlists.distinct("symbol"))
+    symbols.update(db[ALERTS_COLLECTION].distinct("symbol", {"active": True}))
+    return {s.upper() for s in symbols if isinstance(s, str) and s}
+
+
+class MarketDataHub:
+    """Polls each tracked symbol once per interval for the whole process and fans ticks out.
+
+    Symbols in open markets are polled every MARKET_POLL_INTERVAL seconds and those in closed
+    markets every MARKET_CLOSED_POLL_INTERVAL. Polled quotes go into the shared quote cache with a
+    TTL that outlives the next poll, so per-user quote reads for tracked symbols are cache reads.
+    """
+
+    def __init__(self):
+        self._tracked: Set[str] = set()
+        self._tracked_loaded_at = float("-inf")
+        # Symbols requested outside portfolios/watchlists (e.g. stream subscriptions) -> expiry
+        self._adhoc: Dict[str, float] = {}
+        self._next_poll: Dict[str, float] = {}
+        self._last_price: Dict[str, float] = {}
+        self._listeners: List[TickListener] = []
+        self._topics: Dict[str, Set[asyncio.Queue]] = {}
+
+    def symbols(self) -> Set[str]:
+        now = time.monotonic()
+        self._adhoc = {s: expires for s, expires in self._adhoc.items() if expires > now}
+        return self._tracked | set(self._adhoc) | set(self._topics)
+
+    def track(self, symbols: Iterable[str]):
+        """Keep polling `symbols` for MARKET_ADHOC_TTL seconds even if no portfolio holds them."""
+        expires = time.monotonic() + settings.market_adhoc_ttl
+        for symbol in symbols:
+            if symbol:
+                self._adhoc[symbol.upper()] = expires
+
+    def add_listener(self, listener: TickListener):
+        self._listeners.append(listener)
+
+    def subscribe(self, symbols: Iterable[str] = ()) -> asyncio.Queue:
+        """Queue receiving {symbol: quote} batches for the subscribed symbols."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        self.update_subscription(queue, add=symbols)
+        return queue
+
+    def update_subscription(self, queue: asyncio.Queue, add: Iterable[str] = (), remove: Iterable[str] = ()):
+        for symbol in add:
+            self._topics.setdefault(symbol.upper(), set()).add(queue)
+        for symbol in remove:
+            self._drop(symbol.upper(), queue)
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        for symbol in list(self._topics):
+            self._drop(symbol, queue)
+
+    def _drop(self, symbol: str, queue: asyncio.Queue):
+        subscribers = self._topics.get(symbol)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._topics[symbol]
+
+    async def get_quotes(self, symbols: Iterable[str], service: Optional[StockDataService] = None) -> Dict[str, Dict]:
+        """Quotes for user requests: cache reads for polled symbols; anything else is fetched once and then polled."""
+        symbols = [s.upper() for s in symbols if s]
+        self.track(s for s in symbols if s not in self._tracked)
+        return await (service or stock_service).get_stock_quotes(symbols)
+
+    def _poll_interval(self, symbol: str) -> float:
+        if is_market_open(detect_market(symbol)):
+            return settings.market_poll_interval
+        return settings.market_closed_poll_interval
+
+    async def poll_once(self) -> Dict[str, Dict]:
+        """Fetch every due symbol in batches, refresh the quote cache and publish price changes."""
+        now = time.monotonic()
+        if now - self._tracked_loaded_at >= settings.market_symbols_refresh:
+            self._tracked = await asyncio.to_thread(load_tracked_symbols, get_shared_db())
+            self._tracked_loaded_at = now
+
+        symbols = self.symbols()
+        for stale in set(self._next_poll) - symbols:
+            self._next_poll.pop(stale, None)
+            self._last_price.pop(stale, None)
+
+        due = [s for s in symbols if self._next_poll.get(s, 0) <= now]
+        ticks = {}
+        for start in range(0, len(due), settings.market_batch_size):
+            batch = due[start:start + settings.market_batch_size]
+            quotes = await stock_service.get_stock_quotes(batch, refresh=True)
+            for symbol in batch:
+                interval = self._poll_interval(symbol)
+                self._next_poll[symbol] = now + interval
+                quote = quotes.get(symbol)
+                if quote is None:
+                    continue
+                cache_quote(symbol, quote, ttl=interval * 2)
+                price = quote_price(quote)
+                if price != self._last_price.get(symbol):
+                    self._last_price[symbol] = price
+                    ticks[symbol] = quote
+
+        if ticks:
+            await self.publish(ticks)
+        return ticks
+
+    async def publish(self, ticks: Dict[str, Dict]):
+        for listener in list(self._listeners):
+            try:
+                await listener(ticks)
+            except Exception as e:
+                print(f"Market tick listener failed: {e}")
+
+        # One message per subscriber, holding only the symbols it follows
+        batches: Dict[asyncio.Queue, Dict[str, Dict]] = {}
+        for symbol, quote in ticks.items():
+            for queue in self._topics.get(symbol, ()):
+                batches.setdefault(queue, {})[symbol] = quote
+        for queue, quotes in batches.items():
+            try:
+                queue.put_nowait(quotes)
+            except asyncio.QueueFull:
+                # Slow consumer: it will catch up on the next tick
+                pass
+
+    async def run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                print(f"Market data poll failed: {e}")
+            await asyncio.sleep(_SCHEDULER_TICK)
+
+
+market_hub = MarketDataHub()
+
+
+async def run_market_data_hub():
+    """Background task: poll tracked symbols for the lifetime of the app."""
+    await market_hub.run()
@@ -0,0 +1,196 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
+
+from app.config import settings
+from app.services.ohlcv_cache import get_daily_bars
+from app.services.risk_engine import TRADING_DAYS
+from app.utils.security import get_shared_db
+
+# One row per portfolio per trading day:
+#   {portfolio_id, date: "YYYY-MM-DD", nav, holdings_value, cash, net_flow, twr_index, positions: [{symbol, quantity}]}
+# `twr_index` is the time-weighted return index (1.0 at inception), so returns exclude deposits and purchases.
+NAV_COLLECTION = "portfolio_nav"
+
+
+def trade_day(value) -> str:
+    """Ledger date key (YYYY-MM-DD) for a date, datetime or ISO string."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat()
+
+
+def mark_nav_dirty(db, portfolio_id, day: str):
+    """Record that NAV rows from `day` onwards must be recomputed (e.g. after a backdated trade)."""
+    db.portfolios.update_one({"_id": portfolio_id}, {"$min": {"nav_dirty_from": day}})
+
+
+def build_nav_rows(days: List[str], symbols: List[str], closes: np.ndarray, start_positions: np.ndarray,
+                   trades: List[Dict], cash: float, prev_nav: Optional[float], prev_index: float) -> List[Dict]:
+    """NAV rows for `days` (trading days, ascending) by replaying `trades` on top of `start_positions`.
+
+    `closes` is (days x symbols), forward-filled. Trades dated on a non-trading day apply to the next
+    trading day; trades after the last day are ignored. A buy adds its cost to the day's net flow and a
+    sell subtracts its proceeds, so `twr_index` only moves with prices.
+    """
+    n = len(days)
+    columns = {s: i for i, s in enumerate(symbols)}
+    deltas = np.zeros((n, len(symbols)))
+    flows = np.zeros(n)
+    day_of_trade = np.searchsorted(np.array(days), [t["trade_date"] for t in trades])
+    for trade, i in zip(trades, day_of_trade):
+        if i >= n:
+            continue
+        signed = float(trade["quantity"]) * (-1 if trade.get("type") == "sell" else 1)
+        deltas[i, columns[trade["symbol"]]] += signed
+        flows[i] += signed * float(trade["price"])
+
+    positions = start_positions + np.cumsum(deltas, axis=0)
+    holdings_value = np.nansum(positions * closes, axis=1)
+    nav = holdings_value + cash
+    prev = np.concatenate(([prev_nav or 0.0], nav[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(prev > 0, (nav - flows) / prev - 1, 0.0)
+    index = prev_index * np.cumprod(1 + returns)
+
+    rows = []
+    for i, day in enumerate(days):
+        rows.append({
+            "date": day,
+            "nav": float(nav[i]),
+            "holdings_value": float(holdings_value[i]),
+            "cash": float(cash),
+            "net_flow": float(flows[i]),
+            "twr_index": float(index[i]),
+            "positions": [{"symbol": s, "quantity": float(q)} for s, q in zip(symbols, positions[i]) if abs(q) > 1e-9],
+        })
+    return rows
+
+
+def _backfill_trade_dates(db, portfolio_id: str):
+    """Lazily give ledger entries written before `trade_date` existed one derived from their timestamp."""
+    db.transactions.update_many(
+        {"portfolio_id": portfolio_id, "trade_date": {"$exists": False}},
+        [{"$set": {"trade_date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}}}]
+    )
+
+
+async def update_nav(db, portfolio: Dict) -> int:
+    """Bring a portfolio's NAV rows up to date and return how many rows were written.
+
+    Recomputes from `nav_dirty_from` when a backdated trade was recorded, otherwise from the last
+    stored day (whose close may have been provisional). Earlier rows are never touched; the
+    positions and TWR index carry forward from the last row before the start date. Rows are
+    upserted per date, so concurrent updates never leave the series empty or collide on the
+    unique (portfolio_id, date) index with a bulk insert.
+    """
+    portfolio_id = str(portfolio["_id"])
+    nav = db[NAV_COLLECTION]
+    last = nav.find_one({"portfolio_id": portfolio_id}, sort=[("date", DESCENDING)])
+    if last is None:
+        await asyncio.to_thread(_backfill_trade_dates, db, portfolio_id)
+        first = db.transactions.find_one({"portfolio_id": portfolio_id}, {"trade_date": 1}, sort=[("trade_date", ASCENDING)])
+        if first is None:
+            return 0
+        start = first["trade_date"]
+    else:
+        start = last["date"]
+    dirty = portfolio.get("nav_dirty_from")
+    if dirty and dirty < start:
+        start = dirty
+
+    base = nav.find_one({"portfolio_id": portfolio_id, "date": {"$lt": start}}, sort=[("date", DESCENDING)])
+    # Every trade after the base row's positions, including ones dated on non-trading days before `start`
+    trade_query = {"portfolio_id": portfolio_id}
+    if base:
+        trade_query["trade_date"] = {"$gt": base["date"]}
+    trades = list(db.transactions.find(
+        trade_query, {"symbol": 1, "type": 1, "quantity": 1, "price": 1, "trade_date": 1}
+    ).sort("trade_date", ASCENDING))
+    start_positions = {p["symbol"]: p["quantity"] for p in (base or {}).get("positions", [])}
+    symbols = list(dict.fromkeys(list(start_positions) + [t["symbol"] for t in trades]))
+
+    rows = []
+    bars = await get_daily_bars(symbols) if symbols else {}
+    if bars:
+        closes = pd.concat([bars[s]["Close"].rename(s) for s in symbols if s in bars], axis=1)
+        closes = closes.reindex(columns=symbols).sort_index().ffill()
+        closes = closes[closes.index >= pd.Timestamp(start)]
+        if not closes.empty:
+            rows = build_nav_rows(
+                [d.date().isoformat() for d in closes.index], symbols, closes.to_numpy(),
+                np.array([start_positions.get(s, 0.0) for s in symbols]), trades,
+                float(portfolio.get("cash_balance", 0)),
+                base["nav"] if base else None, base["twr_index"] if base else 1.0
+            )
+
+    if rows:
+        nav.bulk_write([
+            ReplaceOne({"portfolio_id": portfolio_id, "date": row["date"]}, {"portfolio_id": portfolio_id, **row}, upsert=True)
+            for row in rows
+        ], ordered=False)
+        # Drop stored days in the recomputed range that are no longer trading days in the bars
+        nav.delete_many({"portfolio_id": portfolio_id, "date": {"$gte": start, "$nin": [row["date"] for row in rows]}})
+    # Only clear the marker if no earlier backdated trade arrived while we were computing
+    db.portfolios.update_one({"_id": portfolio["_id"], "nav_dirty_from": dirty}, {"$unset": {"nav_dirty_from": ""}})
+    return len(rows)
+
+
+def nav_series(db, portfolio_id: str, days: Optional[int] = None) -> List[Dict]:
+    """Stored NAV rows, oldest first, optionally limited to the last `days` calendar days."""
+    query = {"portfolio_id": portfolio_id}
+    if days:
+        query["date"] = {"$gte": (datetime.utcnow().date() - timedelta(days=days)).isoformat()}
+    return list(db[NAV_COLLECTION].find(query, {"_id": 0, "positions": 0}).sort("date", ASCENDING))
+
+
+def performance_metrics(rows: List[Dict]) -> Dict[str, float]:
+    """Daily change and time-weighted returns (percent) from NAV rows, oldest first.
+
+    With less than a year of history `annualized_return` is the return since inception, not extrapolated.
+    """
+    if not rows:
+        return {"daily_change": 0.0, "daily_change_percent": 0.0, "ytd_return": 0.0, "annualized_return": 0.0}
+    last = rows[-1]
+    metrics = {"daily_change": 0.0, "daily_change_percent": 0.0}
+    if len(rows) > 1:
+        prev = rows[-2]
+        metrics["daily_change"] = last["nav"] - prev["nav"] - last["net_flow"]
+        if prev["nav"] > 0:
+            metrics["daily_change_percent"] = metrics["daily_change"] / prev["nav"] * 100
+
+    year_start = f"{last['date'][:4]}-01-01"
+    prior = [r for r in rows if r["date"] < year_start]
+    ytd_base = prior[-1]["twr_index"] if prior else 1.0
+    metrics["ytd_return"] = (last["twr_index"] / ytd_base - 1) * 100
+
+    periods = len(rows) - 1
+    metrics["annualized_return"] = (
+        (last["twr_index"] ** (TRADING_DAYS / periods) - 1) * 100 if periods >= TRADING_DAYS else
+        (last["twr_index"] - 1) * 100
+    )
+    return metrics
+
+
+async def run_nav_updater():
+    """Background task: extend every portfolio's NAV series and apply pending backdated recomputes."""
+    while True:
+        await asyncio.sleep(settings.nav_update_interval)
+        try:
+            db = get_shared_db()
+            portfolios = await asyncio.to_thread(
+                lambda: list(db.portfolios.find({}, {"_id": 1, "cash_balance": 1, "nav_dirty_from": 1}))
+            )
+            for portfolio in portfolios:
+                try:
+                    await update_nav(db, portfolio)
+                except Exception as e:
+                    print(f"NAV update failed for portfolio {portfolio['_id']}: {e}")
+        except Exception as e:
+            print(f"NAV updater failed: {e}")
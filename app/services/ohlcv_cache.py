@@ -0,0 +1,80 @@
+import asyncio
+from typing import Dict, Iterable, List
+
+import pandas as pd
+
+from app.config import settings
+from app.services.stock_service import to_yf_symbol
+from app.utils.ttl_cache import TTLCache
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Daily bars per upper-cased symbol: a DataFrame with OHLCV_COLUMNS on an ascending DatetimeIndex.
+# Each entry holds OHLCV_HISTORY_PERIOD of history; callers slice the window they need.
+_bars = TTLCache(ttl=settings.ohlcv_cache_ttl, max_entries=2000)
+
+# Download in progress per symbol, so concurrent requests for a symbol share one fetch while
+# downloads of unrelated symbols run independently
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def _download_bars(symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    """One yfinance download of daily bars for all `symbols`."""
+    import yfinance as yf
+    tickers = {to_yf_symbol(s): s for s in symbols}
+    frame = yf.download(list(tickers), period=settings.ohlcv_history_period, interval="1d",
+                        group_by="ticker", auto_adjust=True, progress=False, threads=True)
+    bars = {}
+    for yf_symbol, symbol in tickers.items():
+        try:
+            data = frame[yf_symbol] if isinstance(frame.columns, pd.MultiIndex) else frame
+            data = data[OHLCV_COLUMNS].dropna(subset=["Close"])
+        except KeyError:
+            continue
+        if data.empty:
+            continue
+        data.index = pd.DatetimeIndex(data.index).tz_localize(None).normalize()
+        bars[symbol] = data.sort_index().astype(float)
+    return bars
+
+
+def _store_download(symbols: List[str], future: asyncio.Future):
+    """Done callback of a download: cache its bars and release its symbols."""
+    for symbol in symbols:
+        if _inflight.get(symbol) is future:
+            _inflight.pop(symbol)
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        print(f"OHLCV download failed: {future.exception()}")
+        return
+    for symbol, frame in future.result().items():
+        _bars.set(symbol, frame)
+
+
+async def get_daily_bars(symbols: Iterable[str]) -> Dict[str, pd.DataFrame]:
+    """Cached daily OHLCV bars keyed by upper-cased symbol. Misses not already being fetched are
+    downloaded in one batch; symbols with no data are left out."""
+    wanted = list(dict.fromkeys(s.upper() for s in symbols if s))
+    bars = {s: _bars.get(s) for s in wanted}
+    missing = [s for s, frame in bars.items() if frame is None]
+    if missing:
+        futures = {_inflight[s] for s in missing if s in _inflight}
+        to_fetch = [s for s in missing if s not in _inflight]
+        if to_fetch:
+            future = asyncio.get_running_loop().run_in_executor(None, _download_bars, to_fetch)
+            for symbol in to_fetch:
+                _inflight[symbol] = future
+            future.add_done_callback(lambda done, fetched=to_fetch: _store_download(fetched, done))
+            futures.add(future)
+        # Shielded: a caller that goes away does not cancel a download other requests wait on
+        await asyncio.gather(*(asyncio.shield(f) for f in futures), return_exceptions=True)
+        bars = {s: _bars.get(s) for s in wanted}
+    return {s: frame for s, frame in bars.items() if frame is not None}
+
+
+def close_matrix(bars: Dict[str, pd.DataFrame], symbols: List[str], lookback: int) -> pd.DataFrame:
+    """Closing prices for `symbols` (columns, in order) on the dates where all of them traded,
+    limited to the last `lookback` + 1 bars so there are `lookback` returns."""
+    closes = pd.concat([bars[s]["Close"].rename(s) for s in symbols], axis=1, join="inner")
+    return closes.dropna().tail(lookback + 1)
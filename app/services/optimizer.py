@@ -0,0 +1,152 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+OPTIMIZATION_METHODS = ("min_variance", "risk_parity", "frontier")
+
+# Risk-aversion grid spanning the efficient frontier, from return-seeking to variance-minimizing
+FRONTIER_RISK_AVERSIONS = np.logspace(-1, 2.5, 24)
+
+# Trades smaller than this (in currency) are not worth suggesting
+MIN_TRADE_VALUE = 1.0
+
+
+def project_capped_simplex(v: np.ndarray, total: float, cap: float) -> np.ndarray:
+    """Euclidean projection of `v` onto {w : 0 <= w <= cap, sum(w) = total}, by bisection on the shift."""
+    lo, hi = float(v.min()) - cap, float(v.max())
+    for _ in range(100):
+        tau = (lo + hi) / 2
+        if np.clip(v - tau, 0.0, cap).sum() > total:
+            lo = tau
+        else:
+            hi = tau
+    return np.clip(v - (lo + hi) / 2, 0.0, cap)
+
+
+def _projected_gradient(cov: np.ndarray, mu: np.ndarray, risk_aversion: float, total: float, cap: float,
+                        iterations: int = 2000) -> np.ndarray:
+    """Minimize (risk_aversion / 2) w'Σw - mu'w over the capped simplex."""
+    step = 1.0 / (risk_aversion * float(np.linalg.eigvalsh(cov)[-1]) + 1e-12)
+    w = project_capped_simplex(np.full(len(mu), total / len(mu)), total, cap)
+    for _ in range(iterations):
+        nxt = project_capped_simplex(w - step * (risk_aversion * cov @ w - mu), total, cap)
+        if np.abs(nxt - w).max() < 1e-10:
+            return nxt
+        w = nxt
+    return w
+
+
+def _scipy_mean_variance(cov: np.ndarray, mu: np.ndarray, risk_aversion: float, total: float, cap: float) -> np.ndarray:
+    from scipy.optimize import minimize
+
+    n = len(mu)
+    result = minimize(
+        lambda w: 0.5 * risk_aversion * w @ cov @ w - mu @ w,
+        np.full(n, total / n),
+        jac=lambda w: risk_aversion * cov @ w - mu,
+        bounds=[(0.0, cap)] * n,
+        constraints=[{"type": "eq", "fun": lambda w: w.sum() - total, "jac": lambda w: np.ones(n)}],
+        method="SLSQP",
+    )
+    if not result.success:
+        raise ValueError(f"Optimizer did not converge: {result.message}")
+    return project_capped_simplex(result.x, total, cap)
+
+
+def mean_variance_weights(cov: np.ndarray, mu: np.ndarray, risk_aversion: float, total: float, cap: float,
+                          solver: str = "numpy") -> np.ndarray:
+    if solver == "scipy":
+        return _scipy_mean_variance(cov, mu, risk_aversion, total, cap)
+    return _projected_gradient(cov, mu, risk_aversion, total, cap)
+
+
+def min_variance_weights(cov: np.ndarray, total: float, cap: float, solver: str = "numpy") -> np.ndarray:
+    return mean_variance_weights(cov, np.zeros(len(cov)), 1.0, total, cap, solver)
+
+
+def risk_parity_weights(cov: np.ndarray, total: float, cap: float, sweeps: int = 500) -> np.ndarray:
+    """Equal risk contribution weights by cyclical coordinate descent, then capped.
+
+    Each coordinate solves cov_ii y_i^2 + (cov y)_-i y_i - 1/n = 0 in closed form.
+    """
+    n = len(cov)
+    budget = 1.0 / n
+    diag = np.diag(cov)
+    y = 1.0 / np.sqrt(diag)
+    for _ in range(sweeps):
+        previous = y.copy()
+        for i in range(n):
+            c = cov[i] @ y - diag[i] * y[i]
+            y[i] = (-c + np.sqrt(c * c + 4 * diag[i] * budget)) / (2 * diag[i])
+        if np.abs(y - previous).max() < 1e-12:
+            break
+    return project_capped_simplex(y / y.sum() * total, total, cap)
+
+
+def portfolio_stats(weights: np.ndarray, mu: np.ndarray, cov: np.ndarray, risk_free_rate: float) -> Dict[str, float]:
+    expected = float(weights @ mu)
+    volatility = float(np.sqrt(weights @ cov @ weights))
+    return {
+        "expected_return": expected,
+        "volatility": volatility,
+        "sharpe_ratio": (expected - risk_free_rate) / volatility if volatility > 0 else 0.0,
+    }
+
+
+def efficient_frontier(cov: np.ndarray, mu: np.ndarray, total: float, cap: float, risk_free_rate: float,
+                       solver: str = "numpy") -> List[Dict]:
+    """Frontier points (weights plus stats) across FRONTIER_RISK_AVERSIONS, ordered by volatility."""
+    points = []
+    for risk_aversion in FRONTIER_RISK_AVERSIONS:
+        weights = mean_variance_weights(cov, mu, float(risk_aversion), total, cap, solver)
+        points.append({"risk_aversion": float(risk_aversion), "weights": weights,
+                       **portfolio_stats(weights, mu, cov, risk_free_rate)})
+    return sorted(points, key=lambda p: p["volatility"])
+
+
+def optimize_weights(method: str, cov: np.ndarray, mu: np.ndarray, max_weight: float, cash_floor: float,
+                     risk_free_rate: float, risk_aversion: Optional[float] = None, solver: str = "numpy") -> Dict:
+    """Target weights (fractions of holdings value plus cash) for `method`.
+
+    Weights are long-only, each at most `max_weight`, and sum to 1 - `cash_floor`; the rest stays in cash.
+    The frontier method picks the `risk_aversion` point if given, else the highest-Sharpe frontier point.
+    """
+    if method not in OPTIMIZATION_METHODS:
+        raise ValueError(f"Unknown method '{method}'")
+    total = 1.0 - cash_floor
+    if max_weight * len(mu) < total - 1e-9:
+        raise ValueError("max_weight is too low to invest 1 - cash_floor across these holdings")
+
+    frontier = None
+    if method == "min_variance":
+        weights = min_variance_weights(cov, total, max_weight, solver)
+    elif method == "risk_parity":
+        weights = risk_parity_weights(cov, total, max_weight)
+    elif risk_aversion is not None:
+        weights = mean_variance_weights(cov, mu, risk_aversion, total, max_weight, solver)
+    else:
+        frontier = efficient_frontier(cov, mu, total, max_weight, risk_free_rate, solver)
+        weights = max(frontier, key=lambda p: p["sharpe_ratio"])["weights"]
+
+    return {"weights": weights, "frontier": frontier, **portfolio_stats(weights, mu, cov, risk_free_rate)}
+
+
+def rebalance_trades(symbols: List[str], quantities: np.ndarray, prices: np.ndarray,
+                     targets: np.ndarray, total_value: float) -> List[Dict]:
+    """Buy/sell list moving current positions to `targets` (weights of `total_value`), largest first."""
+    target_quantity = targets * total_value / prices
+    delta = target_quantity - quantities
+    trades = []
+    for i in np.argsort(-np.abs(delta * prices)):
+        value = float(delta[i] * prices[i])
+        if abs(value) < MIN_TRADE_VALUE:
+            continue
+        trades.append({
+            "symbol": symbols[i],
+            "action": "buy" if value > 0 else "sell",
+            "quantity": abs(float(delta[i])),
+            "price": float(prices[i]),
+            "value": abs(value),
+            "target_weight": float(targets[i]),
+        })
+    return trades
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.config import settings
+from app.services.ohlcv_cache import get_daily_bars
+from app.utils.ttl_cache import TTLCache
+from app.utils.security import get_shared_db
+
+# Pattern -> (label, direction)
+PATTERNS = {
+    "doji": ("Doji", "neutral"),
+    "bullish_engulfing": ("Bullish engulfing", "bullish"),
+    "bearish_engulfing": ("Bearish engulfing", "bearish"),
+    "hammer": ("Hammer", "bullish"),
+    "gap_up": ("Gap up", "bullish"),
+    "gap_down": ("Gap down", "bearish"),
+    "breakout_52w_high": ("52-week high breakout", "bullish"),
+    "breakdown_52w_low": ("52-week low breakdown", "bearish"),
+    "volume_spike": ("Volume spike", "neutral"),
+}
+
+YEAR_BARS = 252
+VOLUME_WINDOW = 20
+VOLUME_SPIKE_RATIO = 2.0
+
+# Bars before the evaluated ones that the patterns look back over (52-week range plus the bar itself)
+LOOKBACK = YEAR_BARS + 1
+
+# Most symbols one request may scan
+MAX_PATTERN_SYMBOLS = 50
+
+# Scan state of a symbol not scanned for this long is dropped (it is rescanned in full if requested again)
+SYMBOL_STATE_TTL = 7 * 24 * 3600
+
+
+def stack_bars(bars: Dict[str, pd.DataFrame], symbols: List[str], width: int) -> Dict[str, np.ndarray]:
+    """(symbols x bars) arrays of each symbol's last `width` bars, right-aligned and NaN-padded.
+
+    Rows are aligned by bar position, not by date, so symbols on exchanges with different holidays
+    still compare each bar with their own previous bar.
+    """
+    shape = (len(symbols), width)
+    stacked = {name: np.full(shape, np.nan) for name in ("Open", "High", "Low", "Close", "Volume")}
+    stacked["dates"] = np.full(shape, np.datetime64("NaT"), dtype="datetime64[D]")
+    for row, symbol in enumerate(symbols):
+        frame = bars[symbol].iloc[-width:]
+        n = len(frame)
+        for name in ("Open", "High", "Low", "Close", "Volume"):
+            stacked[name][row, width - n:] = frame[name].to_numpy()
+        stacked["dates"][row, width - n:] = frame.index.to_numpy().astype("datetime64[D]")
+    return stacked
+
+
+def _shift(a: np.ndarray, n: int = 1) -> np.ndarray:
+    """Values `n` bars earlier along each row (NaN where there are none)."""
+    out = np.full_like(a, np.nan)
+    out[:, n:] = a[:, :-n]
+    return out
+
+
+def _trailing(a: np.ndarray, window: int, how: str) -> np.ndarray:
+    """Rolling max/min/mean over the `window` bars before each bar, per row."""
+    rolling = pd.DataFrame(a.T).rolling(window, min_periods=window)
+    return getattr(rolling, how)().shift(1).to_numpy().T
+
+
+def detect_patterns(o: np.ndarray, h: np.ndarray, l: np.ndarray, c: np.ndarray, v: np.ndarray) -> Dict[str, np.ndarray]:
+    """Boolean (symbols x bars) matrix per pattern, each computed over all symbols and bars at once.
+
+    Comparisons with NaN are False, so padding and missing bars never match.
+    """
+    with np.errstate(invalid="ignore"):
+        body = np.abs(c - o)
+        spread = h - l
+        upper_shadow = h - np.maximum(o, c)
+        lower_shadow = np.minimum(o, c) - l
+        o1, c1, h1, l1 = _shift(o), _shift(c), _shift(h), _shift(l)
+        prior_high = _trailing(h, YEAR_BARS, "max")
+        prior_low = _trailing(l, YEAR_BARS, "min")
+        avg_volume = _trailing(v, VOLUME_WINDOW, "mean")
+        return {
+            "doji": (spread > 0) & (body <= 0.1 * spread),
+            "bullish_engulfing": (c1 < o1) & (c > o) & (o <= c1) & (c >= o1) & (body > np.abs(c1 - o1)),
+            "bearish_engulfing": (c1 > o1) & (c < o) & (o >= c1) & (c <= o1) & (body > np.abs(c1 - o1)),
+            # Long lower shadow and little upper shadow after a five-bar decline
+            "hammer": (body > 0) & (lower_shadow >= 2 * body) & (upper_shadow <= 0.1 * spread) & (c1 < _shift(c, 6)),
+            "gap_up": l > h1,
+            "gap_down": h < l1,
+            "breakout_52w_high": (c > prior_high) & (c1 <= prior_high),
+            "breakdown_52w_low": (c < prior_low) & (c1 >= prior_low),
+            "volume_spike": v > VOLUME_SPIKE_RATIO * avg_volume,
+        }
+
+
+def signals_from_masks(masks: Dict[str, np.ndarray], dates: np.ndarray, closes: np.ndarray,
+                       symbols: List[str], first_column: int = 0) -> Dict[str, List[Dict]]:
+    """Signals per symbol, oldest first, for columns from `first_column` onwards."""
+    signals: Dict[str, List[Dict]] = {s: [] for s in symbols}
+    for pattern, mask in masks.items():
+        label, direction = PATTERNS[pattern]
+        rows, columns = np.nonzero(mask[:, first_column:])
+        for row, column in zip(rows, columns + first_column):
+            signals[symbols[row]].append({
+                "date": str(dates[row, column]),
+                "pattern": pattern,
+                "label": label,
+                "direction": direction,
+                "price": float(closes[row, column]),
+            })
+    for items in signals.values():
+        items.sort(key=lambda s: s["date"])
+    return signals
+
+
+def chart_annotations(ohlc: List[Dict]) -> List[Dict]:
+    """Pattern signals for one symbol's chart bars ({date, open, high, low, close, volume} dicts)."""
+    if not ohlc:
+        return []
+    arrays = {k: np.array([[float(bar.get(k) or np.nan) for bar in ohlc]]) for k in ("open", "high", "low", "close", "volume")}
+    dates = np.array([[bar["date"] for bar in ohlc]], dtype=object)
+    masks = detect_patterns(arrays["open"], arrays["high"], arrays["low"], arrays["close"], arrays["volume"])
+    return signals_from_masks(masks, dates, arrays["close"], ["_"])["_"]
+
+
+class PatternScanner:
+    """Incremental scanner: remembers each symbol's last scanned bar and evaluates only that bar, any
+    newer ones and the LOOKBACK bars the patterns need, for all symbols in one pass. The last bar is
+    always re-evaluated, since it may have been today's in-progress session when it was scanned.
+
+    State is kept for at most `max_symbols` symbols (PATTERN_MAX_SYMBOLS), dropping the least recently
+    scanned. Scans are serialized, since they run in worker threads.
+    """
+
+    def __init__(self, history: int = YEAR_BARS, max_symbols: Optional[int] = None):
+        self.history = history
+        # symbol -> (last scanned bar, signals oldest first)
+        self._state = TTLCache(ttl=SYMBOL_STATE_TTL, max_entries=max_symbols or settings.pattern_max_symbols)
+        self._lock = threading.Lock()
+
+    def signals(self, symbol: str, since: Optional[str] = None) -> List[Dict]:
+        _, items = self._state.get(symbol, (None, []))
+        return [s for s in items if s["date"] >= since] if since else list(items)
+
+    def scan(self, bars: Dict[str, pd.DataFrame]) -> int:
+        """Evaluate the last scanned bar and any newer ones; returns the number of signals on newer bars."""
+        with self._lock:
+            return self._scan(bars)
+
+    def _scan(self, bars: Dict[str, pd.DataFrame]) -> int:
+        pending, state = {}, {}
+        for symbol, frame in bars.items():
+            if frame.empty:
+                continue
+            state[symbol] = self._state.get(symbol, (None, []))
+            last = state[symbol][0]
+            index = frame.index.to_numpy().astype("datetime64[D]")
+            new = int(len(index) - np.searchsorted(index, last, side="left")) if last is not None else self.history
+            if new > 0:
+                pending[symbol] = min(new, self.history)
+        if not pending:
+            return 0
+
+        symbols = list(pending)
+        fresh = max(pending.values())
+        stacked = stack_bars(bars, symbols, fresh + LOOKBACK)
+        masks = detect_patterns(stacked["Open"], stacked["High"], stacked["Low"], stacked["Close"], stacked["Volume"])
+        found = signals_from_masks(masks, stacked["dates"], stacked["Close"], symbols, first_column=LOOKBACK)
+
+        added = 0
+        for row, symbol in enumerate(symbols):
+            last, kept = state[symbol]
+            # Signals from the re-evaluated last bar replace the ones computed on its partial data
+            kept = [s for s in kept if np.datetime64(s["date"]) < last] if last is not None else []
+            rescanned = [s for s in found[symbol] if last is None or np.datetime64(s["date"]) >= last]
+            self._state.set(symbol, (stacked["dates"][row, -1], (kept + rescanned)[-settings.pattern_max_signals:]))
+            added += sum(1 for s in rescanned if last is None or np.datetime64(s["date"]) > last)
+        return added
+
+
+pattern_scanner = PatternScanner()
+
+
+async def scan_symbols(symbols: Iterable[str]) -> Dict[str, List[Dict]]:
+    """Bring the scanner up to date for `symbols` (cached bars, new bars only) and return their signals."""
+    symbols = list(dict.fromkeys(s.upper() for s in symbols if s))
+    bars = await get_daily_bars(symbols)
+    if bars:
+        await asyncio.to_thread(pattern_scanner.scan, bars)
+    return {s: pattern_scanner.signals(s) for s in symbols}
+
+
+async def run_pattern_scanner():
+    """Background task: scan every watchlist symbol as new daily bars reach the OHLCV cache."""
+    while True:
+        try:
+            db = get_shared_db()
+            symbols = await asyncio.to_thread(db.watchlists.distinct, "symbol")
+            if symbols:
+                await scan_symbols(s for s in symbols if isinstance(s, str))
+        except Exception as e:
+            print(f"Pattern scan failed: {e}")
+        await asyncio.sleep(settings.pattern_scan_interval)
@@ -0,0 +1,273 @@
+import codecs
+import csv
+import hashlib
+import re
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, UpdateOne
+
+from app.services.holdings_store import LOTS_COLLECTION, MARKS_COLLECTION, lot_document, seed_mark_ops
+from app.services.nav_service import trade_day
+
+# Canonical column -> accepted header spellings (compared lower-cased and trimmed)
+COLUMN_ALIASES = {
+    "date": ("date", "trade date", "trade_date", "transaction date", "order date"),
+    "symbol": ("symbol", "ticker", "instrument", "scrip"),
+    "type": ("type", "side", "action", "trade type", "transaction type", "buy/sell"),
+    "quantity": ("quantity", "qty", "shares", "units"),
+    "price": ("price", "trade price", "avg price", "rate"),
+    "fee": ("fee", "fees", "commission", "brokerage"),
+    "notes": ("notes", "description", "remarks"),
+}
+REQUIRED_COLUMNS = ("date", "symbol", "type", "quantity", "price")
+
+TRADE_TYPES = {"buy": "buy", "b": "buy", "purchase": "buy", "sell": "sell", "s": "sell", "sale": "sell"}
+
+# Non-ISO broker date formats, tried in order
+DATE_FORMATS = ("%m/%d/%Y", "%d-%b-%Y", "%d %b %Y", "%d-%m-%Y", "%Y/%m/%d")
+
+_NUMBER_NOISE = re.compile(r"[,\s$₹]")
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[str]]:
+    """Parse CSV records from a byte stream as it arrives, without buffering the whole body.
+
+    Quoted fields may span lines: a record is complete once its quote count is even.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    record = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            record += line + "\n"
+            if record.count('"') % 2:
+                continue
+            if record.strip():
+                yield next(csv.reader([record]))
+            record = ""
+    record += pending + decoder.decode(b"", final=True)
+    if record.strip():
+        yield next(csv.reader([record]))
+
+
+def map_columns(header: List[str]) -> Dict[str, int]:
+    """Column index per canonical name; raises ValueError naming any missing required column."""
+    positions = {name.strip().lower(): i for i, name in enumerate(header)}
+    columns = {}
+    for column, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in positions:
+                columns[column] = positions[alias]
+                break
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    return columns
+
+
+def _parse_number(value: str) -> float:
+    cleaned = _NUMBER_NOISE.sub("", value or "")
+    return float(cleaned) if cleaned else 0.0
+
+
+def _parse_date(value: str) -> str:
+    value = (value or "").strip()
+    try:
+        return trade_day(value)
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date '{value}'")
+
+
+def parse_trade(fields: List[str], columns: Dict[str, int]) -> Dict:
+    """One ledger trade from a CSV record; raises ValueError describing the first bad field."""
+    def field(name):
+        index = columns.get(name)
+        return fields[index].strip() if index is not None and index < len(fields) else ""
+
+    trade_type = TRADE_TYPES.get(field("type").lower())
+    if trade_type is None:
+        raise ValueError(f"Unknown trade type '{field('type')}'")
+    try:
+        quantity = abs(_parse_number(field("quantity")))
+        price = _parse_number(field("price"))
+        fee = abs(_parse_number(field("fee")))
+    except ValueError:
+        raise ValueError("Quantity, price and fee must be numbers")
+    if quantity <= 0 or price <= 0:
+        raise ValueError("Quantity and price must be positive")
+    symbol = field("symbol").upper()
+    if not symbol:
+        raise ValueError("Missing symbol")
+    return {
+        "trade_date": _parse_date(field("date")),
+        "symbol": symbol,
+        "type": trade_type,
+        "quantity": quantity,
+        "price": price,
+        "fee": fee,
+        "notes": field("notes"),
+    }
+
+
+def import_hash(trade: Dict, seen: Dict[str, int]) -> str:
+    """Content hash of a parsed row, stored on its ledger entry so re-importing a file is rejected.
+
+    Identical rows within one file are numbered by occurrence (`seen` counts them), so a repeated
+    trade in a single statement still imports while the same statement imported twice does not.
+    """
+    content = "|".join(str(trade[k]) for k in ("trade_date", "symbol", "type", "quantity", "price", "fee"))
+    seen[content] = seen.get(content, 0) + 1
+    return hashlib.sha256(f"{content}|{seen[content]}".encode()).hexdigest()
+
+
+def imported_hashes(db, portfolio_id, hashes: List[str]) -> Set[str]:
+    """Which of `hashes` are already in the portfolio's ledger."""
+    rows = db.transactions.find({"portfolio_id": str(portfolio_id), "import_hash": {"$in": hashes}}, {"import_hash": 1})
+    return {row["import_hash"] for row in rows}
+
+
+class LotBook:
+    """Open FIFO tax lots per symbol, seeded from a portfolio's open lot documents (oldest first).
+
+    Buys open a lot at price plus fee per share; sells close the oldest lots first and realize
+    P&L net of fees. Trades must arrive in chronological order per symbol and may not predate the
+    newest open lot. The book remembers what is stored so only changed lots are written back.
+    """
+
+    def __init__(self, lots: List[Dict]):
+        self.lots: Dict[str, deque] = {}
+        self.last_date: Dict[str, str] = {}
+        # Stored lot id -> (symbol, quantity) as last written
+        self.stored: Dict[ObjectId, Tuple[str, float]] = {}
+        for lot in lots:
+            if lot["quantity"] > 0:
+                symbol = lot["symbol"].upper()
+                lot_id = lot.get("_id") or ObjectId()
+                self.lots.setdefault(symbol, deque()).append({
+                    "_id": lot_id,
+                    "quantity": float(lot["quantity"]),
+                    "price": float(lot["price"]),
+                    "trade_date": lot["trade_date"],
+                    "opened_at": lot.get("opened_at"),
+                })
+                self.stored[lot_id] = (symbol, float(lot["quantity"]))
+                self.last_date[symbol] = max(self.last_date.get(symbol, ""), lot["trade_date"])
+
+    def apply(self, trade: Dict) -> float:
+        """Apply a trade and return the realized P&L (0 for buys). Raises ValueError without changing state."""
+        symbol = trade["symbol"]
+        if trade["trade_date"] < self.last_date.get(symbol, ""):
+            raise ValueError(f"Out of chronological order for {symbol} (latest is {self.last_date[symbol]})")
+        lots = self.lots.setdefault(symbol, deque())
+        quantity = trade["quantity"]
+
+        if trade["type"] == "buy":
+            cost = (quantity * trade["price"] + trade["fee"]) / quantity
+            lots.append({"_id": ObjectId(), "quantity": quantity, "price": cost, "trade_date": trade["trade_date"]})
+            self.last_date[symbol] = trade["trade_date"]
+            return 0.0
+
+        held = sum(lot["quantity"] for lot in lots)
+        if quantity > held + 1e-9:
+            raise ValueError(f"Sell of {quantity:g} {symbol} exceeds the {held:g} held")
+        realized = -trade["fee"]
+        remaining = quantity
+        while remaining > 1e-9:
+            lot = lots[0]
+            take = min(remaining, lot["quantity"])
+            realized += take * (trade["price"] - lot["price"])
+            lot["quantity"] -= take
+            remaining -= take
+            if lot["quantity"] <= 1e-9:
+                lots.popleft()
+        self.last_date[symbol] = trade["trade_date"]
+        return realized
+
+    def order_problem(self, trades: List[Dict]) -> Optional[Tuple[int, str]]:
+        """(index, message) of the first trade dated before its symbol's newest open lot or an earlier
+        trade in `trades`, or None. Checked before a chunk is applied so a misordered file stops the
+        import with one error instead of a rejection per row.
+        """
+        latest = dict(self.last_date)
+        for k, trade in enumerate(trades):
+            symbol = trade["symbol"]
+            if trade["trade_date"] < latest.get(symbol, ""):
+                message = (f"{symbol} on {trade['trade_date']} is dated before {latest[symbol]}, its newest open lot "
+                           f"or earlier row. Rows must be oldest first and no older than open lots; import stopped.")
+                if trades[0]["trade_date"] > trades[-1]["trade_date"]:
+                    message += " This file looks newest first: sort it oldest first and import it again."
+                return k, message
+            latest[symbol] = trade["trade_date"]
+        return None
+
+    def position(self, symbol: str) -> Tuple[float, float, List[Dict]]:
+        """(quantity, average cost, open lots) for a symbol."""
+        lots = list(self.lots.get(symbol, ()))
+        quantity = sum(lot["quantity"] for lot in lots)
+        average_cost = sum(lot["quantity"] * lot["price"] for lot in lots) / quantity if quantity > 0 else 0.0
+        return quantity, average_cost, lots
+
+    def lot_ops(self, portfolio_id, symbols: Iterable[str]) -> List:
+        """Bulk ops writing only the lots that changed since the last write, and mark them stored.
+
+        Closed lots are deleted by id and partly sold ones decremented, so lots added concurrently
+        (e.g. by a manual buy) are left alone.
+        """
+        symbols = set(symbols)
+        current = {lot["_id"]: (symbol, lot) for symbol in symbols for lot in self.lots.get(symbol, ())}
+        ops = []
+        for lot_id, (symbol, quantity) in list(self.stored.items()):
+            if symbol not in symbols:
+                continue
+            if lot_id not in current:
+                ops.append(DeleteOne({"_id": lot_id}))
+                del self.stored[lot_id]
+            elif current[lot_id][1]["quantity"] != quantity:
+                ops.append(UpdateOne({"_id": lot_id}, {"$inc": {"quantity": current[lot_id][1]["quantity"] - quantity}}))
+                self.stored[lot_id] = (symbol, current[lot_id][1]["quantity"])
+        for lot_id, (symbol, lot) in current.items():
+            if lot_id not in self.stored:
+                ops.append(InsertOne({"_id": lot_id, **lot_document(portfolio_id, symbol, lot["quantity"], lot["price"],
+                                                                   lot["trade_date"], lot.get("opened_at"))}))
+                self.stored[lot_id] = (symbol, lot["quantity"])
+        return ops
+
+
+def write_chunk(db, portfolio_id, trades: List[Dict], book: LotBook, last_prices: Dict[str, float]):
+    """Write a chunk of applied trades: one bulk_write into the ledger, one with the touched symbols' changed lots.
+
+    Symbols bought for the first time get their last trade price as a mark if they have none yet.
+    """
+    now = datetime.utcnow()
+    db.transactions.bulk_write([InsertOne({
+        "portfolio_id": str(portfolio_id),
+        "symbol": t["symbol"],
+        "type": t["type"],
+        "quantity": t["quantity"],
+        "price": t["price"],
+        "total_amount": t["quantity"] * t["price"],
+        "fee": t["fee"],
+        "realized_pnl": t["realized_pnl"],
+        "timestamp": now,
+        "trade_date": t["trade_date"],
+        "notes": t["notes"] or "Imported",
+        "import_hash": t["import_hash"],
+    }) for t in trades], ordered=False)
+
+    symbols = list(dict.fromkeys(t["symbol"] for t in trades))
+    ops = book.lot_ops(portfolio_id, symbols)
+    if ops:
+        db[LOTS_COLLECTION].bulk_write(ops, ordered=False)
+    db[MARKS_COLLECTION].bulk_write(seed_mark_ops({s: last_prices[s] for s in symbols}), ordered=False)
+    db.portfolios.update_one({"_id": portfolio_id}, {"$set": {"updated_at": now}})
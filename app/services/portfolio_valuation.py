@@ -0,0 +1,33 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Per-holding columns recomputed on every revaluation
+VALUATION_FIELDS = ("current_price", "total_value", "unrealized_pnl", "unrealized_pnl_percent")
+
+
+def revalue_holdings(holdings: List[Dict], prices: Dict[str, float]) -> Tuple[List[Dict], float, List[int]]:
+    """Recompute value and P&L columns for `holdings` at `prices` (upper-cased symbol -> price).
+
+    Holdings without a fresh price keep their last `current_price`. Returns the updated holdings,
+    their total market value, and the indexes of holdings whose stored valuation is out of date.
+    """
+    if not holdings:
+        return [], 0.0, []
+
+    quantity = np.array([float(h.get("quantity") or 0) for h in holdings])
+    cost = np.array([float(h.get("average_cost") or 0) for h in holdings])
+    last = np.array([float(h.get("current_price") or h.get("average_cost") or 0) for h in holdings])
+    fresh = np.array([prices.get(h["symbol"].upper(), np.nan) for h in holdings], dtype=float)
+
+    price = np.where(np.isnan(fresh), last, fresh)
+    value = quantity * price
+    pnl = (price - cost) * quantity
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pnl_percent = np.where(cost > 0, (price - cost) / cost * 100, 0.0)
+
+    stale = (price != last) | np.array([any(f not in h for f in VALUATION_FIELDS) for h in holdings])
+
+    columns = zip(price.tolist(), value.tolist(), pnl.tolist(), pnl_percent.tolist())
+    updated = [{**holding, **dict(zip(VALUATION_FIELDS, row))} for holding, row in zip(holdings, columns)]
+    return updated, float(value.sum()), np.flatnonzero(stale).tolist()
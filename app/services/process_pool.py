@@ -0,0 +1,21 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app.config import settings
+
+# One process pool for CPU-bound work (VaR simulation shards, backtest sweeps), created on first use
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.process_pool_workers)
+    return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
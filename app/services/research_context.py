@@ -0,0 +1,135 @@
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Tuple
+
+from app.config import settings
+from app.services.stock_service import StockDataService
+
+# Research category -> data section it needs
+CATEGORY_SECTIONS = {
+    "financials": "quote",
+    "company": "overview",
+    "charts": "historical",
+    "news": "news",
+}
+
+# Sections the LLM prompt cannot do without; the others are dropped if they miss the deadline
+REQUIRED_SECTIONS = {"quote", "overview"}
+
+
+def wanted_sections(categories: Iterable[str]) -> List[str]:
+    """Sections to fetch for the requested categories (all of them when none are given)."""
+    categories = list(categories or [])
+    return [section for category, section in CATEGORY_SECTIONS.items() if not categories or category in categories]
+
+
+async def gather_sections(fetchers: Dict[str, Callable[[], Awaitable]], required: Iterable[str],
+                          deadline: float) -> Tuple[Dict[str, object], List[str]]:
+    """Run every fetcher concurrently.
+
+    Required sections are always awaited. Optional sections have until `deadline` (monotonic time);
+    those still running then are cancelled and listed as dropped. A fetcher that fails yields None.
+    """
+    tasks = {name: asyncio.create_task(fetch()) for name, fetch in fetchers.items()}
+    required_tasks = [task for name, task in tasks.items() if name in set(required)]
+    optional_tasks = [task for name, task in tasks.items() if task not in required_tasks]
+
+    if required_tasks:
+        await asyncio.wait(required_tasks)
+    if optional_tasks:
+        _, pending = await asyncio.wait(optional_tasks, timeout=max(deadline - time.monotonic(), 0))
+        for task in pending:
+            task.cancel()
+        if pending:
+            # Let the cancellations land before the tasks are inspected
+            await asyncio.wait(pending)
+
+    results, dropped = {}, []
+    for name, task in tasks.items():
+        if task.cancelled():
+            dropped.append(name)
+            results[name] = None
+        elif task.exception() is not None:
+            print(f"Research {name} fetch failed: {task.exception()}")
+            results[name] = None
+        else:
+            results[name] = task.result()
+    return results, dropped
+
+
+async def gather_research_data(service: StockDataService, symbol: str, timeframe: str,
+                               categories: List[str]) -> Tuple[Dict[str, object], str, List[str]]:
+    """Provider data for the requested categories: (sections, MCP context, dropped optional sections).
+
+    Provider calls run concurrently; MCP fallbacks (blocking HTTP) run in threads, also concurrently,
+    within the same RESEARCH_OPTIONAL_DEADLINE for optional sections.
+    """
+    deadline = time.monotonic() + settings.research_optional_deadline
+    wanted = wanted_sections(categories)
+    fetchers = {
+        "quote": lambda: service.get_stock_quote(symbol),
+        "overview": lambda: service.get_company_overview(symbol),
+        "historical": lambda: service.get_historical_data(symbol, timeframe),
+        "news": lambda: service.get_news_sentiment(symbol),
+    }
+    sections, dropped = await gather_sections({name: fetchers[name] for name in wanted}, REQUIRED_SECTIONS, deadline)
+    sections = {
+        "quote": sections.get("quote") or {},
+        "overview": sections.get("overview") or {},
+        "historical": sections.get("historical"),
+        "news": sections.get("news"),
+    }
+
+    historical = sections["historical"]
+    mcp_context_parts = []
+    if not sections["quote"] or not sections["overview"] or (historical is not None and historical.empty):
+        # Try MCP as fallback
+        try:
+            from app.services.mcp_service import MCPService
+            mcp = MCPService(api_key=settings.alpha_vantage_keys[0])
+            mcp_fetchers = {
+                "financials": lambda: asyncio.to_thread(mcp.get_financials, symbol),
+                "company": lambda: asyncio.to_thread(mcp.get_company_info, symbol),
+                "news": lambda: asyncio.to_thread(mcp.get_news, symbol),
+            }
+            mcp_fetchers = {name: fetch for name, fetch in mcp_fetchers.items() if not categories or name in categories}
+            mcp_data, mcp_dropped = await gather_sections(mcp_fetchers, {"financials", "company"}, deadline)
+            dropped.extend(f"mcp_{name}" for name in mcp_dropped)
+            if mcp_data.get("financials"):
+                sections["quote"].update(mcp_data["financials"])
+                mcp_context_parts.append(f"MCP FINANCIALS: {mcp_data['financials']}")
+            if mcp_data.get("company"):
+                sections["overview"].update(mcp_data["company"])
+                mcp_context_parts.append(f"MCP COMPANY INFO: {mcp_data['company']}")
+            if mcp_data.get("news"):
+                sections["news"] = mcp_data["news"]
+                mcp_context_parts.append(f"MCP NEWS: {mcp_data['news']}")
+        except Exception as mcp_err:
+            print(f"MCP fallback failed: {mcp_err}")
+    return sections, "\n".join(mcp_context_parts), dropped
+
+
+def build_context(symbol: str, query: str, categories: List[str], sections: Dict[str, object],
+                  mcp_context: str) -> str:
+    """The LLM context for the sections that made it in time."""
+    quote, overview, news = sections["quote"], sections["overview"], sections["news"]
+    context_parts = []
+    if not categories or "financials" in categories:
+        context_parts.append(f"CURRENT PRICE: ${quote.get('05. price', quote.get('Price', 'N/A'))}")
+    if not categories or "company" in categories:
+        context_parts.append(f"COMPANY: {overview.get('Name', 'N/A')}")
+        context_parts.append(f"SECTOR: {overview.get('Sector', 'N/A')}")
+        context_parts.append(f"INDUSTRY: {overview.get('Industry', 'N/A')}")
+        context_parts.append(f"DESCRIPTION: {overview.get('Description', 'No description available')}")
+    if not categories or "financials" in categories:
+        context_parts.append(f"MARKET CAP: {overview.get('MarketCapitalization', 'N/A')}")
+        context_parts.append(f"P/E RATIO: {overview.get('PERatio', 'N/A')}")
+        context_parts.append(f"EPS: {overview.get('EPS', 'N/A')}")
+        context_parts.append(f"DIVIDEND YIELD: {overview.get('DividendYield', 'N/A')}")
+        context_parts.append(f"52W HIGH: {overview.get('52WeekHigh', 'N/A')}")
+        context_parts.append(f"52W LOW: {overview.get('52WeekLow', 'N/A')}")
+    if (not categories or "news" in categories) and news is not None:
+        context_parts.append(f"RECENT NEWS: {json.dumps(news.get('feed', [])[:5] if isinstance(news, dict) else [])}")
+    context_parts.append(f"USER QUERY: {query}")
+    return f"STOCK: {symbol}\n" + "\n".join(context_parts) + f"\n{mcp_context}"
@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.ohlcv_cache import get_daily_bars, close_matrix
+from app.services.stock_service import StockDataService, detect_market
+from app.utils.ttl_cache import TTLCache
+
+TRADING_DAYS = 252
+
+# Benchmark index per market; portfolios that are not mostly Indian are measured against the S&P 500
+BENCHMARKS = {'IN': '^NSEI', 'US': '^GSPC'}
+
+# Risk results keyed by (positions version, last bar date): reused until holdings change or a new bar lands
+_risk_cache = TTLCache(ttl=settings.ohlcv_cache_ttl, max_entries=1000)
+
+
+def positions_version(holdings: List[Dict]) -> str:
+    """Stable hash of the (symbol, quantity) positions; prices and timestamps do not affect it."""
+    positions = sorted((h["symbol"].upper(), float(h.get("quantity") or 0)) for h in holdings)
+    return hashlib.sha1(json.dumps(positions).encode()).hexdigest()
+
+
+def position_quantities(holdings: List[Dict]) -> Dict[str, float]:
+    """Total long quantity per upper-cased symbol."""
+    quantities: Dict[str, float] = {}
+    for h in holdings:
+        quantity = float(h.get("quantity") or 0)
+        if quantity > 0:
+            symbol = h["symbol"].upper()
+            quantities[symbol] = quantities.get(symbol, 0) + quantity
+    return quantities
+
+
+def benchmark_for(symbols: List[str]) -> str:
+    markets = [detect_market(s) for s in symbols]
+    return BENCHMARKS['IN'] if markets.count('IN') * 2 > len(markets) else BENCHMARKS['US']
+
+
+def compute_risk(prices: np.ndarray, weights: np.ndarray, risk_free_rate: float) -> Dict:
+    """Risk metrics from aligned closes.
+
+    `prices` is (bars x assets + 1) with the benchmark in the last column; `weights` are the asset
+    weights, summing to 1. Volatility, ratios, per-asset mean returns and covariance are annualized;
+    drawdown is a fraction.
+    """
+    returns = prices[1:] / prices[:-1] - 1
+    assets, benchmark = returns[:, :-1], returns[:, -1]
+    portfolio = assets @ weights
+    excess = portfolio - risk_free_rate / TRADING_DAYS
+    scale = np.sqrt(TRADING_DAYS)
+
+    daily_vol = portfolio.std(ddof=1)
+    downside = np.sqrt(np.mean(np.minimum(excess, 0.0) ** 2))
+    cov_pb = np.cov(portfolio, benchmark)
+    wealth = np.concatenate(([1.0], np.cumprod(1 + portfolio)))
+    drawdown = wealth / np.maximum.accumulate(wealth) - 1
+
+    return {
+        "volatility": float(daily_vol * scale),
+        "beta": float(cov_pb[0, 1] / cov_pb[1, 1]) if cov_pb[1, 1] > 0 else 0.0,
+        "sharpe_ratio": float(excess.mean() / daily_vol * scale) if daily_vol > 0 else 0.0,
+        "sortino_ratio": float(excess.mean() / downside * scale) if downside > 0 else 0.0,
+        "max_drawdown": float(drawdown.min()),
+        "mean_returns": assets.mean(axis=0) * TRADING_DAYS,
+        "covariance": np.atleast_2d(np.cov(assets, rowvar=False)) * TRADING_DAYS,
+    }
+
+
+async def portfolio_risk(holdings: List[Dict]) -> Optional[Dict]:
+    """Risk metrics for `holdings`, weighted by market value at the last shared close.
+
+    Uses RISK_LOOKBACK_DAYS of daily bars from the OHLCV cache, aligned with the benchmark.
+    Returns None when there is not enough shared history. Holdings without bars are left out and
+    the result lists the symbols actually used.
+    """
+    quantities = position_quantities(holdings)
+    if not quantities:
+        return None
+
+    benchmark = benchmark_for(list(quantities))
+    bars = await get_daily_bars(list(quantities) + [benchmark])
+    symbols = [s for s in quantities if s in bars]
+    if not symbols or benchmark not in bars:
+        return None
+    closes = close_matrix(bars, symbols + [benchmark], settings.risk_lookback_days)
+    if len(closes) < 3:
+        return None
+
+    key = (positions_version(holdings), closes.index[-1].isoformat())
+    cached = _risk_cache.get(key)
+    if cached is not None:
+        return cached
+
+    last_prices = closes.iloc[-1, :-1].to_numpy()
+    values = np.array([quantities[s] for s in symbols]) * last_prices
+    weights = values / values.sum()
+    result = await asyncio.to_thread(compute_risk, closes.to_numpy(), weights, settings.risk_free_rate)
+    result.update({
+        "symbols": symbols,
+        "weights": weights,
+        "last_prices": last_prices,
+        "benchmark": benchmark,
+        "observations": len(closes) - 1,
+        "as_of": closes.index[-1].date().isoformat(),
+    })
+    _risk_cache.set(key, result)
+    return result
+
+
+async def sector_weights(holdings: List[Dict], cash_balance: float, service: StockDataService) -> Dict[str, float]:
+    """Percentage of portfolio value per sector, from cached company overviews. Cash is its own bucket."""
+    values: Dict[str, float] = {}
+    for h in holdings:
+        symbol = h["symbol"].upper()
+        price = h.get("current_price") or h.get("average_cost") or 0
+        values[symbol] = values.get(symbol, 0) + float(h.get("quantity") or 0) * float(price)
+
+    slots = asyncio.Semaphore(settings.quote_fetch_concurrency)
+
+    async def sector_of(symbol):
+        async with slots:
+            try:
+                overview = await service.get_company_overview(symbol)
+            except Exception as e:
+                print(f"Overview failed for {symbol}: {e}")
+                return "Other"
+        return (overview or {}).get("Sector") or "Other"
+
+    sectors = await asyncio.gather(*(sector_of(s) for s in values))
+    allocation: Dict[str, float] = {}
+    for sector, value in zip(sectors, values.values()):
+        allocation[sector] = allocation.get(sector, 0) + value
+    if cash_balance > 0:
+        allocation["Cash"] = allocation.get("Cash", 0) + cash_balance
+
+    total = sum(allocation.values())
+    return {sector: value / total * 100 for sector, value in allocation.items()} if total > 0 else {}
@@ -0,0 +1,307 @@
+import ast
+import asyncio
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.indicators import rsi, sma
+from app.services.ohlcv_cache import get_daily_bars
+from app.services.stock_service import StockDataService, detect_market
+
+# Default universe: the NIFTY 50 and the largest US companies. Set SCREENER_UNIVERSE (comma-separated)
+# or SCREENER_UNIVERSE_FILE (one symbol per line, e.g. the full S&P 500) to screen something else.
+DEFAULT_UNIVERSE = [
+    "RELIANCE.NS", "TCS.NS", "HDFCBANK.NS", "ICICIBANK.NS", "INFY.NS", "BHARTIARTL.NS", "ITC.NS", "SBIN.NS",
+    "LT.NS", "HINDUNILVR.NS", "BAJFINANCE.NS", "HCLTECH.NS", "KOTAKBANK.NS", "MARUTI.NS", "SUNPHARMA.NS",
+    "AXISBANK.NS", "M&M.NS", "ULTRACEMCO.NS", "TITAN.NS", "NTPC.NS", "ONGC.NS", "ASIANPAINT.NS",
+    "POWERGRID.NS", "TATAMOTORS.NS", "ADANIENT.NS", "BAJAJFINSV.NS", "WIPRO.NS", "NESTLEIND.NS",
+    "JSWSTEEL.NS", "TATASTEEL.NS", "COALINDIA.NS", "ADANIPORTS.NS", "TECHM.NS", "GRASIM.NS",
+    "HINDALCO.NS", "SBILIFE.NS", "BAJAJ-AUTO.NS", "CIPLA.NS", "DRREDDY.NS", "EICHERMOT.NS",
+    "HDFCLIFE.NS", "BRITANNIA.NS", "TRENT.NS", "SHRIRAMFIN.NS", "APOLLOHOSP.NS", "HEROMOTOCO.NS",
+    "INDUSINDBK.NS", "BEL.NS", "TATACONSUM.NS", "BPCL.NS",
+    "AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "BRK-B", "AVGO", "TSLA", "LLY", "JPM", "V", "UNH",
+    "XOM", "MA", "JNJ", "PG", "HD", "COST", "ABBV", "MRK", "CVX", "WMT", "KO", "PEP", "BAC", "ADBE",
+    "CRM", "NFLX", "AMD", "TMO", "ORCL", "ACN", "MCD", "CSCO", "ABT", "LIN", "DIS", "WFC", "INTC",
+    "QCOM", "TXN", "DHR", "PM", "VZ", "INTU", "AMGN", "IBM", "CAT", "GE",
+]
+
+# Fundamentals copied from company overviews: screener column -> overview field
+FUNDAMENTAL_FIELDS = {
+    "MarketCapitalization": "MarketCapitalization",
+    "PERatio": "PERatio",
+    "EPS": "EPS",
+    "DividendYield": "DividendYield",
+    "Week52High": "52WeekHigh",
+    "Week52Low": "52WeekLow",
+}
+TEXT_FIELDS = ("Name", "Sector", "Industry")
+
+# Numeric columns computed from daily bars
+INDICATOR_FIELDS = {
+    "price": "Last close",
+    "change_1d": "Change over the last day (percent)",
+    "return_1m": "Return over 21 trading days (percent)",
+    "return_3m": "Return over 63 trading days (percent)",
+    "rsi_14": "14-day RSI",
+    "sma_20": "20-day simple moving average",
+    "sma_50": "50-day simple moving average",
+    "sma_200": "200-day simple moving average",
+    "avg_volume_20": "Average daily volume over 20 days",
+    "volatility_20": "Annualized volatility of 20 daily returns (percent)",
+}
+
+MAX_EXPRESSION_LENGTH = 500
+
+_COMPARISONS = {
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater, ast.GtE: np.greater_equal,
+    ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+_ARITHMETIC = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+
+
+def screener_universe() -> List[str]:
+    if settings.screener_universe_file:
+        with open(settings.screener_universe_file) as f:
+            symbols = [line.strip() for line in f]
+    elif settings.screener_universe:
+        symbols = settings.screener_universe.split(",")
+    else:
+        symbols = DEFAULT_UNIVERSE
+    return list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+
+
+def _number(value) -> float:
+    """Overview values arrive as numbers, numeric strings or placeholders such as "None" and "-"."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class ScreenerSnapshot:
+    """Column arrays for the universe, one row per symbol: float64 for numbers (NaN when unknown)
+    and object arrays for text. Filters and sorts are whole-column NumPy operations."""
+
+    def __init__(self, symbols: List[str], numeric: Dict[str, np.ndarray], text: Dict[str, np.ndarray],
+                 as_of: Optional[datetime] = None):
+        self.symbols = np.array(symbols, dtype=object)
+        self.numeric = numeric
+        self.text = {"Symbol": self.symbols, "Market": np.array([detect_market(s) for s in symbols], dtype=object),
+                     **text}
+        self.as_of = as_of or datetime.utcnow()
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def column(self, name: str) -> np.ndarray:
+        if name in self.numeric:
+            return self.numeric[name]
+        if name in self.text:
+            return self.text[name]
+        raise ValueError(f"Unknown field '{name}'")
+
+    def fields(self) -> List[str]:
+        return list(self.text) + list(self.numeric)
+
+    def rows(self, indexes: np.ndarray) -> List[Dict]:
+        rows = []
+        for i in indexes:
+            row = {name: values[i] for name, values in self.text.items()}
+            row.update({name: None if np.isnan(values[i]) else float(values[i]) for name, values in self.numeric.items()})
+            rows.append(row)
+        return rows
+
+
+def indicator_row(bars) -> Dict[str, float]:
+    """Latest indicator values from one symbol's daily bars (NaN where history is too short)."""
+    closes = bars["Close"].to_numpy()
+    volumes = bars["Volume"].to_numpy()
+
+    def change(days):
+        return (closes[-1] / closes[-1 - days] - 1) * 100 if len(closes) > days else np.nan
+
+    returns = np.diff(closes[-21:]) / closes[-21:-1]
+    return {
+        "price": closes[-1],
+        "change_1d": change(1),
+        "return_1m": change(21),
+        "return_3m": change(63),
+        "rsi_14": rsi(closes, 14)[-1],
+        "sma_20": sma(closes, 20)[-1],
+        "sma_50": sma(closes, 50)[-1],
+        "sma_200": sma(closes, 200)[-1],
+        "avg_volume_20": volumes[-20:].mean() if len(volumes) >= 20 else np.nan,
+        "volatility_20": returns.std(ddof=1) * np.sqrt(252) * 100 if len(returns) >= 20 else np.nan,
+    }
+
+
+def assemble_snapshot(symbols: List[str], bars: Dict, overviews: Dict[str, Dict]) -> ScreenerSnapshot:
+    numeric = {}
+    for column, field in FUNDAMENTAL_FIELDS.items():
+        numeric[column] = np.array([_number(overviews.get(s, {}).get(field)) for s in symbols])
+    indicator_rows = [indicator_row(bars[s]) if s in bars else {} for s in symbols]
+    for column in INDICATOR_FIELDS:
+        numeric[column] = np.array([row.get(column, np.nan) for row in indicator_rows], dtype=float)
+    text = {field: np.array([overviews.get(s, {}).get(field) or "" for s in symbols], dtype=object)
+            for field in TEXT_FIELDS}
+    return ScreenerSnapshot(symbols, numeric, text)
+
+
+async def build_snapshot(symbols: List[str]) -> ScreenerSnapshot:
+    """Snapshot from one batched bar download and cached company overviews (bounded concurrency)."""
+    bars = await get_daily_bars(symbols)
+    slots = asyncio.Semaphore(settings.quote_fetch_concurrency)
+
+    async with StockDataService() as service:
+        async def overview(symbol):
+            async with slots:
+                try:
+                    return symbol, await service.get_company_overview(symbol)
+                except Exception as e:
+                    print(f"Screener overview failed for {symbol}: {e}")
+                    return symbol, {}
+
+        overviews = dict(await asyncio.gather(*(overview(s) for s in symbols)))
+    return await asyncio.to_thread(assemble_snapshot, symbols, bars, overviews)
+
+
+@lru_cache(maxsize=256)
+def parse_filter(expression: str) -> ast.Expression:
+    """Parse a filter expression, allowing only comparisons, boolean logic, arithmetic, field names
+    and literals. Raises ValueError for anything else."""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Filter is longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid filter: {e.msg}")
+    allowed = (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.Compare,
+               ast.BinOp, ast.Name, ast.Load, ast.Constant, ast.Tuple, ast.List, ast.In, ast.NotIn,
+               *_COMPARISONS, *_ARITHMETIC)
+    for node in ast.walk(tree):
+        if not isinstance(node, allowed):
+            raise ValueError(f"Unsupported syntax in filter: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, str)):
+            raise ValueError("Only numbers and strings are allowed as literals")
+    return tree
+
+
+def _evaluate(node, snapshot: ScreenerSnapshot):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, snapshot)
+    if isinstance(node, ast.BoolOp):
+        masks = [np.asarray(_evaluate(v, snapshot), dtype=bool) for v in node.values]
+        return np.logical_and.reduce(masks) if isinstance(node.op, ast.And) else np.logical_or.reduce(masks)
+    if isinstance(node, ast.UnaryOp):
+        value = _evaluate(node.operand, snapshot)
+        return np.logical_not(value) if isinstance(node.op, ast.Not) else np.negative(value)
+    if isinstance(node, ast.BinOp):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return _ARITHMETIC[type(node.op)](_evaluate(node.left, snapshot), _evaluate(node.right, snapshot))
+    if isinstance(node, ast.Compare):
+        left = _evaluate(node.left, snapshot)
+        mask = np.ones(len(snapshot), dtype=bool)
+        for op, comparator in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                if not isinstance(comparator, (ast.Tuple, ast.List)):
+                    raise ValueError("'in' needs a list of values")
+                found = np.isin(left, [_evaluate(e, snapshot) for e in comparator.elts])
+                mask &= found if isinstance(op, ast.In) else ~found
+                continue
+            right = _evaluate(comparator, snapshot)
+            is_text = any(isinstance(v, str) or isinstance(v, np.ndarray) and v.dtype == object for v in (left, right))
+            if is_text and not isinstance(op, (ast.Eq, ast.NotEq)):
+                raise ValueError("Text fields only support ==, != and in")
+            # NaN (unknown) compares False, so rows without the data never match
+            with np.errstate(invalid="ignore"):
+                mask &= np.asarray(_COMPARISONS[type(op)](left, right), dtype=bool)
+            left = right
+        return mask
+    if isinstance(node, ast.Name):
+        return snapshot.column(node.id)
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, (ast.Tuple, ast.List)):
+        raise ValueError("Lists are only allowed after 'in'")
+    raise ValueError(f"Unsupported syntax in filter: {type(node).__name__}")
+
+
+def filter_mask(snapshot: ScreenerSnapshot, expression: Optional[str]) -> np.ndarray:
+    if not expression or not expression.strip():
+        return np.ones(len(snapshot), dtype=bool)
+    mask = _evaluate(parse_filter(expression.strip()), snapshot)
+    if not isinstance(mask, np.ndarray) or mask.dtype != bool:
+        raise ValueError("Filter must be a condition, e.g. PERatio < 20 and rsi_14 < 30")
+    return mask
+
+
+def screen(snapshot: ScreenerSnapshot, expression: Optional[str], sort: Optional[str] = None,
+           descending: bool = True, page: int = 1, page_size: int = 25) -> Dict:
+    """Matching rows sorted by `sort` (unknown values last) and paginated."""
+    matches = np.flatnonzero(filter_mask(snapshot, expression))
+    if sort:
+        values = snapshot.column(sort)[matches]
+        if values.dtype == object:
+            order = np.argsort(np.array([str(v).lower() for v in values]), kind="stable")
+            order = order[::-1] if descending else order
+        else:
+            # argsort puts NaN last in both directions
+            order = np.argsort(-values if descending else values, kind="stable")
+        matches = matches[order]
+    start = (page - 1) * page_size
+    return {
+        "items": snapshot.rows(matches[start:start + page_size]),
+        "page": page,
+        "page_size": page_size,
+        "total": int(matches.size),
+        "as_of": snapshot.as_of.isoformat(),
+    }
+
+
+_snapshot: Optional[ScreenerSnapshot] = None
+# The rebuild in progress, if any, awaited by every caller that asks for a refresh meanwhile
+_refresh_task: Optional[asyncio.Task] = None
+
+
+def current_snapshot() -> Optional[ScreenerSnapshot]:
+    return _snapshot
+
+
+async def _rebuild_snapshot() -> ScreenerSnapshot:
+    global _snapshot
+    started = time.monotonic()
+    universe = await asyncio.to_thread(screener_universe)
+    _snapshot = await build_snapshot(universe)
+    print(f"Screener snapshot built for {len(universe)} symbols in {time.monotonic() - started:.1f}s")
+    return _snapshot
+
+
+async def refresh_snapshot() -> ScreenerSnapshot:
+    """Rebuild the universe snapshot; concurrent calls share one rebuild."""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_rebuild_snapshot())
+    # A caller that goes away (e.g. a dropped admin request) does not cancel the shared rebuild
+    return await asyncio.shield(_refresh_task)
+
+
+def _seconds_until_hour(hour: int, now: Optional[datetime] = None) -> float:
+    now = now or datetime.utcnow()
+    target = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+async def run_screener_refresher():
+    """Background task: build the snapshot at startup, then again every night at SCREENER_REFRESH_HOUR (UTC)."""
+    while True:
+        try:
+            await refresh_snapshot()
+        except Exception as e:
+            print(f"Screener refresh failed: {e}")
+        await asyncio.sleep(_seconds_until_hour(settings.screener_refresh_hour))
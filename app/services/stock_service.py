@@ -2,11 +2,15 @@ import aiohttp
 import asyncio
 from typing import Dict, List, Optional
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 import json
 
+from asyncio_throttle import Throttler
+
 from app.config import settings
 from app.utils.api_rotator import APIRotator
+from app.utils.ttl_cache import TTLCache
 from math import isnan
 import numpy as np
 
@@ -16,6 +20,21 @@ _enhanced_cache: Dict[str, Dict] = {}
 _enhanced_locks: Dict[str, asyncio.Lock] = {}
 _CACHE_TTL_DEFAULT = getattr(settings, 'ENHANCED_CACHE_TTL', 60)
 
+# Latest quotes keyed by upper-cased symbol, shared by every batched quote request
+_quote_cache = TTLCache(ttl=settings.quote_cache_ttl, max_entries=5000)
+
+# Company overviews (sector, fundamentals) change rarely; keyed by upper-cased symbol
+_overview_cache = TTLCache(ttl=settings.overview_cache_ttl, max_entries=5000)
+
+# Headline sentiment keyed by (upper-cased symbol, headline count)
+_sentiment_cache = TTLCache(ttl=settings.sentiment_cache_ttl, max_entries=2000)
+
+# Per-provider pacing for per-symbol calls; callers wait for a slot instead of sleeping
+_provider_throttles = {
+    'yfinance': Throttler(rate_limit=settings.yfinance_rate_limit, period=1.0),
+    'alphavantage': Throttler(rate_limit=settings.alpha_vantage_rate_limit, period=60.0),
+}
+
 
 def detect_market(symbol: str) -> str:
     """
@@ -27,26 +46,108 @@ def detect_market(symbol: str) -> str:
     # Add more rules for other markets as needed
     return 'US' if symbol.isalpha() and len(symbol) <= 5 else 'GLOBAL'
 
+
+# Regular trading sessions in exchange-local time, Monday to Friday. Exchange holidays are not modelled.
+MARKET_SESSIONS = {
+    'IN': ('Asia/Kolkata', (9, 15), (15, 30)),
+    'US': ('America/New_York', (9, 30), (16, 0)),
+}
+
+
+def is_market_open(market: str, now: Optional[datetime] = None) -> bool:
+    """Whether `market` (as returned by detect_market) is in its regular session. GLOBAL is always open."""
+    session = MARKET_SESSIONS.get(market)
+    if session is None:
+        return True
+    tz, start, end = session
+    local = (now or datetime.now(timezone.utc)).astimezone(ZoneInfo(tz))
+    return local.weekday() < 5 and start <= (local.hour, local.minute) < end
+
+
+def to_yf_symbol(symbol: str) -> str:
+    """Normalize a symbol for yfinance: NSE:RELIANCE -> RELIANCE.NS; other symbols are unchanged."""
+    if detect_market(symbol) == 'IN' and not symbol.upper().endswith('.NS') and not symbol.upper().endswith('.BO'):
+        return symbol.replace('NSE:', '').replace('BSE:', '') + '.NS'
+    return symbol
+
+
+def quote_price(quote: Optional[Dict]) -> Optional[float]:
+    """Last price from any quote shape this service returns (yfinance, nsetools, AlphaVantage)."""
+    if not quote:
+        return None
+    for key in ('Price', '05. price', 'lastPrice'):
+        try:
+            price = float(quote.get(key))
+        except (TypeError, ValueError):
+            continue
+        if not isnan(price):
+            return price
+    return None
+
+
+def cache_quote(symbol: str, quote: Dict, ttl: Optional[float] = None):
+    """Store a quote in the shared cache, e.g. from the market data hub with a TTL matching its poll interval."""
+    _quote_cache.set(symbol.upper(), quote, ttl=ttl)
+
+
+def _download_quotes(symbols: List[str]) -> Dict[str, Dict]:
+    """One yfinance download for all `symbols`; returns quotes for those it could price."""
+    import yfinance as yf
+    tickers = {to_yf_symbol(s): s for s in symbols}
+    frame = yf.download(list(tickers), period="5d", interval="1d", group_by="ticker",
+                        auto_adjust=False, progress=False, threads=True)
+    quotes = {}
+    for yf_symbol, symbol in tickers.items():
+        try:
+            closes = frame[yf_symbol]['Close'] if isinstance(frame.columns, pd.MultiIndex) else frame['Close']
+        except KeyError:
+            continue
+        closes = closes.dropna()
+        if closes.empty:
+            continue
+        quote = {'Symbol': symbol, 'Price': float(closes.iloc[-1])}
+        if len(closes) > 1:
+            quote['PreviousClose'] = float(closes.iloc[-2])
+        quotes[symbol] = quote
+    return quotes
+
+
+def _yf_info(symbol: str) -> Dict:
+    import yfinance as yf
+    return yf.Ticker(symbol).info
+
+
+def _yf_sentiment(symbol: str, headlines: Optional[int] = None) -> Dict:
+    """Headline polarity from yfinance news (the latest `headlines` items, or all); blocking
+    (network fetch plus TextBlob scoring)."""
+    import yfinance as yf
+    from textblob import TextBlob
+    ticker = yf.Ticker(symbol)
+    news = (ticker.news if hasattr(ticker, 'news') else None) or []
+    if headlines is not None:
+        news = news[:headlines]
+    sentiments = [TextBlob(item.get('title', '')).sentiment.polarity for item in news]
+    return {
+        'symbol': symbol,
+        'news_count': len(news),
+        'avg_sentiment': sum(sentiments) / len(sentiments) if sentiments else 0,
+        'news': news
+    }
+
+
 class StockDataService:
 
-    async def get_yf_sentiment(self, symbol: str) -> Dict:
-        import yfinance as yf
-        ticker = yf.Ticker(symbol)
-        news = ticker.news if hasattr(ticker, 'news') else []
-        # Simple sentiment: count positive/negative words in headlines
-        from textblob import TextBlob
-        sentiments = []
-        for item in news:
-            headline = item.get('title', '')
-            blob = TextBlob(headline)
-            sentiments.append(blob.sentiment.polarity)
-        avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0
-        return {
-            'symbol': symbol,
-            'news_count': len(news),
-            'avg_sentiment': avg_sentiment,
-            'news': news
-        }
+    async def get_yf_sentiment(self, symbol: str, headlines: Optional[int] = None) -> Dict:
+        """Average polarity of the latest `headlines` news items (all when None), cached for
+        SENTIMENT_CACHE_TTL seconds and fetched off the event loop."""
+        key = (symbol.upper(), headlines)
+        cached = _sentiment_cache.get(key)
+        if cached is not None:
+            return cached
+        async with _provider_throttles['yfinance']:
+            sentiment = await asyncio.to_thread(_yf_sentiment, symbol, headlines)
+        _sentiment_cache.set(key, sentiment)
+        return sentiment
     def __init__(self):
         self.alpha_vantage_rotator = APIRotator(settings.alpha_vantage_keys)
         self.session = None
@@ -61,19 +162,14 @@ class StockDataService:
     async def get_stock_quote(self, symbol: str) -> Dict:
         """Get real-time stock quote, using IndStock for IN, yfinance for GLOBAL, AlphaVantage for US."""
         market = detect_market(symbol)
-        # Normalize symbol for yfinance for Indian stocks
-        yf_symbol = symbol
-        if market == 'IN' and not symbol.upper().endswith('.NS') and not symbol.upper().endswith('.BO'):
-            # allow users to pass NSE:RELIANCE or RELIANCE -> convert to RELIANCE.NS
-            yf_symbol = symbol.replace('NSE:', '').replace('BSE:', '') + '.NS'
-        else:
-            yf_symbol = symbol
+        # Normalize symbol for yfinance for Indian stocks (NSE:RELIANCE -> RELIANCE.NS)
+        yf_symbol = to_yf_symbol(symbol)
         if market == 'IN':
             # Prefer yfinance for IN (supports .NS/.BO). Fall back to nsetools/nsepython/indstock when available.
             try:
-                import yfinance as yf
-                ticker = yf.Ticker(yf_symbol)
-                info = ticker.info
+                # Provider calls block; keep them off the event loop so batched fallbacks overlap
+                async with _provider_throttles['yfinance']:
+                    info = await asyncio.to_thread(_yf_info, yf_symbol)
                 return {
                     'Symbol': yf_symbol,
                     'Price': info.get('regularMarketPrice'),
@@ -91,7 +187,7 @@ class StockDataService:
                 Nse = getattr(nsetools_mod, 'Nse')
                 nse = Nse()
                 qsym = yf_symbol.replace('.NS', '').lower()
-                quote = nse.get_quote(qsym)
+                quote = await asyncio.to_thread(nse.get_quote, qsym)
                 return {
                     'Symbol': symbol,
                     'Price': quote.get('lastPrice'),
@@ -104,14 +200,13 @@ class StockDataService:
                 nsepython_mod = importlib.import_module('nsepython')
                 nse_eq = getattr(nsepython_mod, 'nse_eq')
                 clean = yf_symbol.replace('.NS', '')
-                q = nse_eq(clean)
+                q = await asyncio.to_thread(nse_eq, clean)
                 return q or {}
             except Exception as e:
                 print(f"nsepython quote failed: {e}")
         try:
-            import yfinance as yf
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            async with _provider_throttles['yfinance']:
+                info = await asyncio.to_thread(_yf_info, symbol)
             return {
                 'Symbol': symbol,
                 'Price': info.get('regularMarketPrice'),
@@ -129,7 +224,65 @@ class StockDataService:
             data = await response.json()
             return data.get("Global Quote", {})
     
+    async def get_stock_quotes(self, symbols: List[str], refresh: bool = False) -> Dict[str, Dict]:
+        """Quotes for many symbols at once, keyed by upper-cased symbol.
+
+        Served from the shared quote cache where fresh, unless `refresh` is set. Misses are fetched in one batched yfinance
+        download; symbols the batch cannot price fall back to concurrent `get_stock_quote` calls.
+        Symbols that cannot be priced at all are left out of the result.
+        """
+        quotes = {}
+        missing = []
+        for symbol in dict.fromkeys(s.upper() for s in symbols if s):
+            cached = None if refresh else _quote_cache.get(symbol)
+            if cached is not None:
+                quotes[symbol] = cached
+            else:
+                missing.append(symbol)
+        if not missing:
+            return quotes
+
+        try:
+            fetched = await asyncio.to_thread(_download_quotes, missing)
+        except Exception as e:
+            print(f"yfinance batch quote failed: {e}")
+            fetched = {}
+
+        unresolved = [s for s in missing if s not in fetched]
+        if unresolved:
+            slots = asyncio.Semaphore(settings.quote_fetch_concurrency)
+
+            async def fetch_one(symbol):
+                async with slots:
+                    try:
+                        return await self.get_stock_quote(symbol)
+                    except Exception as e:
+                        print(f"Quote fallback failed for {symbol}: {e}")
+                        return {}
+
+            results = await asyncio.gather(*(fetch_one(s) for s in unresolved))
+            for symbol, quote in zip(unresolved, results):
+                if quote_price(quote) is not None:
+                    fetched[symbol] = quote
+
+        for symbol, quote in fetched.items():
+            _quote_cache.set(symbol, quote)
+            quotes[symbol] = quote
+        return quotes
+
     async def get_company_overview(self, symbol: str) -> Dict:
+        """Company overview and fundamentals, cached for OVERVIEW_CACHE_TTL seconds."""
+        key = symbol.upper()
+        cached = _overview_cache.get(key)
+        if cached is not None:
+            return cached
+        overview = await self._fetch_company_overview(symbol)
+        # Skip provider error payloads (e.g. AlphaVantage rate-limit notes) so they are retried
+        if overview and (overview.get('Symbol') or overview.get('Name')):
+            _overview_cache.set(key, overview)
+        return overview
+
+    async def _fetch_company_overview(self, symbol: str) -> Dict:
         """Get company overview and fundamentals, using IndStock for IN, yfinance for GLOBAL, AlphaVantage for US."""
         market = detect_market(symbol)
         yf_symbol = symbol
@@ -137,9 +290,8 @@ class StockDataService:
             yf_symbol = symbol.replace('NSE:', '').replace('BSE:', '') + '.NS'
         if market == 'IN':
             try:
-                import yfinance as yf
-                ticker = yf.Ticker(yf_symbol)
-                info = ticker.info
+                async with _provider_throttles['yfinance']:
+                    info = await asyncio.to_thread(_yf_info, yf_symbol)
                 return {
                     'Symbol': yf_symbol,
                     'Name': info.get('shortName'),
@@ -160,14 +312,13 @@ class StockDataService:
                 nsepython_mod = importlib.import_module('nsepython')
                 nse_quote = getattr(nsepython_mod, 'nse_quote')
                 clean = yf_symbol.replace('.NS', '')
-                q = nse_quote(clean)
+                q = await asyncio.to_thread(nse_quote, clean)
                 return q or {}
             except Exception as e:
                 print(f"nsepython overview failed: {e}")
         try:
-            import yfinance as yf
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            async with _provider_throttles['yfinance']:
+                info = await asyncio.to_thread(_yf_info, symbol)
             return {
                 'Symbol': symbol,
                 'Name': info.get('shortName'),
@@ -185,8 +336,9 @@ class StockDataService:
             print(f"yfinance failed for overview, falling back to AlphaVantage. Error: {e}")
         api_key = self.alpha_vantage_rotator.get_next_key()
         url = f"https://www.alphavantage.co/query?function=OVERVIEW&symbol={symbol}&apikey={api_key}"
-        async with self.session.get(url) as response:
-            return await response.json()
+        async with _provider_throttles['alphavantage']:
+            async with self.session.get(url) as response:
+                return await response.json()
     
     async def get_historical_data(self, symbol: str, period: str = "1month") -> pd.DataFrame:
         """Get historical price data, using IndStock for IN, yfinance for GLOBAL, AlphaVantage for US."""
@@ -196,14 +348,14 @@ class StockDataService:
                 from indstocks import IndStock
                 ind = IndStock()
                 clean_symbol = symbol.replace('NSE:', '').replace('BSE:', '').replace('.NS', '').replace('.BO', '')
-                df = ind.get_historical_data(clean_symbol, period=period)
+                df = await asyncio.to_thread(ind.get_historical_data, clean_symbol, period=period)
                 return df
             except Exception as e:
                 print(f"IndStock historical failed: {e}")
         try:
             import yfinance as yf
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period)
+            async with _provider_throttles['yfinance']:
+                hist = await asyncio.to_thread(lambda: yf.Ticker(symbol).history(period=period))
             return hist
         except Exception as e:
             print(f"yfinance historical failed: {e}")
@@ -357,6 +509,19 @@ async def get_enhanced_research(symbol: str, period: str = "1mo") -> Dict:
                     except Exception:
                         continue
                 result['ohlc'] = ohlc[-365:]
+                # Candlestick/breakout/volume pattern markers for the chart (same vectorized detector as the scanner)
+                try:
+                    from app.services.pattern_scanner import chart_annotations
+                    result['pattern_annotations'] = chart_annotations(ohlc)[-100:]
+                    # Point-level copy on chart_series so single-series charts can mark the same bars
+                    by_date = {}
+                    for signal in result['pattern_annotations']:
+                        by_date.setdefault(signal['date'], []).append(signal['pattern'])
+                    for point in result['chart_series']:
+                        if point['date'] in by_date:
+                            point['patterns'] = by_date[point['date']]
+                except Exception:
+                    pass
                 # Compute MACD (12/26/9) and attach as date->value maps
                 try:
                     close_float = pd.to_numeric(close_series, errors='coerce')
@@ -0,0 +1,28 @@
+from typing import Iterable, Set
+
+from app.config import settings
+from app.services.stock_service import stock_service
+from app.utils.ttl_cache import TTLCache
+
+# symbol -> whether a provider could price it. Known-good symbols are kept for SYMBOL_INDEX_TTL;
+# unknown ones are re-checked after an hour in case the provider was briefly unavailable.
+_symbols = TTLCache(ttl=settings.symbol_index_ttl, max_entries=50000)
+_INVALID_TTL = 3600
+
+
+def remember_symbols(symbols: Iterable[str]):
+    """Mark symbols as valid without asking a provider (e.g. ones already held in portfolios)."""
+    for symbol in symbols:
+        _symbols.set(symbol.upper(), True)
+
+
+async def validate_symbols(symbols: Iterable[str]) -> Set[str]:
+    """The subset of `symbols` that can be priced. Unknown symbols are checked in one batched quote fetch."""
+    wanted = {s.upper() for s in symbols if s}
+    unknown = [s for s in wanted if s not in _symbols]
+    if unknown:
+        quotes = await stock_service.get_stock_quotes(unknown)
+        for symbol in unknown:
+            valid = symbol in quotes
+            _symbols.set(symbol, valid, ttl=None if valid else _INVALID_TTL)
+    return {s for s in wanted if _symbols.get(s)}
@@ -0,0 +1,76 @@
+import re
+from typing import Dict, Optional, Tuple
+from pymongo import MongoClient
+
+from app.config import settings
+from app.utils.ttl_cache import TTLCache
+
+# Fields searchable by prefix in the admin user listing. Each has a lowercased shadow field
+# (e.g. `username_lc`) so case-insensitive prefix matches can use an index.
+SEARCH_FIELDS = ("username", "email", "full_name")
+
+# Counts above this are reported as "at least" rather than counted exactly
+SEARCH_COUNT_LIMIT = 1000
+
+_count_cache = TTLCache(ttl=60, max_entries=256)
+
+
+def search_keys(fields: Dict) -> Dict[str, str]:
+    """Shadow fields to `$set` alongside any write of username, email or full_name."""
+    return {f"{field}_lc": (fields.get(field) or "").lower() for field in SEARCH_FIELDS if field in fields}
+
+
+def prefix_search_filter(role: str, q: Optional[str]) -> Dict:
+    """Filter for users of `role`, optionally matching `q` as a prefix of username, email or full name.
+
+    Each `$or` branch repeats the role so it maps onto its own (role, <field>_lc) index.
+    """
+    if not q:
+        return {"role": role}
+    prefix = {"$regex": f"^{re.escape(q.strip().lower())}"}
+    return {"$or": [{"role": role, f"{field}_lc": prefix} for field in SEARCH_FIELDS]}
+
+
+def count_users(db, query: Dict, cache_key: str, capped: bool) -> Tuple[int, bool]:
+    """Return (total, is_estimate) for a listing query from an index count, cached briefly per query.
+
+    Capped counts (used for searches) stop at SEARCH_COUNT_LIMIT and are flagged as estimates.
+    """
+    cached = _count_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    if capped:
+        total = db.users.count_documents(query, limit=SEARCH_COUNT_LIMIT)
+        result = (total, total >= SEARCH_COUNT_LIMIT)
+    else:
+        result = (db.users.count_documents(query), False)
+    _count_cache.set(cache_key, result)
+    return result
+
+
+def invalidate_user_counts():
+    _count_cache.clear()
+
+
+def backfill_search_keys(db) -> int:
+    """Populate shadow fields for users created before they existed, in one update."""
+    result = db.users.update_many(
+        {"username_lc": {"$exists": False}},
+        [{"$set": {
+            f"{field}_lc": {"$toLower": {"$ifNull": [f"${field}", ""]}} for field in SEARCH_FIELDS
+        }}]
+    )
+    return result.modified_count
+
+
+async def bootstrap_user_search():
+    """Startup hook: backfill search shadow fields."""
+    client = MongoClient(settings.mongodb_url)
+    try:
+        modified = backfill_search_keys(client[settings.database_name])
+        if modified:
+            print(f"Backfilled search fields for {modified} users")
+    except Exception as e:
+        print(f"User search backfill failed: {e}")
+    finally:
+        client.close()
@@ -0,0 +1,143 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.ohlcv_cache import get_daily_bars, close_matrix
+from app.services.process_pool import get_process_pool
+from app.services.risk_engine import position_quantities, positions_version
+from app.utils.ttl_cache import TTLCache
+
+# Paths per shard. Fixed, so a seed yields the same draws whether shards run in-process or in the pool.
+SHARD_PATHS = 25_000
+
+_var_cache = TTLCache(ttl=settings.ohlcv_cache_ttl, max_entries=256)
+
+
+def cholesky_factor(cov: np.ndarray) -> np.ndarray:
+    """Lower Cholesky factor of `cov`, nudging the diagonal when it is only positive semi-definite
+    (e.g. perfectly correlated holdings)."""
+    jitter = 0.0
+    scale = float(np.mean(np.diag(cov))) or 1.0
+    for _ in range(6):
+        try:
+            return np.linalg.cholesky(cov + jitter * np.eye(len(cov)))
+        except np.linalg.LinAlgError:
+            jitter = scale * 1e-10 if jitter == 0.0 else jitter * 100
+    raise ValueError("Covariance matrix is not positive semi-definite")
+
+
+def parametric_var(mu: np.ndarray, cov: np.ndarray, weights: np.ndarray, value: float,
+                   horizon: int, confidence: float) -> Dict[str, float]:
+    """Gaussian VaR and expected shortfall of the portfolio loss over `horizon` days, in currency."""
+    mean = float(weights @ mu) * horizon
+    std = float(np.sqrt(weights @ cov @ weights * horizon))
+    z = NormalDist().inv_cdf(confidence)
+    return {
+        "var": value * (z * std - mean),
+        "cvar": value * (std * NormalDist().pdf(z) / (1 - confidence) - mean),
+    }
+
+
+def simulate_losses(mu: np.ndarray, chol: np.ndarray, weights: np.ndarray, value: float,
+                    horizon: int, paths: int, seed_seq: np.random.SeedSequence) -> np.ndarray:
+    """Portfolio losses over `horizon` days for `paths` correlated draws.
+
+    Daily log returns are i.i.d. Gaussian, so the horizon return is one draw with mean horizon*mu
+    and covariance horizon*cov. Correlation comes from the Cholesky factor in a single matrix product.
+    """
+    rng = np.random.default_rng(seed_seq)
+    shocks = rng.standard_normal((paths, len(mu))) @ chol.T
+    log_returns = horizon * mu + np.sqrt(horizon) * shocks
+    return -value * (np.expm1(log_returns) @ weights)
+
+
+def monte_carlo_losses(mu: np.ndarray, cov: np.ndarray, weights: np.ndarray, value: float, horizon: int,
+                       paths: int, seed: Optional[int], pool: Optional[ProcessPoolExecutor] = None) -> np.ndarray:
+    """Simulated losses for `paths` paths, in SHARD_PATHS shards seeded from one SeedSequence.
+
+    With a pool, shards run in parallel; the result is identical to running them in-process.
+    """
+    chol = cholesky_factor(cov)
+    shard_sizes = [min(SHARD_PATHS, paths - start) for start in range(0, paths, SHARD_PATHS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(shard_sizes))
+    args = [(mu, chol, weights, value, horizon, size, s) for size, s in zip(shard_sizes, seeds)]
+    if pool is None:
+        shards = [simulate_losses(*a) for a in args]
+    else:
+        shards = list(pool.map(simulate_losses, *zip(*args)))
+    return np.concatenate(shards)
+
+
+def loss_statistics(losses: np.ndarray, confidence: float) -> Dict[str, float]:
+    var = float(np.quantile(losses, confidence))
+    tail = losses[losses >= var]
+    return {"var": var, "cvar": float(tail.mean()) if tail.size else var}
+
+
+def compute_var(log_returns: np.ndarray, weights: np.ndarray, value: float, confidence: float,
+                horizons: List[int], paths: int, seed: Optional[int],
+                pool: Optional[ProcessPoolExecutor] = None) -> Dict[str, Dict]:
+    """Parametric and Monte Carlo VaR/CVaR per horizon from a (days x assets) matrix of daily log returns."""
+    mu = log_returns.mean(axis=0)
+    cov = np.atleast_2d(np.cov(log_returns, rowvar=False))
+    results = {}
+    for horizon in horizons:
+        losses = monte_carlo_losses(mu, cov, weights, value, horizon, paths, seed, pool)
+        results[str(horizon)] = {
+            "parametric": parametric_var(mu, cov, weights, value, horizon, confidence),
+            "monte_carlo": loss_statistics(losses, confidence),
+        }
+    return results
+
+
+async def portfolio_var(holdings: List[Dict], confidence: float, horizons: List[int],
+                        paths: int, seed: Optional[int]) -> Optional[Dict]:
+    """VaR/CVaR for `holdings` at market value, from RISK_LOOKBACK_DAYS of cached daily bars.
+
+    Returns None without enough shared history. Seeded results are deterministic and cached per
+    (positions version, last bar, parameters); simulations of VAR_PARALLEL_PATHS paths or more run
+    on the process pool.
+    """
+    quantities = position_quantities(holdings)
+    if not quantities:
+        return None
+    bars = await get_daily_bars(list(quantities))
+    symbols = [s for s in quantities if s in bars]
+    if not symbols:
+        return None
+    closes = close_matrix(bars, symbols, settings.risk_lookback_days)
+    if len(closes) < 3:
+        return None
+
+    key = (positions_version(holdings), closes.index[-1].isoformat(), confidence, tuple(horizons), paths, seed)
+    if seed is not None:
+        cached = _var_cache.get(key)
+        if cached is not None:
+            return cached
+
+    prices = closes.to_numpy()
+    values = np.array([quantities[s] for s in symbols]) * prices[-1]
+    value = float(values.sum())
+    log_returns = np.diff(np.log(prices), axis=0)
+    pool = get_process_pool() if paths >= settings.var_parallel_paths else None
+    horizon_results = await asyncio.to_thread(
+        compute_var, log_returns, values / value, value, confidence, horizons, paths, seed, pool
+    )
+
+    result = {
+        "symbols": symbols,
+        "portfolio_value": value,
+        "confidence": confidence,
+        "paths": paths,
+        "seed": seed,
+        "observations": len(log_returns),
+        "as_of": closes.index[-1].date().isoformat(),
+        "horizons": horizon_results,
+    }
+    if seed is not None:
+        _var_cache.set(key, result)
+    return result
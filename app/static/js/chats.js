@@ -5,21 +5,56 @@
     const noSessions = document.getElementById('noSessions');
     const noConversation = document.getElementById('noConversation');
 
-    async function fetchSessions(){
+    // Sessions known to the page, keyed by session id; merged from paged loads and sync polls
+    const sessionsById = new Map();
+    let nextCursor = null;
+    let syncToken = null;
+
+    async function fetchSessions(cursor){
         try{
-            const res = await fetch('/api/chat/sessions', { credentials: 'include' });
+            const params = new URLSearchParams();
+            if(cursor) params.set('cursor', cursor);
+            const res = await fetch(`/api/chat/sessions?${params}`, { credentials: 'include' });
             if(res.status === 401){ window.location.href = '/login'; return; }
             const sessions = await res.json();
-            renderSessions(sessions);
+            nextCursor = res.headers.get('X-Next-Cursor');
+            if(!cursor) syncToken = res.headers.get('X-Sync-Token');
+            mergeSessions(sessions);
         }catch(err){
             sessionsList.innerHTML = '<p style="color:var(--danger-color)">Failed to load sessions</p>';
             console.error(err);
         }
     }
 
+    // Poll only for sessions changed since the last sync
+    async function syncSessions(){
+        if(!syncToken) return fetchSessions();
+        try{
+            const res = await fetch(`/api/chat/sessions?since=${encodeURIComponent(syncToken)}`, { credentials: 'include' });
+            if(res.status === 401){ window.location.href = '/login'; return; }
+            const sessions = await res.json();
+            syncToken = res.headers.get('X-Sync-Token') || syncToken;
+            const deleted = (res.headers.get('X-Deleted-Sessions') || '').split(',').filter(Boolean);
+            deleted.forEach(id => sessionsById.delete(id));
+            if(sessions.length || deleted.length) mergeSessions(sessions);
+        }catch(err){
+            console.error(err);
+        }
+    }
+
+    function mergeSessions(sessions){
+        sessions.forEach(sess => sessionsById.set(sess.session_id || sess._id, sess));
+        const ordered = Array.from(sessionsById.values())
+            .sort((a, b) => new Date(b.updated_at) - new Date(a.updated_at));
+        renderSessions(ordered);
+    }
+
     function renderSessions(sessions){
         if(!sessions || sessions.length === 0){
+            sessionsList.innerHTML = '';
             noSessions.textContent = 'No conversations yet.';
+            // The placeholder is removed once sessions render; put it back if they were all deleted
+            if(!noSessions.isConnected) sessionsList.appendChild(noSessions);
             return;
         }
         noSessions.remove();
@@ -34,13 +69,30 @@
             el.addEventListener('click', () => loadConversation(sess.session_id || sess._id));
             sessionsList.appendChild(el);
         });
+        if(nextCursor){
+            const more = document.createElement('button');
+            more.className = 'btn btn-secondary';
+            more.style.margin = '0.5rem';
+            more.textContent = 'Load older conversations';
+            more.addEventListener('click', () => fetchSessions(nextCursor));
+            sessionsList.appendChild(more);
+        }
     }
 
     async function loadConversation(sessionId){
         try{
-            const res = await fetch(`/api/chat/sessions/${sessionId}/messages`, { credentials: 'include' });
-            if(res.status === 401){ window.location.href = '/login'; return; }
-            const messages = await res.json();
+            // Messages come oldest first in pages; follow the cursor so the newest ones are included
+            const messages = [];
+            let cursor = null;
+            do {
+                const params = new URLSearchParams({ limit: '1000' });
+                if(cursor) params.set('cursor', cursor);
+                const res = await fetch(`/api/chat/sessions/${sessionId}/messages?${params}`, { credentials: 'include' });
+                if(res.status === 401){ window.location.href = '/login'; return; }
+                if(!res.ok) throw new Error(`HTTP ${res.status}`);
+                messages.push(...await res.json());
+                cursor = res.headers.get('X-Next-Cursor');
+            } while(cursor);
             renderConversation(messages);
         }catch(err){
             conversationArea.innerHTML = '<p style="color:var(--danger-color)">Failed to load messages</p>';
@@ -90,6 +142,6 @@
         }
     });
 
-    // Optional: poll for new sessions every 10s
-    setInterval(fetchSessions, 10000);
+    // Poll for changed sessions every 10s
+    setInterval(syncSessions, 10000);
 })();
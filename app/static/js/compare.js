@@ -5,6 +5,10 @@ document.addEventListener('DOMContentLoaded', () => {
     const symbolsInput = document.getElementById('symbolsInput');
     const metricsInput = document.getElementById('metricsInput');
     const compareResults = document.getElementById('compareResults');
+    const windowInput = document.getElementById('windowInput');
+    const compareAnalytics = document.getElementById('compareAnalytics');
+    // The point-in-time metrics table covers at most this many symbols; return analytics cover up to 50
+    const MAX_TABLE_SYMBOLS = 5;
 
     compareForm.addEventListener('submit', async function(e) {
         e.preventDefault();
@@ -15,6 +19,12 @@ document.addEventListener('DOMContentLoaded', () => {
             return;
         }
         compareResults.innerHTML = '<div class="loading">Comparing stocks...</div>';
+        compareAnalytics.innerHTML = '';
+        loadAnalytics(symbols);
+        if (symbols.length > MAX_TABLE_SYMBOLS) {
+            compareResults.innerHTML = '';
+            return;
+        }
         try {
             const response = await fetch('/api/research/compare', {
                 method: 'POST',
@@ -50,4 +60,60 @@ document.addEventListener('DOMContentLoaded', () => {
         html += '</tbody></table>';
         compareResults.innerHTML = html;
     }
+
+    async function loadAnalytics(symbols) {
+        compareAnalytics.innerHTML = '<div class="loading">Computing correlations and clusters...</div>';
+        try {
+            const response = await fetch('/api/research/compare/analytics', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                credentials: 'include',
+                body: JSON.stringify({ symbols, window: Number(windowInput.value) || 252 })
+            });
+            if (response.ok) {
+                renderAnalytics(await response.json());
+            } else {
+                const error = await response.json().catch(() => ({ detail: 'Analytics failed' }));
+                compareAnalytics.innerHTML = `<div class="error">${error.detail}</div>`;
+            }
+        } catch (err) {
+            compareAnalytics.innerHTML = `<div class="error">${err.message}</div>`;
+        }
+    }
+
+    function renderAnalytics(data) {
+        let html = `<h3>Returns analytics (${data.start} to ${data.end}, vs ${data.benchmark})</h3>`;
+        if (data.excluded && data.excluded.length) {
+            html += `<div class="error">No price history for: ${data.excluded.join(', ')}</div>`;
+        }
+        html += '<h4>Peer clusters</h4><ol class="cluster-list">';
+        data.clusters.forEach(cluster => { html += `<li>${cluster.join(', ')}</li>`; });
+        html += '</ol>';
+        html += '<table class="compare-table"><thead><tr><th>Symbol</th><th>Total return</th><th>Volatility</th><th>Beta</th></tr></thead><tbody>';
+        data.summary.forEach(row => {
+            html += `<tr><td>${row.symbol}</td><td>${(row.total_return * 100).toFixed(1)}%</td>` +
+                `<td>${(row.volatility * 100).toFixed(1)}%</td><td>${row.beta === null ? '-' : row.beta.toFixed(2)}</td></tr>`;
+        });
+        html += '</tbody></table>';
+        html += '<div id="correlationChart" class="compare-chart"></div>';
+        html += '<div id="relativeChart" class="compare-chart"></div>';
+        html += '<div id="betaChart" class="compare-chart"></div>';
+        compareAnalytics.innerHTML = html;
+        if (!window.Plotly) return;
+
+        // Heatmap in clustered order so correlated peers form blocks
+        const index = Object.fromEntries(data.symbols.map((s, i) => [s, i]));
+        const z = data.order.map(a => data.order.map(b => data.correlation[index[a]][index[b]]));
+        Plotly.newPlot('correlationChart', [{
+            z, x: data.order, y: data.order, type: 'heatmap', zmin: -1, zmax: 1, colorscale: 'RdBu', reversescale: true
+        }], { title: 'Return correlation', yaxis: { autorange: 'reversed' } }, { responsive: true });
+
+        Plotly.newPlot('relativeChart', data.symbols.map(s => ({
+            x: data.dates, y: data.relative[s], type: 'scatter', mode: 'lines', name: s
+        })), { title: `Performance relative to ${data.benchmark} (1 = in line)` }, { responsive: true });
+
+        Plotly.newPlot('betaChart', data.symbols.map(s => ({
+            x: data.beta_dates, y: data.rolling_beta[s], type: 'scatter', mode: 'lines', name: s
+        })), { title: `Rolling ${data.beta_window}-day beta vs ${data.benchmark}` }, { responsive: true });
+    }
 });
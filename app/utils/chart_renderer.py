@@ -0,0 +1,82 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from app.utils.ttl_cache import TTLCache
+
+# Server-side chart rendering runs off the event loop on a small pool. Figures are built with the
+# object-oriented Figure/Agg API rather than pyplot, whose global state is not thread-safe.
+_render_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chart")
+
+# Rendered data URIs keyed by a hash of the chart spec, so an unchanged series is never re-rendered
+_chart_cache = TTLCache(ttl=24 * 3600, max_entries=64)
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def line_chart_spec(title: str, xlabel: str, ylabel: str, labels: List[str], values: List[float]) -> Dict:
+    """Data-only chart description in Plotly's figure format, usable by the browser directly."""
+    return {
+        "data": [{
+            "x": labels,
+            "y": values,
+            "type": "scatter",
+            "mode": "lines+markers",
+            "line": {"width": 2},
+            "marker": {"size": 4}
+        }],
+        "layout": {
+            "title": title,
+            "xaxis": {"title": xlabel, "tickangle": -45},
+            "yaxis": {"title": ylabel}
+        }
+    }
+
+
+def _render_line_chart_png(spec: Dict) -> bytes:
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    layout = spec["layout"]
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    for trace in spec["data"]:
+        marker = 'o' if "markers" in trace.get("mode", "") else None
+        ax.plot(trace["x"], trace["y"], marker=marker, linewidth=2, markersize=4, label=trace.get("name"))
+    if any(trace.get("name") for trace in spec["data"]):
+        ax.legend()
+    ax.set_title(layout["title"])
+    ax.set_xlabel(layout["xaxis"]["title"])
+    ax.set_ylabel(layout["yaxis"]["title"])
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def chart_hash(spec: Dict) -> str:
+    return hashlib.sha1(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def render_chart_data_uri(spec: Dict) -> str:
+    """Render a line chart spec to a base64 PNG data URI, cached by the hash of its data."""
+    key = chart_hash(spec)
+    cached = _chart_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Concurrent requests for the same chart share one render
+    future = _inflight.get(key)
+    if future is None:
+        future = asyncio.get_running_loop().run_in_executor(_render_executor, _render_line_chart_png, spec)
+        _inflight[key] = future
+        future.add_done_callback(lambda _: _inflight.pop(key, None))
+    png = await future
+    data_uri = f"data:image/png;base64,{base64.b64encode(png).decode()}"
+    _chart_cache.set(key, data_uri)
+    return data_uri
@@ -0,0 +1,182 @@
+from typing import Dict, List, Any
+from datetime import datetime
+from pymongo import MongoClient, IndexModel, ASCENDING, DESCENDING
+from app.config import settings
+
+# Declarative index registry: collection -> indexes the app's queries rely on.
+# Indexes are created at startup; add an entry here alongside any new hot-path query.
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    "chat_messages": [
+        IndexModel([("session_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)], name="session_timestamp"),
+        IndexModel([("timestamp", ASCENDING)], name="timestamp"),
+    ],
+    "chat_sessions": [
+        IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], name="user_updated"),
+        IndexModel([("session_id", ASCENDING)], name="session_id"),
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+        IndexModel([("type", ASCENDING)], name="type", sparse=True),
+    ],
+    "chat_session_deletions": [
+        # Tombstones reported to `since` syncs; expire once no sync token could still predate them
+        IndexModel([("user_id", ASCENDING), ("deleted_at", ASCENDING)], name="user_deleted"),
+        IndexModel([("deleted_at", ASCENDING)], name="deleted_at_ttl", expireAfterSeconds=30 * 24 * 3600),
+    ],
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username"),
+        IndexModel([("email", ASCENDING)], name="email"),
+        IndexModel([("last_login", DESCENDING)], name="last_login"),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+        IndexModel([("role", ASCENDING), ("created_at", DESCENDING)], name="role_created"),
+        # Prefix search in the admin listing (lowercased shadow fields)
+        IndexModel([("role", ASCENDING), ("username_lc", ASCENDING)], name="role_username_lc"),
+        IndexModel([("role", ASCENDING), ("email_lc", ASCENDING)], name="role_email_lc"),
+        IndexModel([("role", ASCENDING), ("full_name_lc", ASCENDING)], name="role_full_name_lc"),
+    ],
+    "portfolios": [
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        # Symbols still in legacy embedded holdings (empty once every portfolio is migrated to lots)
+        IndexModel([("holdings.symbol", ASCENDING)], name="holdings_symbol"),
+    ],
+    "portfolio_lots": [
+        # Positions by portfolio and symbol, lots in FIFO order
+        IndexModel([("portfolio_id", ASCENDING), ("symbol", ASCENDING), ("trade_date", ASCENDING)],
+                   name="portfolio_symbol_trade_date"),
+        # Tracked symbols for the market data hub
+        IndexModel([("symbol", ASCENDING)], name="symbol"),
+    ],
+    "price_marks": [
+        IndexModel([("symbol", ASCENDING)], name="symbol", unique=True),
+    ],
+    "research_sessions": [
+        IndexModel([("user_id", ASCENDING), ("generated_at", DESCENDING)], name="user_generated"),
+    ],
+    "transactions": [
+        IndexModel([("portfolio_id", ASCENDING), ("timestamp", ASCENDING)], name="portfolio_timestamp"),
+        IndexModel([("portfolio_id", ASCENDING), ("trade_date", ASCENDING)], name="portfolio_trade_date"),
+        # CSV import rows, so the same statement cannot be imported twice
+        IndexModel([("portfolio_id", ASCENDING), ("import_hash", ASCENDING)], name="portfolio_import_hash",
+                   unique=True, partialFilterExpression={"import_hash": {"$exists": True}}),
+    ],
+    "portfolio_nav": [
+        IndexModel([("portfolio_id", ASCENDING), ("date", ASCENDING)], name="portfolio_date", unique=True),
+    ],
+    "watchlists": [
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        IndexModel([("symbol", ASCENDING)], name="symbol"),
+    ],
+    "alerts": [
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING)], name="user_created"),
+        # Startup index load and the market data hub's tracked symbols
+        IndexModel([("active", ASCENDING), ("symbol", ASCENDING)], name="active_symbol"),
+    ],
+    "email_verifications": [
+        IndexModel([("email", ASCENDING)], name="email"),
+    ],
+}
+
+# Placeholder id used to explain queries that filter by a user or session
+_SAMPLE_ID = "000000000000000000000000"
+
+# The app's canonical hot-path queries, explained by the admin index health report
+CANONICAL_QUERIES: List[Dict[str, Any]] = [
+    {"name": "chat messages by session", "collection": "chat_messages",
+     "filter": {"session_id": _SAMPLE_ID}, "sort": [("timestamp", ASCENDING), ("_id", ASCENDING)]},
+    {"name": "chat sessions by user", "collection": "chat_sessions",
+     "filter": {"user_id": _SAMPLE_ID}, "sort": [("updated_at", DESCENDING), ("_id", DESCENDING)]},
+    {"name": "chat session by session_id", "collection": "chat_sessions",
+     "filter": {"session_id": _SAMPLE_ID}, "sort": None},
+    {"name": "user by username", "collection": "users",
+     "filter": {"username": "admin"}, "sort": None},
+    {"name": "user by email", "collection": "users",
+     "filter": {"email": "admin@example.com"}, "sort": None},
+    {"name": "users by last_login", "collection": "users",
+     "filter": {"last_login": {"$gte": datetime(1970, 1, 1)}}, "sort": None},
+    {"name": "users by role, newest first", "collection": "users",
+     "filter": {"role": "user"}, "sort": [("created_at", DESCENDING)]},
+    {"name": "users by username prefix", "collection": "users",
+     "filter": {"role": "user", "username_lc": {"$regex": "^adm"}}, "sort": None},
+    {"name": "portfolio by user", "collection": "portfolios",
+     "filter": {"user_id": _SAMPLE_ID}, "sort": None},
+    {"name": "lots by portfolio and symbol", "collection": "portfolio_lots",
+     "filter": {"portfolio_id": _SAMPLE_ID, "symbol": {"$in": ["AAPL"]}}, "sort": [("trade_date", ASCENDING)]},
+    {"name": "price marks by symbol", "collection": "price_marks",
+     "filter": {"symbol": {"$in": ["AAPL"]}}, "sort": None},
+    {"name": "ledger by portfolio and trade date", "collection": "transactions",
+     "filter": {"portfolio_id": _SAMPLE_ID, "trade_date": {"$gte": "2024-01-01"}}, "sort": [("trade_date", ASCENDING)]},
+    {"name": "imported rows by hash", "collection": "transactions",
+     "filter": {"portfolio_id": _SAMPLE_ID, "import_hash": {"$in": ["0" * 64]}}, "sort": None},
+    {"name": "NAV series by portfolio", "collection": "portfolio_nav",
+     "filter": {"portfolio_id": _SAMPLE_ID}, "sort": [("date", DESCENDING)]},
+    {"name": "research sessions by user", "collection": "research_sessions",
+     "filter": {"user_id": _SAMPLE_ID}, "sort": None},
+    {"name": "alerts by user", "collection": "alerts",
+     "filter": {"user_id": _SAMPLE_ID}, "sort": [("created_at", ASCENDING)]},
+    {"name": "active alert symbols", "collection": "alerts",
+     "filter": {"active": True}, "sort": [("symbol", ASCENDING)]},
+    {"name": "watchlist by user", "collection": "watchlists",
+     "filter": {"user_id": _SAMPLE_ID}, "sort": None},
+]
+
+
+def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every registered index. Existing indexes are left untouched; failures are logged per collection."""
+    created = {}
+    for collection, indexes in INDEX_REGISTRY.items():
+        try:
+            created[collection] = db[collection].create_indexes(indexes)
+        except Exception as e:
+            print(f"Index creation failed for {collection}: {e}")
+    return created
+
+
+async def bootstrap_indexes():
+    """Startup hook: create the registered indexes."""
+    client = MongoClient(settings.mongodb_url)
+    try:
+        ensure_indexes(client[settings.database_name])
+    finally:
+        client.close()
+
+
+def plan_stages(plan: Dict) -> List[str]:
+    """Flatten the stage names of an explain() plan tree (classic and SBE formats)."""
+    if not isinstance(plan, dict):
+        return []
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan", "outerStage", "innerStage"):
+        stages.extend(plan_stages(plan.get(key)))
+    for child in plan.get("inputStages", []):
+        stages.extend(plan_stages(child))
+    return stages
+
+
+def index_health_report(db) -> Dict[str, Any]:
+    """Explain each canonical query and flag the ones whose winning plan is a collection scan."""
+    queries = []
+    for query in CANONICAL_QUERIES:
+        entry = {"name": query["name"], "collection": query["collection"]}
+        try:
+            cursor = db[query["collection"]].find(query["filter"]).limit(1)
+            if query["sort"]:
+                cursor = cursor.sort(query["sort"])
+            explain = cursor.explain()
+            stages = plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+            entry["stages"] = stages
+            entry["collection_scan"] = "COLLSCAN" in stages
+            entry["in_memory_sort"] = "SORT" in stages
+        except Exception as e:
+            entry["error"] = str(e)
+        queries.append(entry)
+
+    indexes = {}
+    for collection in INDEX_REGISTRY:
+        try:
+            indexes[collection] = sorted(db[collection].index_information().keys())
+        except Exception as e:
+            indexes[collection] = {"error": str(e)}
+
+    return {
+        "queries": queries,
+        "collection_scans": [q["name"] for q in queries if q.get("collection_scan")],
+        "indexes": indexes,
+    }
@@ -0,0 +1,39 @@
+import base64
+from datetime import datetime
+from typing import Dict, Tuple
+from bson import ObjectId
+from fastapi import HTTPException
+
+
+def encode_cursor(value: datetime, object_id) -> str:
+    """Encode a (sort value, _id) keyset position as an opaque URL-safe token."""
+    raw = f"{value.isoformat()}|{object_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, object_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(value), ObjectId(object_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_since(since: str) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(since.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since timestamp")
+    # Stored timestamps are naive UTC
+    return parsed.replace(tzinfo=None) if parsed.tzinfo is None else datetime.utcfromtimestamp(parsed.timestamp())
+
+
+def keyset_filter(field: str, cursor: str, descending: bool) -> Dict:
+    """Build the filter selecting documents strictly after `cursor` in (field, _id) order."""
+    value, object_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: object_id}}
+    ]}
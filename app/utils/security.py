@@ -1,7 +1,12 @@
 from pymongo import MongoClient
 from fastapi import Depends, HTTPException
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from datetime import datetime
+from typing import Dict
+import asyncio
+import time
 from app.config import settings
 
 # Create password context here to avoid circular imports
@@ -13,6 +18,90 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+# bcrypt costs ~100-300 ms of CPU per call, so it runs on a bounded pool instead of the event loop.
+# The semaphore admits at most one call per worker; further attempts queue without occupying a thread.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt")
+_hash_slots = asyncio.Semaphore(settings.password_hash_workers)
+
+class PasswordHashMetrics:
+    """Latency counters for password hashing, split into queue wait and bcrypt time."""
+
+    def __init__(self, window: int = 500):
+        self.waiting = 0
+        self.in_flight = 0
+        self.counts: Dict[str, int] = {"hash": 0, "verify": 0}
+        self.samples: Dict[str, deque] = {"hash": deque(maxlen=window), "verify": deque(maxlen=window)}
+        self.wait_samples: deque = deque(maxlen=window)
+
+    def record(self, op: str, wait_ms: float, run_ms: float):
+        self.counts[op] += 1
+        self.samples[op].append(run_ms)
+        self.wait_samples.append(wait_ms)
+
+    @staticmethod
+    def _summary(samples) -> Dict[str, float]:
+        if not samples:
+            return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(samples)
+        return {
+            "p50_ms": round(ordered[len(ordered) // 2], 2),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+            "max_ms": round(ordered[-1], 2),
+        }
+
+    def snapshot(self) -> Dict:
+        return {
+            "workers": settings.password_hash_workers,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "counts": dict(self.counts),
+            "hash": self._summary(self.samples["hash"]),
+            "verify": self._summary(self.samples["verify"]),
+            "queue_wait": self._summary(self.wait_samples),
+        }
+
+password_hash_metrics = PasswordHashMetrics()
+
+async def _run_hash_op(op: str, fn, *args):
+    queued_at = time.perf_counter()
+    password_hash_metrics.waiting += 1
+    try:
+        await _hash_slots.acquire()
+    finally:
+        password_hash_metrics.waiting -= 1
+    started_at = time.perf_counter()
+    password_hash_metrics.in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        password_hash_metrics.in_flight -= 1
+        _hash_slots.release()
+        finished_at = time.perf_counter()
+        password_hash_metrics.record(op, (started_at - queued_at) * 1000, (finished_at - started_at) * 1000)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the bcrypt worker pool."""
+    return await _run_hash_op("hash", get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the bcrypt worker pool."""
+    return await _run_hash_op("verify", verify_password, plain_password, hashed_password)
+
+_shared_client = None
+
+def get_shared_db():
+    """Process-wide database handle for background jobs (pymongo clients are pooled and thread-safe)."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = MongoClient(settings.mongodb_url)
+    return _shared_client[settings.database_name]
+
+def close_shared_db():
+    global _shared_client
+    if _shared_client is not None:
+        _shared_client.close()
+        _shared_client = None
+
 def get_db():
     from pymongo import MongoClient
     client = MongoClient(settings.mongodb_url)
@@ -30,7 +119,7 @@ async def create_default_admin():
     admin_user = db.users.find_one({"username": settings.admin_username})
     
     if not admin_user:
-        hashed_password = get_password_hash(settings.admin_password)
+        hashed_password = await get_password_hash_async(settings.admin_password)
         admin_user = {
             "username": settings.admin_username,
             "email": settings.admin_email,
@@ -41,6 +130,8 @@ async def create_default_admin():
             "created_at": datetime.utcnow(),
             "email_verified": True
         }
+        # Lowercased shadow fields used by the admin user search
+        admin_user.update({f"{field}_lc": admin_user[field].lower() for field in ("username", "email", "full_name")})
         
         db.users.insert_one(admin_user)
         print("Default admin user created")
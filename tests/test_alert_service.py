@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.alert_service import AlertEngine, AlertIndex, claim_triggered, validate_alert
+from app.services.indicators import rsi, sma
+
+
+def _alert(alert_id, kind, symbol="AAPL", **fields):
+    return {"_id": alert_id, "user_id": "u1", "symbol": symbol, "kind": kind, **fields}
+
+
+def test_price_alerts_match_by_bisection():
+    index = AlertIndex()
+    for alert_id, kind, threshold in [("a1", "price_above", 100.0), ("a2", "price_above", 110.0),
+                                      ("b1", "price_below", 90.0), ("b2", "price_below", 80.0)]:
+        index.add(_alert(alert_id, kind, threshold=threshold))
+    index.add(_alert("m1", "price_above", symbol="MSFT", threshold=1.0))
+    assert sorted(index.match_price("AAPL", 105.0)) == ["a1"]
+    assert sorted(index.match_price("AAPL", 85.0)) == ["b1"]
+    assert sorted(index.match_price("AAPL", 110.0)) == ["a1", "a2"]
+    index.remove("a1")
+    assert index.match_price("AAPL", 105.0) == []
+    assert index.symbols() == {"AAPL", "MSFT"}
+
+
+def test_rsi_crossings_use_the_moved_interval():
+    index = AlertIndex()
+    index.add(_alert("up70", "rsi_cross_above", threshold=70.0))
+    index.add(_alert("up80", "rsi_cross_above", threshold=80.0))
+    index.add(_alert("down30", "rsi_cross_below", threshold=30.0))
+    assert index.match_rsi("AAPL", 65.0, 72.0) == ["up70"]
+    assert index.match_rsi("AAPL", 72.0, 75.0) == []
+    assert index.match_rsi("AAPL", 35.0, 30.0) == ["down30"]
+
+
+def test_engine_detects_sma_crossover_on_provisional_close():
+    engine = AlertEngine()
+    engine.index.add(_alert("x", "sma_cross_above", fast=2, slow=3))
+    closes = np.array([10.0, 9.0, 8.0, 7.0, 7.5])
+    assert engine.evaluate("AAPL", 7.5, closes) == []
+    # A jump in today's price pulls the fast SMA above the slow one
+    assert engine.evaluate("AAPL", 12.0, np.append(closes[:-1], 12.0)) == [("x", pytest.approx(0.5))]
+
+
+def test_claim_triggered_skips_alerts_already_deactivated():
+    active = {"a1"}
+
+    class Result:
+        def __init__(self, modified_count):
+            self.modified_count = modified_count
+
+    class Alerts:
+        def update_one(self, query, update):
+            matched = query["_id"] in active and query["active"] is True
+            active.discard(query["_id"])
+            return Result(1 if matched else 0)
+
+    db = {"alerts": Alerts()}
+    fired = [(_alert("a1", "price_above"), 101.0), (_alert("a2", "price_above"), 101.0)]
+    claimed = claim_triggered(db, fired, datetime(2024, 1, 2))
+    assert [alert["_id"] for alert, _ in claimed] == ["a1"]
+    # A second trigger of the same alert (e.g. from another worker) is not delivered again
+    assert claim_triggered(db, fired[:1], datetime(2024, 1, 2)) == []
+
+
+def test_validate_alert():
+    assert validate_alert({"symbol": "aapl", "kind": "sma_cross_below"}) == {
+        "symbol": "AAPL", "kind": "sma_cross_below", "notify_email": True, "fast": 20, "slow": 50}
+    with pytest.raises(ValueError):
+        validate_alert({"symbol": "AAPL", "kind": "rsi_cross_above", "threshold": 120})
+    with pytest.raises(ValueError):
+        validate_alert({"symbol": "AAPL", "kind": "volume_above", "threshold": 1})
+
+
+def test_indicators():
+    assert np.allclose(sma(np.arange(1.0, 6.0), 3)[2:], [2.0, 3.0, 4.0])
+    assert np.isnan(sma(np.arange(1.0, 6.0), 3)[:2]).all()
+    rising = rsi(np.arange(1.0, 40.0), 14)
+    assert np.isnan(rising[:14]).all() and rising[-1] == 100.0
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from app.services.backtest import (
+    _hold_between, backtest_stats, parameter_grid, run_sweep, simulate, strategy_params, strategy_positions
+)
+
+
+def test_hold_between_forward_fills_signals():
+    entries = np.array([False, True, False, False, True, False])
+    exits = np.array([False, False, False, True, True, False])
+    assert _hold_between(entries, exits).tolist() == [0, 1, 1, 0, 0, 0]
+
+
+def test_simulate_charges_costs_on_position_changes():
+    closes = np.array([100.0, 110.0, 121.0, 121.0])
+    positions = np.array([1.0, 1.0, 0.0, 0.0])
+    run = simulate(closes, positions, fee_bps=10, slippage_bps=0)
+    # Entry cost on the first bar, exit cost on the bar after the sell
+    assert run["returns"] == pytest.approx([0.1 - 0.001, 0.1, -0.001])
+    stats = backtest_stats(run, risk_free_rate=0.0)
+    assert stats["trades"] == 1 and stats["win_rate"] == 1.0
+    assert stats["buy_and_hold_return"] == pytest.approx(0.21)
+    assert stats["max_drawdown"] == pytest.approx(-0.001)
+
+
+def test_sma_crossover_positions_and_sweep():
+    closes = np.concatenate([np.linspace(100, 80, 40), np.linspace(80, 130, 60)])
+    positions = strategy_positions("sma_crossover", closes, {"fast": 5, "slow": 20})
+    assert positions[30] == 0 and positions[-1] == 1
+
+    grid = parameter_grid("sma_crossover", {"fast": [5, 10, 30], "slow": [20, 30]})
+    # fast >= slow combinations are skipped
+    assert {(p["fast"], p["slow"]) for p in grid} == {(5, 20), (5, 30), (10, 20), (10, 30)}
+    results = run_sweep("sma_crossover", {"X": closes}, grid, 10, 5, 0.0)
+    assert len(results) == 4 and all(r["symbol"] == "X" for r in results)
+
+
+def test_strategy_params_validation():
+    assert strategy_params("rsi_reversion", {"lower": "25"})["lower"] == 25
+    with pytest.raises(ValueError):
+        strategy_params("sma_crossover", {"fast": 50, "slow": 20})
+    with pytest.raises(ValueError):
+        strategy_params("bollinger_breakout", {"period": 3})
+    with pytest.raises(ValueError):
+        strategy_params("rsi_reversion", {"period": 1})
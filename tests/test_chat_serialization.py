@@ -13,3 +13,35 @@ def test_convert_objectid_list():
     arr = [{"_id": ObjectId()}, {"_id": ObjectId()}]
     converted = convert_objectid(arr)
     assert all(isinstance(x["_id"], str) for x in converted)
+
+
+def test_serialize_session_fills_session_id():
+    from datetime import datetime
+    from app.services.chat_persistence import serialize_session
+
+    oid = ObjectId()
+    session = serialize_session({"_id": oid, "updated_at": datetime(2024, 1, 2, 3, 4, 5)})
+    assert session["_id"] == str(oid)
+    assert session["session_id"] == str(oid)
+    assert session["updated_at"] == "2024-01-02T03:04:05"
+
+
+def test_sessions_resolve_only_for_their_owner():
+    from app.services.chat_persistence import ChatPersistenceService
+
+    class Sessions:
+        def __init__(self):
+            self.docs = [{"_id": ObjectId(), "session_id": "s1", "user_id": "alice"}]
+
+        def find_one(self, query, projection=None):
+            for doc in self.docs:
+                if all(doc.get(k) == v for k, v in query.items()):
+                    return dict(doc)
+            return None
+
+    class DB:
+        chat_sessions = Sessions()
+
+    store = ChatPersistenceService(DB())
+    assert store.resolve_session("s1", "alice")["user_id"] == "alice"
+    assert store.resolve_session("s1", "mallory") is None
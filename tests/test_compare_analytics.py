@@ -0,0 +1,91 @@
+import asyncio
+
+import numpy as np
+
+from app.services.compare_analytics import (
+    average_linkage, compare_returns, correlation_matrix, cut_clusters, leaf_order, rolling_beta
+)
+
+
+def test_correlation_and_rolling_beta_match_direct_formulas():
+    rng = np.random.default_rng(7)
+    returns = rng.normal(0, 0.01, (120, 4))
+    benchmark = rng.normal(0, 0.01, 120)
+    returns[:, 0] = 1.5 * benchmark + rng.normal(0, 0.001, 120)
+
+    assert np.allclose(correlation_matrix(returns), np.corrcoef(returns, rowvar=False))
+
+    beta = rolling_beta(returns, benchmark, 30)
+    assert beta.shape == (91, 4)
+    for row in (0, 45, 90):
+        b = benchmark[row:row + 30]
+        for col in range(4):
+            expected = np.cov(returns[row:row + 30, col], b)[0, 1] / b.var(ddof=1)
+            assert np.isclose(beta[row, col], expected)
+    assert np.all(np.abs(beta[:, 0] - 1.5) < 0.1)
+
+
+def test_average_linkage_separates_correlated_groups():
+    rng = np.random.default_rng(11)
+    energy, tech = rng.normal(0, 0.01, (2, 250))
+    returns = np.column_stack([
+        energy + rng.normal(0, 0.003, 250), tech + rng.normal(0, 0.003, 250),
+        energy + rng.normal(0, 0.003, 250), tech + rng.normal(0, 0.003, 250),
+    ])
+    merges = average_linkage(1 - correlation_matrix(returns))
+    assert len(merges) == 3 and merges[-1][3] == 4
+    # Linkage distances never decrease
+    assert [m[2] for m in merges] == sorted(m[2] for m in merges)
+    assert cut_clusters(merges, 4, 0.5) == [0, 1, 0, 1]
+    assert cut_clusters(merges, 4, 2.0) == [0, 0, 0, 0]
+    order = leaf_order(merges, 4)
+    assert sorted(order) == [0, 1, 2, 3]
+    assert abs(order.index(0) - order.index(2)) == 1
+
+
+def test_compare_returns_relative_performance():
+    closes = np.array([[10.0, 20.0, 100.0], [11.0, 19.0, 110.0], [11.55, 19.0, 115.5]])
+    result = compare_returns(closes, ["A", "B"], beta_window=60, min_correlation=0.5)
+    assert result["beta_window"] == 2
+    assert np.allclose(result["growth"][-1], [1.155, 0.95])
+    # A moved exactly with the benchmark
+    assert np.allclose(result["relative"][:, 0], 1.0)
+    assert np.isclose(result["beta"][-1, 0], 1.0)
+
+
+def test_compare_table_fetches_concurrently_and_caches(monkeypatch):
+    from app.services import compare_analytics
+
+    calls = {"quotes": 0, "overview": 0, "sentiment": 0}
+    in_flight = []
+
+    async def quotes(self, symbols):
+        calls["quotes"] += 1
+        return {s: {"Price": 10.0} for s in symbols}
+
+    async def overview(self, symbol):
+        calls["overview"] += 1
+        in_flight.append(symbol)
+        await asyncio.sleep(0.01)
+        # Every symbol's overview request is pending at once
+        assert len(in_flight) == 2
+        return {"PERatio": 20.0 if symbol == "AAA" else None}
+
+    async def sentiment(self, symbol, headlines=None):
+        calls["sentiment"] += 1
+        assert headlines == compare_analytics.SENTIMENT_HEADLINES
+        return {"avg_sentiment": 0.5}
+
+    service = compare_analytics.StockDataService
+    monkeypatch.setattr(service, "get_stock_quotes", quotes)
+    monkeypatch.setattr(service, "get_company_overview", overview)
+    monkeypatch.setattr(service, "get_yf_sentiment", sentiment)
+
+    rows = asyncio.run(compare_analytics.compare_table(["AAA", "BBB"], ["price", "pe_ratio", "unknown"]))
+    assert rows == [
+        {"metric": "price", "AAA": 10.0, "BBB": 10.0},
+        {"metric": "pe_ratio", "AAA": 20.0, "BBB": None},
+        {"metric": "sentiment", "AAA": 0.5, "BBB": 0.5},
+    ]
+    asyncio.run(compare_analytics.compare_table(["AAA", "BBB"], ["price", "pe_ratio", "unknown"]))
+    assert calls == {"quotes": 1, "overview": 2, "sentiment": 2}
@@ -0,0 +1,11 @@
+from app.utils.db_indexes import plan_stages
+
+
+def test_plan_stages_flags_collscan():
+    plan = {"stage": "LIMIT", "inputStage": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}
+    assert plan_stages(plan) == ["LIMIT", "SORT", "COLLSCAN"]
+
+
+def test_plan_stages_index_scan():
+    plan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "user_updated"}}
+    assert "COLLSCAN" not in plan_stages(plan)
@@ -0,0 +1,35 @@
+from app.services.holdings_store import migrate_embedded_holdings, portfolio_totals
+
+
+def test_portfolio_totals_include_cash():
+    positions = [{"total_value": 1100.0, "unrealized_pnl": 100.0}, {"total_value": 50.0, "unrealized_pnl": -10.0}]
+    assert portfolio_totals(positions, 25.0) == (1175.0, 90.0)
+
+
+def test_migration_upserts_lots_before_flagging_the_portfolio():
+    writes = []
+
+    class Collection:
+        def __init__(self, name):
+            self.name = name
+
+        def bulk_write(self, ops, ordered=True):
+            writes.append((self.name, ops))
+
+        def update_one(self, query, update):
+            writes.append((self.name, update))
+
+    db = {name: Collection(name) for name in ("portfolio_lots", "price_marks", "portfolios")}
+    portfolio = {"_id": "p1", "holdings": [
+        {"symbol": "aapl", "quantity": 3, "average_cost": 100.0, "current_price": 110.0,
+         "lots": [{"quantity": 1, "price": 90.0, "trade_date": "2024-01-02"},
+                  {"quantity": 2, "price": 105.0, "trade_date": "2024-02-01"}]},
+    ]}
+    migrated = migrate_embedded_holdings(db, portfolio)
+    assert migrated == {"_id": "p1", "lots_migrated": True}
+    assert [name for name, _ in writes] == ["portfolio_lots", "price_marks", "portfolios"]
+    lot_ops = writes[0][1]
+    # Stable ids, so a retried migration writes the same lots again instead of duplicating them
+    assert [op._filter for op in lot_ops] == [{"_id": "p1:AAPL:0.0"}, {"_id": "p1:AAPL:0.1"}]
+    assert lot_ops[1]._doc["$setOnInsert"]["quantity"] == 2.0
+    assert writes[2][1] == {"$set": {"lots_migrated": True}, "$unset": {"holdings": ""}}
@@ -0,0 +1,37 @@
+import asyncio
+from datetime import datetime, timezone
+
+from app.services.market_data_hub import MarketDataHub
+from app.services.stock_service import is_market_open
+
+
+def test_is_market_open_by_session():
+    # Monday 2024-01-08 15:00 UTC is 10:00 in New York and 20:30 in Kolkata
+    monday = datetime(2024, 1, 8, 15, 0, tzinfo=timezone.utc)
+    assert is_market_open('US', monday)
+    assert not is_market_open('IN', monday)
+    saturday = datetime(2024, 1, 6, 15, 0, tzinfo=timezone.utc)
+    assert not is_market_open('US', saturday)
+    assert is_market_open('GLOBAL', saturday)
+
+
+def test_publish_fans_out_only_subscribed_symbols():
+    async def scenario():
+        hub = MarketDataHub()
+        received = []
+
+        async def listener(ticks):
+            received.append(set(ticks))
+
+        hub.add_listener(listener)
+        aapl = hub.subscribe(["aapl"])
+        both = hub.subscribe(["AAPL", "MSFT"])
+        await hub.publish({"AAPL": {"Price": 1.0}, "MSFT": {"Price": 2.0}})
+        assert set(aapl.get_nowait()) == {"AAPL"}
+        assert set(both.get_nowait()) == {"AAPL", "MSFT"}
+        assert received == [{"AAPL", "MSFT"}]
+
+        hub.unsubscribe(both)
+        assert hub.symbols() == {"AAPL"}
+
+    asyncio.run(scenario())
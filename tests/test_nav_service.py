@@ -0,0 +1,126 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from app.services.nav_service import build_nav_rows, performance_metrics, trade_day, update_nav
+
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        value = doc.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        for op, operand in condition.items():
+            if op == "$exists":
+                if (field in doc) != operand:
+                    return False
+            elif value is None:
+                return False
+            elif (op == "$lt" and not value < operand) or (op == "$gt" and not value > operand) or \
+                    (op == "$gte" and not value >= operand) or (op == "$nin" and value in operand):
+                return False
+    return True
+
+
+class _Cursor(list):
+    def sort(self, field, direction=1):
+        return _Cursor(sorted(self, key=lambda d: d[field], reverse=direction < 0))
+
+
+class _Collection:
+    """Just enough of a pymongo collection for update_nav."""
+
+    def __init__(self, docs=None):
+        self.docs = list(docs or [])
+
+    def find(self, query, projection=None):
+        return _Cursor(d for d in self.docs if _matches(d, query))
+
+    def find_one(self, query, projection=None, sort=None):
+        rows = self.find(query)
+        if sort:
+            rows = rows.sort(*sort[0])
+        return rows[0] if rows else None
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            self.docs = [d for d in self.docs if not _matches(d, op._filter)] + [dict(op._doc)]
+
+    def delete_many(self, query):
+        self.docs = [d for d in self.docs if not _matches(d, query)]
+
+    def update_one(self, query, update):
+        pass
+
+    def update_many(self, query, update):
+        pass
+
+
+def test_build_nav_rows_excludes_flows_from_returns():
+    days = ["2024-01-02", "2024-01-03", "2024-01-04"]
+    closes = np.array([[10.0], [11.0], [11.0]])
+    trades = [
+        {"symbol": "AAPL", "type": "buy", "quantity": 10, "price": 10.0, "trade_date": "2024-01-01"},
+        {"symbol": "AAPL", "type": "buy", "quantity": 10, "price": 11.0, "trade_date": "2024-01-04"},
+    ]
+    rows = build_nav_rows(days, ["AAPL"], closes, np.array([0.0]), trades, 0.0, None, 1.0)
+    # Weekend/holiday trade lands on the next trading day
+    assert rows[0]["positions"] == [{"symbol": "AAPL", "quantity": 10.0}]
+    assert [r["nav"] for r in rows] == [100.0, 110.0, 220.0]
+    # The second purchase is a flow, not a gain
+    assert np.isclose(rows[1]["twr_index"], 1.1)
+    assert np.isclose(rows[2]["twr_index"], 1.1)
+
+
+def test_performance_metrics_daily_change():
+    rows = [
+        {"date": "2023-12-29", "nav": 100.0, "net_flow": 0.0, "twr_index": 1.0},
+        {"date": "2024-01-02", "nav": 105.0, "net_flow": 0.0, "twr_index": 1.05},
+        {"date": "2024-01-03", "nav": 210.0, "net_flow": 100.0, "twr_index": 1.1},
+    ]
+    metrics = performance_metrics(rows)
+    assert np.isclose(metrics["daily_change"], 5.0)
+    assert np.isclose(metrics["ytd_return"], 10.0)
+
+
+def test_trade_day_accepts_iso_strings():
+    assert trade_day("2024-03-05") == "2024-03-05"
+    assert trade_day("2024-03-05T10:00:00") == "2024-03-05"
+
+
+def test_weekend_trade_survives_incremental_recomputes(monkeypatch):
+    from app.services import nav_service
+
+    closes = pd.Series([10.0, 10.0, 11.0, 12.0],
+                       index=pd.to_datetime(["2024-01-04", "2024-01-05", "2024-01-08", "2024-01-09"]))
+    available = {"bars": 2}
+
+    async def daily_bars(symbols):
+        return {"AAPL": pd.DataFrame({"Close": closes.iloc[:available["bars"]]})}
+
+    monkeypatch.setattr(nav_service, "get_daily_bars", daily_bars)
+    db = {
+        nav_service.NAV_COLLECTION: _Collection(),
+        "transactions": _Collection([
+            {"portfolio_id": "p1", "symbol": "AAPL", "type": "buy", "quantity": 10, "price": 10.0, "trade_date": "2024-01-04"},
+        ]),
+        "portfolios": _Collection(),
+    }
+    portfolio = {"_id": "p1", "cash_balance": 0.0}
+
+    asyncio.run(update_nav(db, portfolio))
+    # A Saturday buy, then two more incremental runs as Monday's and Tuesday's bars arrive
+    db["transactions"].docs.append(
+        {"portfolio_id": "p1", "symbol": "AAPL", "type": "buy", "quantity": 5, "price": 10.0, "trade_date": "2024-01-06"})
+    for bars in (3, 4):
+        available["bars"] = bars
+        asyncio.run(update_nav(db, portfolio))
+
+    rows = {r["date"]: r for r in db[nav_service.NAV_COLLECTION].docs}
+    assert sorted(rows) == ["2024-01-04", "2024-01-05", "2024-01-08", "2024-01-09"]
+    assert rows["2024-01-08"]["positions"] == [{"symbol": "AAPL", "quantity": 15.0}]
+    assert rows["2024-01-09"]["positions"] == [{"symbol": "AAPL", "quantity": 15.0}]
+    assert rows["2024-01-09"]["nav"] == 180.0
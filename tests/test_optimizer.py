@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.services.optimizer import (
+    optimize_weights, project_capped_simplex, rebalance_trades, risk_parity_weights
+)
+
+COV = np.array([[0.04, 0.006, 0.0], [0.006, 0.09, 0.01], [0.0, 0.01, 0.16]])
+MU = np.array([0.08, 0.12, 0.15])
+
+
+def test_project_capped_simplex_respects_constraints():
+    w = project_capped_simplex(np.array([0.9, 0.5, -0.2]), 0.9, 0.5)
+    assert np.isclose(w.sum(), 0.9)
+    assert (w >= 0).all() and (w <= 0.5 + 1e-12).all()
+
+
+def test_min_variance_prefers_low_volatility_within_caps():
+    result = optimize_weights("min_variance", COV, MU, max_weight=0.5, cash_floor=0.1, risk_free_rate=0.0)
+    w = result["weights"]
+    assert np.isclose(w.sum(), 0.9)
+    assert w[0] == w.max() and w.max() <= 0.5 + 1e-9
+
+
+def test_risk_parity_equalizes_contributions():
+    w = risk_parity_weights(COV, 1.0, 1.0)
+    contributions = w * (COV @ w)
+    assert np.allclose(contributions, contributions.mean(), rtol=1e-4)
+
+
+def test_frontier_is_sorted_and_picks_max_sharpe():
+    result = optimize_weights("frontier", COV, MU, max_weight=1.0, cash_floor=0.0, risk_free_rate=0.02)
+    vols = [p["volatility"] for p in result["frontier"]]
+    assert vols == sorted(vols)
+    assert np.isclose(result["sharpe_ratio"], max(p["sharpe_ratio"] for p in result["frontier"]))
+
+
+def test_rebalance_trades():
+    trades = rebalance_trades(["A", "B"], np.array([10.0, 0.0]), np.array([10.0, 20.0]), np.array([0.5, 0.5]), 100.0)
+    assert {(t["symbol"], t["action"], t["quantity"]) for t in trades} == {("A", "sell", 5.0), ("B", "buy", 2.5)}
@@ -0,0 +1,19 @@
+from datetime import datetime
+from bson import ObjectId
+from app.utils.pagination import encode_cursor, decode_cursor, keyset_filter
+
+
+def test_cursor_roundtrip():
+    ts = datetime(2024, 5, 1, 12, 30, 15, 123000)
+    oid = ObjectId()
+    assert decode_cursor(encode_cursor(ts, oid)) == (ts, oid)
+
+
+def test_keyset_filter_descending():
+    ts = datetime(2024, 5, 1)
+    oid = ObjectId()
+    query = keyset_filter("updated_at", encode_cursor(ts, oid), descending=True)
+    assert query == {"$or": [
+        {"updated_at": {"$lt": ts}},
+        {"updated_at": ts, "_id": {"$lt": oid}}
+    ]}
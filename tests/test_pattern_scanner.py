@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from app.services.pattern_scanner import PatternScanner, chart_annotations, detect_patterns
+
+
+def _rows(*rows):
+    return np.array(rows, dtype=float)
+
+
+def test_candlestick_patterns_across_symbols():
+    # Row 0: bearish bar, then a bullish bar engulfing it, then a doji
+    # Row 1: a gap up, then a gap down; padded with NaN like a short history
+    o = _rows([10.0, 9.5, 11.0], [np.nan, 20.0, 17.0])
+    h = _rows([10.2, 11.2, 11.5], [np.nan, 21.0, 17.5])
+    l = _rows([9.4, 9.4, 10.5], [np.nan, 19.5, 16.0])
+    c = _rows([9.6, 11.0, 11.02], [np.nan, 20.5, 16.5])
+    v = np.ones_like(o)
+    masks = detect_patterns(o, h, l, c, v)
+    assert masks["bullish_engulfing"].tolist() == [[False, True, False], [False, False, False]]
+    assert masks["doji"][0].tolist() == [False, False, True]
+    assert masks["gap_down"][1].tolist() == [False, False, True]
+    # Nothing matches against padding
+    assert not masks["gap_up"][1, 1]
+
+
+def _frame(closes, volumes=None, start="2023-01-02"):
+    closes = np.asarray(closes, dtype=float)
+    index = pd.bdate_range(start, periods=len(closes))
+    return pd.DataFrame({
+        "Open": closes, "High": closes + 0.5, "Low": closes - 0.5, "Close": closes,
+        "Volume": volumes if volumes is not None else np.full(len(closes), 1000.0),
+    }, index=index)
+
+
+def test_breakout_and_volume_spike_need_history():
+    closes = np.concatenate([np.full(260, 100.0), [105.0]])
+    volumes = np.concatenate([np.full(260, 1000.0), [5000.0]])
+    signals = chart_annotations([
+        {"date": str(d.date()), "open": r.Open, "high": r.High, "low": r.Low, "close": r.Close, "volume": r.Volume}
+        for d, r in _frame(closes, volumes).iterrows()
+    ])
+    last = [s["pattern"] for s in signals if s["date"] == signals[-1]["date"]]
+    assert {"breakout_52w_high", "volume_spike", "gap_up"} <= set(last)
+
+
+def test_incremental_scan_matches_full_scan():
+    rng = np.random.default_rng(3)
+    closes = {s: 100 * np.cumprod(1 + rng.normal(0, 0.02, 320)) for s in ("AAA", "BBB")}
+    full = {s: _frame(c) for s, c in closes.items()}
+
+    incremental = PatternScanner()
+    incremental.scan({s: f.iloc[:300] for s, f in full.items()})
+    assert incremental.scan({s: f.iloc[:300] for s, f in full.items()}) == 0
+    incremental.scan(full)
+
+    fresh = PatternScanner()
+    fresh.scan(full)
+    for symbol in full:
+        recent = str(full[symbol].index[-20].date())
+        assert incremental.signals(symbol, since=recent) == fresh.signals(symbol, since=recent)
+
+
+def test_scanner_keeps_state_for_a_bounded_number_of_symbols():
+    rng = np.random.default_rng(5)
+    frames = {s: _frame(100 * np.cumprod(1 + rng.normal(0, 0.02, 300))) for s in ("AAA", "BBB")}
+    scanner = PatternScanner(max_symbols=1)
+    scanner.scan({"AAA": frames["AAA"]})
+    scanner.scan({"BBB": frames["BBB"]})
+    assert scanner.signals("AAA") == [] and scanner.signals("BBB")
+    # The evicted symbol is scanned in full again
+    assert scanner.scan({"AAA": frames["AAA"]}) > 0
+
+
+def test_scanner_rescans_the_in_progress_bar():
+    closes = np.full(300, 100.0)
+    partial = _frame(closes, np.full(300, 1000.0))
+    scanner = PatternScanner()
+    scanner.scan({"AAA": partial})
+    last_date = str(partial.index[-1].date())
+    assert "volume_spike" not in {s["pattern"] for s in scanner.signals("AAA", since=last_date)}
+
+    # The same session's completed bar, with the full day's volume
+    completed = partial.copy()
+    completed.iloc[-1, completed.columns.get_loc("Volume")] = 5000.0
+    assert scanner.scan({"AAA": completed}) == 0
+    patterns = [s["pattern"] for s in scanner.signals("AAA", since=last_date)]
+    assert "volume_spike" in patterns and patterns.count("doji") == 1
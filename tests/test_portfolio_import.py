@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.services.portfolio_import import LotBook, import_hash, iter_csv_records, map_columns, parse_trade
+
+
+def _collect(chunks):
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def run():
+        return [record async for record in iter_csv_records(stream())]
+
+    return asyncio.run(run())
+
+
+def test_iter_csv_records_across_chunk_boundaries():
+    body = '﻿Date,Symbol,Side,Qty,Price,Notes\n2024-01-02,AAPL,BUY,10,"1,000.50","multi\nline"\n2024-01-03,AAPL,SELL,4,1010'.encode()
+    records = _collect([body[:17], body[17:40], body[40:]])
+    assert records[0] == ["Date", "Symbol", "Side", "Qty", "Price", "Notes"]
+    assert records[1][4] == "1,000.50" and records[1][5] == "multi\nline"
+    assert records[2][:3] == ["2024-01-03", "AAPL", "SELL"]
+
+
+def test_parse_trade_with_aliases():
+    columns = map_columns(["Trade Date", "Ticker", "Action", "Shares", "Price", "Commission"])
+    trade = parse_trade(["01/05/2024", "msft", "Buy", "3", "$400", "1.5"], columns)
+    assert trade == {"trade_date": "2024-01-05", "symbol": "MSFT", "type": "buy", "quantity": 3.0,
+                     "price": 400.0, "fee": 1.5, "notes": ""}
+    with pytest.raises(ValueError):
+        map_columns(["Symbol", "Price"])
+
+
+def test_lot_book_fifo():
+    book = LotBook([{"symbol": "AAPL", "quantity": 5, "price": 100.0, "trade_date": "2023-06-01"}])
+    book.apply({"symbol": "AAPL", "type": "buy", "quantity": 5, "price": 120.0, "fee": 0.0, "trade_date": "2024-01-02"})
+    realized = book.apply({"symbol": "AAPL", "type": "sell", "quantity": 7, "price": 130.0, "fee": 1.0,
+                           "trade_date": "2024-02-01"})
+    # Oldest lot first: 5 @ 100, then 2 @ 120
+    assert realized == 5 * 30 + 2 * 10 - 1
+    quantity, average_cost, lots = book.position("AAPL")
+    assert quantity == 3 and average_cost == 120.0 and len(lots) == 1
+    with pytest.raises(ValueError):
+        book.apply({"symbol": "AAPL", "type": "sell", "quantity": 10, "price": 1.0, "fee": 0.0, "trade_date": "2024-03-01"})
+    with pytest.raises(ValueError):
+        book.apply({"symbol": "AAPL", "type": "buy", "quantity": 1, "price": 1.0, "fee": 0.0, "trade_date": "2024-01-01"})
+
+
+def test_lot_book_rejects_trades_before_open_lots_and_writes_only_changes():
+    book = LotBook([
+        {"_id": "lot1", "symbol": "AAPL", "quantity": 5, "price": 100.0, "trade_date": "2024-01-02"},
+        {"_id": "lot2", "symbol": "AAPL", "quantity": 5, "price": 110.0, "trade_date": "2024-03-01"},
+        {"_id": "lot3", "symbol": "MSFT", "quantity": 1, "price": 400.0, "trade_date": "2024-01-02"},
+    ])
+    with pytest.raises(ValueError):
+        book.apply({"symbol": "AAPL", "type": "buy", "quantity": 1, "price": 1.0, "fee": 0.0, "trade_date": "2024-02-01"})
+    book.apply({"symbol": "AAPL", "type": "sell", "quantity": 7, "price": 120.0, "fee": 0.0, "trade_date": "2024-03-05"})
+    book.apply({"symbol": "AAPL", "type": "buy", "quantity": 2, "price": 130.0, "fee": 0.0, "trade_date": "2024-03-06"})
+
+    ops = book.lot_ops("p1", ["AAPL"])
+    # lot1 closed, lot2 decremented, one new lot; MSFT untouched and nothing deleted by symbol
+    assert [type(op).__name__ for op in ops] == ["DeleteOne", "UpdateOne", "InsertOne"]
+    assert ops[0]._filter == {"_id": "lot1"}
+    assert ops[1]._filter == {"_id": "lot2"} and ops[1]._doc == {"$inc": {"quantity": -2.0}}
+    assert ops[2]._doc["quantity"] == 2 and ops[2]._doc["symbol"] == "AAPL"
+    assert book.lot_ops("p1", ["AAPL"]) == []
+
+
+def test_import_hash_numbers_repeated_rows():
+    trade = {"trade_date": "2024-01-05", "symbol": "MSFT", "type": "buy", "quantity": 3.0, "price": 400.0, "fee": 0.0}
+    first_file, second_file = {}, {}
+    hashes = [import_hash(trade, first_file), import_hash(trade, first_file)]
+    assert hashes[0] != hashes[1]
+    # Importing the same file again reproduces the same hashes
+    assert [import_hash(trade, second_file), import_hash(trade, second_file)] == hashes
+
+
+def test_order_problem_reports_the_first_misordered_row_once():
+    book = LotBook([{"_id": "lot1", "symbol": "AAPL", "quantity": 5, "price": 100.0, "trade_date": "2024-03-01"}])
+
+    def buy(symbol, day):
+        return {"symbol": symbol, "type": "buy", "quantity": 1, "price": 1.0, "fee": 0.0, "trade_date": day}
+
+    assert book.order_problem([buy("AAPL", "2024-03-01"), buy("MSFT", "2024-01-02"), buy("AAPL", "2024-04-01")]) is None
+    # Newest-first export: stops at the first row that goes back in time, with a hint about the order
+    index, message = book.order_problem([buy("MSFT", "2024-05-01"), buy("MSFT", "2024-04-01"), buy("MSFT", "2024-03-01")])
+    assert index == 1 and "newest first" in message
+    # History older than an open lot
+    index, message = book.order_problem([buy("AAPL", "2024-02-01")])
+    assert index == 0 and "2024-03-01" in message
+    assert book.last_date == {"AAPL": "2024-03-01"}
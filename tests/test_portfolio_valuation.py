@@ -0,0 +1,23 @@
+from app.services.portfolio_valuation import revalue_holdings
+
+
+def test_revalue_holdings_computes_pnl_and_changes():
+    holdings = [
+        {"symbol": "AAPL", "quantity": 10, "average_cost": 100.0, "current_price": 100.0,
+         "total_value": 1000.0, "unrealized_pnl": 0.0, "unrealized_pnl_percent": 0.0},
+        {"symbol": "MSFT", "quantity": 2, "average_cost": 50.0, "current_price": 60.0,
+         "total_value": 120.0, "unrealized_pnl": 20.0, "unrealized_pnl_percent": 20.0},
+    ]
+    updated, total, changed = revalue_holdings(holdings, {"AAPL": 110.0})
+    assert changed == [0]
+    assert updated[0]["unrealized_pnl"] == 100.0
+    assert updated[0]["unrealized_pnl_percent"] == 10.0
+    # No fresh price: keeps the last one
+    assert updated[1]["current_price"] == 60.0
+    assert total == 1100.0 + 120.0
+
+
+def test_revalue_holdings_zero_cost_basis():
+    updated, _, changed = revalue_holdings([{"symbol": "X", "quantity": 1, "average_cost": 0}], {"X": 5.0})
+    assert updated[0]["unrealized_pnl_percent"] == 0.0
+    assert changed == [0]
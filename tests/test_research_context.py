@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+from app.services.research_context import build_context, gather_sections, wanted_sections
+
+
+def test_wanted_sections_follow_categories():
+    assert wanted_sections([]) == ["quote", "overview", "historical", "news"]
+    assert wanted_sections(["news", "company"]) == ["overview", "news"]
+
+
+def test_required_sections_are_awaited_and_late_optional_ones_dropped():
+    cancelled = []
+
+    async def slow_required():
+        await asyncio.sleep(0.05)
+        return {"Price": 1.0}
+
+    async def late_optional():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append("news")
+            raise
+
+    async def failing():
+        raise RuntimeError("provider down")
+
+    async def scenario():
+        started = time.monotonic()
+        results, dropped = await gather_sections(
+            {"quote": slow_required, "news": late_optional, "overview": failing},
+            {"quote", "overview"},
+            deadline=started + 0.1,
+        )
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(0)
+        return results, dropped, elapsed
+
+    results, dropped, elapsed = asyncio.run(scenario())
+    assert results == {"quote": {"Price": 1.0}, "news": None, "overview": None}
+    assert dropped == ["news"]
+    assert cancelled == ["news"]
+    # All fetches ran together: bounded by the deadline, not the sum of the fetch times
+    assert elapsed < 1
+
+
+def test_context_leaves_out_dropped_news():
+    sections = {"quote": {"Price": 101.5}, "overview": {"Name": "Acme"}, "historical": None, "news": None}
+    context = build_context("ACME", "Outlook?", [], sections, "")
+    assert "CURRENT PRICE: $101.5" in context and "COMPANY: Acme" in context
+    assert "RECENT NEWS" not in context
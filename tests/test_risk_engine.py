@@ -0,0 +1,21 @@
+import numpy as np
+
+from app.services.risk_engine import compute_risk, positions_version
+
+
+def test_compute_risk_matches_benchmark_when_identical():
+    benchmark = np.array([100.0, 101.0, 99.0, 102.0, 104.0, 103.0])
+    prices = np.column_stack([benchmark, benchmark])
+    result = compute_risk(prices, np.array([1.0]), risk_free_rate=0.0)
+    assert np.isclose(result["beta"], 1.0)
+    # Peak 101 -> trough 99
+    assert np.isclose(result["max_drawdown"], 99.0 / 101.0 - 1)
+    assert result["covariance"].shape == (1, 1)
+    assert result["volatility"] > 0
+
+
+def test_positions_version_ignores_prices_and_order():
+    a = [{"symbol": "aapl", "quantity": 1, "current_price": 10}, {"symbol": "MSFT", "quantity": 2}]
+    b = [{"symbol": "MSFT", "quantity": 2.0, "current_price": 99}, {"symbol": "AAPL", "quantity": 1}]
+    assert positions_version(a) == positions_version(b)
+    assert positions_version(a) != positions_version([{"symbol": "AAPL", "quantity": 3}])
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from app.services.screener import ScreenerSnapshot, filter_mask, parse_filter, screen
+
+
+def _snapshot():
+    return ScreenerSnapshot(
+        ["AAPL", "TCS.NS", "XOM", "NEW"],
+        {"PERatio": np.array([30.0, 25.0, 12.0, np.nan]),
+         "rsi_14": np.array([55.0, 28.0, 25.0, 20.0]),
+         "price": np.array([190.0, 3900.0, 110.0, 5.0]),
+         "sma_50": np.array([180.0, 4000.0, 100.0, 6.0])},
+        {"Sector": np.array(["Technology", "Technology", "Energy", ""], dtype=object)},
+    )
+
+
+def test_filter_masks_are_vectorized_and_skip_unknowns():
+    snapshot = _snapshot()
+    assert filter_mask(snapshot, "PERatio < 26 and rsi_14 < 30").tolist() == [False, True, True, False]
+    # NaN P/E never matches, even negated comparisons
+    assert filter_mask(snapshot, "PERatio >= 0").tolist() == [True, True, True, False]
+    assert filter_mask(snapshot, 'Sector in ["Energy"] or price > sma_50 * 1.05').tolist() == [True, False, True, False]
+    assert filter_mask(snapshot, "10 < PERatio < 26").tolist() == [False, True, True, False]
+    assert filter_mask(snapshot, 'Market == "IN"').tolist() == [False, True, False, False]
+
+
+def test_filter_rejects_unsafe_or_invalid_expressions():
+    snapshot = _snapshot()
+    for expression in ["__import__('os')", "PERatio.real > 1", "Missing > 1", 'Sector > "A"', "PERatio + 1"]:
+        with pytest.raises(ValueError):
+            filter_mask(snapshot, expression)
+    with pytest.raises(ValueError):
+        parse_filter("[x for x in PERatio]")
+
+
+def test_screen_sorts_with_unknowns_last_and_paginates():
+    snapshot = _snapshot()
+    result = screen(snapshot, "", sort="PERatio", descending=False, page=1, page_size=3)
+    assert [r["Symbol"] for r in result["items"]] == ["XOM", "TCS.NS", "AAPL"]
+    assert result["total"] == 4
+    last = screen(snapshot, "", sort="PERatio", descending=True, page=2, page_size=3)
+    assert [r["Symbol"] for r in last["items"]] == ["NEW"] and last["items"][0]["PERatio"] is None
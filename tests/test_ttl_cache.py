@@ -0,0 +1,20 @@
+from app.utils.ttl_cache import TTLCache
+
+
+def test_ttl_cache_expires(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('app.utils.ttl_cache.time.monotonic', lambda: now[0])
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    now[0] += 11
+    assert cache.get("a") is None
+
+
+def test_ttl_cache_evicts_oldest():
+    cache = TTLCache(ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert "a" not in cache
+    assert cache.get("b") == 2 and cache.get("c") == 3
@@ -0,0 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.services.var_engine import SHARD_PATHS, compute_var, monte_carlo_losses, parametric_var
+
+
+def _returns(seed=7, days=250):
+    rng = np.random.default_rng(seed)
+    cov = np.array([[4e-4, 1e-4], [1e-4, 2.5e-4]])
+    return rng.multivariate_normal([5e-4, 3e-4], cov, size=days)
+
+
+def test_parametric_var_single_asset():
+    result = parametric_var(np.array([0.0]), np.array([[1e-4]]), np.array([1.0]), 1000.0, 1, 0.95)
+    # 1.645 sigma of a 1% daily move on 1000
+    assert np.isclose(result["var"], 16.45, atol=0.01)
+    assert result["cvar"] > result["var"]
+
+
+def test_monte_carlo_is_deterministic_per_seed():
+    returns = _returns()
+    weights = np.array([0.6, 0.4])
+    first = compute_var(returns, weights, 10000.0, 0.99, [1, 10], 5000, seed=42)
+    second = compute_var(returns, weights, 10000.0, 0.99, [1, 10], 5000, seed=42)
+    assert first == second
+    other = compute_var(returns, weights, 10000.0, 0.99, [1], 5000, seed=43)
+    assert other["1"]["monte_carlo"] != first["1"]["monte_carlo"]
+
+
+def test_sharded_pool_matches_in_process():
+    returns = _returns()
+    mu, cov = returns.mean(axis=0), np.cov(returns, rowvar=False)
+    args = (mu, cov, np.array([0.5, 0.5]), 1000.0, 5, SHARD_PATHS * 2 + 10, 3)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        pooled = monte_carlo_losses(*args, pool=pool)
+    assert np.array_equal(pooled, monte_carlo_losses(*args))
+
+
+def test_monte_carlo_converges_to_parametric():
+    returns = _returns()
+    result = compute_var(returns, np.array([0.5, 0.5]), 1000.0, 0.95, [1], 200000, seed=1)["1"]
+    assert np.isclose(result["monte_carlo"]["var"], result["parametric"]["var"], rtol=0.05)